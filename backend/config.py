@@ -0,0 +1,12 @@
+# config.py
+#
+# Limits shared by request schemas and the services that enforce them,
+# so the schemas layer never has to import a service module.
+
+import os
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# most sessions one re-scoring run replays (RescoreRequest.limit)
+RESCORE_MAX_SESSIONS = int(os.getenv("RESCORE_MAX_SESSIONS", 20000))
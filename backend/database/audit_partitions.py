@@ -0,0 +1,91 @@
+# database/audit_partitions.py
+#
+# Optional monthly RANGE partitioning for the append-only audit_logs table
+# (MySQL only). Enabled with AUDIT_PARTITIONED=1; old months can then be
+# archived with ALTER TABLE ... DROP PARTITION instead of slow DELETEs.
+#
+# MySQL requires the partition key in every unique key and does not allow
+# foreign keys on partitioned tables, so the first run drops the admin_id
+# FK and widens the primary key to (id, created_at).
+
+import os
+from datetime import date
+
+from sqlalchemy import text
+
+AUDIT_PARTITIONED = os.getenv("AUDIT_PARTITIONED", "0") == "1"
+MONTHS_AHEAD = int(os.getenv("AUDIT_PARTITION_MONTHS_AHEAD", 3))
+
+
+def _month_starts(first: date, count: int):
+    y, m = first.year, first.month
+    for _ in range(count):
+        yield date(y, m, 1)
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+
+
+def _partition_defs(first: date, count: int) -> str:
+    """One partition per month holding rows *before* the next month start."""
+    starts = list(_month_starts(first, count + 1))
+    parts = [
+        f"PARTITION p{s:%Y%m} VALUES LESS THAN (TO_DAYS('{nxt.isoformat()}'))"
+        for s, nxt in zip(starts, starts[1:])
+    ]
+    parts.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+    return ",\n".join(parts)
+
+
+async def ensure_audit_partitions(conn):
+    """
+    Called on startup (inside engine.begin()). Partitions audit_logs on
+    first run, then keeps MONTHS_AHEAD future partitions split off pmax.
+    """
+    if not AUDIT_PARTITIONED or conn.dialect.name != "mysql":
+        return
+
+    existing = (await conn.execute(text(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'audit_logs' "
+        "AND PARTITION_NAME IS NOT NULL"
+    ))).scalars().all()
+
+    today = date.today().replace(day=1)
+
+    if not existing:
+        fks = (await conn.execute(text(
+            "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+            "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'audit_logs'"
+        ))).scalars().all()
+        for fk in fks:
+            await conn.execute(text(f"ALTER TABLE audit_logs DROP FOREIGN KEY `{fk}`"))
+
+        await conn.execute(text(
+            "ALTER TABLE audit_logs "
+            "MODIFY created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)"
+        ))
+
+        # everything older than this month lands in the first partition
+        oldest = (await conn.execute(text(
+            "SELECT MIN(created_at) FROM audit_logs"
+        ))).scalar()
+        first = oldest.date().replace(day=1) if oldest else today
+        count = (
+            (today.year - first.year) * 12 + today.month - first.month
+            + 1 + MONTHS_AHEAD
+        )
+
+        await conn.execute(text(
+            "ALTER TABLE audit_logs PARTITION BY RANGE (TO_DAYS(created_at)) (\n"
+            + _partition_defs(first, count) + "\n)"
+        ))
+        return
+
+    # split new months off pmax
+    wanted = list(_month_starts(today, MONTHS_AHEAD + 1))
+    missing = [s for s in wanted if f"p{s:%Y%m}" not in existing]
+    if missing:
+        await conn.execute(text(
+            "ALTER TABLE audit_logs REORGANIZE PARTITION pmax INTO (\n"
+            + _partition_defs(missing[0], len(missing)) + "\n)"
+        ))
@@ -2,7 +2,7 @@
 
 from sqlalchemy import (
     Column, Integer, String, ForeignKey, Text, JSON, Enum,
-    Float, TIMESTAMP, Boolean
+    Float, TIMESTAMP, Boolean, Index, UniqueConstraint, event
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -53,7 +53,7 @@ class User(Base):
     role_id = Column(Integer, ForeignKey("roles.id"), nullable=False)
     email = Column(String(150), unique=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
-    full_name = Column(String(150))
+    full_name = Column(String(150), index=True)   # name-prefix search
     phone = Column(String(20))
     created_at = Column(TIMESTAMP, server_default=func.now())
 
@@ -83,7 +83,8 @@ class Patient(Base):
     physician_id = Column(
         Integer,
         ForeignKey("physicians.user_id"),
-        nullable=True   
+        nullable=True,
+        index=True
     )
 
     physician = relationship("Physician", back_populates="patients")
@@ -157,10 +158,19 @@ class PoseTemplate(Base):
     joints = Column(JSON, nullable=False)
     reference_angles = Column(JSON, nullable=False)
 
+    # every capture writes a new version; older ones stay queryable
+    version = Column(Integer, default=1, nullable=False)
+    is_current = Column(Boolean, default=True, nullable=False)
+
     created_at = Column(TIMESTAMP, server_default=func.now())
 
     exercise = relationship("Exercise")
 
+    __table_args__ = (
+        Index("ix_pose_templates_exercise_current", "exercise_id", "is_current", "pose_type"),
+        UniqueConstraint("exercise_id", "pose_type", "version", name="uq_pose_templates_version"),
+    )
+
 
 
 # ---------------------------------------------------------
@@ -330,6 +340,8 @@ class ExerciseSession(Base):
 
     duration_sec = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # set on every write (end / re-end); incremental exports window on it
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
 class PatientExercise(Base):
     __tablename__ = "patient_exercises"
@@ -377,6 +389,20 @@ class AuditLog(Base):
     description = Column(String(255))
     created_at = Column(DateTime, server_default=func.now())
 
+    # keyset pagination: ORDER BY created_at DESC, id DESC (+ filters)
+    __table_args__ = (
+        Index("ix_audit_logs_created_at_id", "created_at", "id"),
+        Index("ix_audit_logs_action_created_at", "action", "created_at"),
+        Index("ix_audit_logs_target_type_created_at", "target_type", "created_at"),
+    )
+
+
+# audit log is append-only: block ORM updates/deletes
+@event.listens_for(AuditLog, "before_update")
+@event.listens_for(AuditLog, "before_delete")
+def _audit_log_is_append_only(mapper, connection, target):
+    raise ValueError("audit_logs is append-only")
+
 class SubscriptionRequest(Base):
     __tablename__ = "subscription_requests"
 
@@ -390,3 +416,179 @@ class SubscriptionRequest(Base):
     )
 
     created_at = Column(DateTime, server_default=func.now())
+
+
+# ---------------------------------------------------------
+# EMAIL OUTBOX (delivered by services/email_outbox_service.py)
+# ---------------------------------------------------------
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    to_address = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    html_content = Column(Text, nullable=False)
+
+    status = Column(String(20), default="PENDING")  # PENDING | SENDING | SENT | FAILED
+    attempts = Column(Integer, default=0)
+    last_error = Column(String(500))
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)   # SENDING: lease expiry
+
+    created_at = Column(DateTime, server_default=func.now())
+    sent_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+
+
+# ---------------------------------------------------------
+# PATIENT DAILY ROLLUPS (one row per patient / exercise / day)
+# Maintained incrementally by services/patient_rollup_service.py
+# ---------------------------------------------------------
+from sqlalchemy import Date
+
+class PatientDailyRollup(Base):
+    __tablename__ = "patient_daily_rollups"
+
+    patient_id = Column(Integer, primary_key=True)
+    exercise_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    physician_id = Column(Integer)
+
+    sessions = Column(Integer, default=0)
+    total_reps = Column(Integer, default=0)
+    accuracy_sum = Column(Float, default=0.0)
+    duration_sum = Column(Float, default=0.0)
+
+    error_counts = Column(JSON)     # {errorKey: count}
+    alert_counts = Column(JSON)     # {alert message: count}
+
+    last_session_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_patient_daily_rollups_patient_day", "patient_id", "day"),
+    )
+
+
+# one row per patient; bumped whenever a closed rollup day changes (late
+# edit or rebuild). Progress caches key on it, so they stay valid across
+# workers (see PatientProgressService._days)
+class PatientRollupRevision(Base):
+    __tablename__ = "patient_rollup_revisions"
+
+    patient_id = Column(Integer, primary_key=True)
+    revision = Column(Integer, default=0, nullable=False)
+
+
+# ---------------------------------------------------------
+# BULK EXPORTS (Parquet, see services/export_service.py)
+# ---------------------------------------------------------
+class ExportJob(Base):
+    __tablename__ = "export_jobs"
+
+    id = Column(Integer, primary_key=True)
+    requested_by = Column(Integer, ForeignKey("users.id"))
+
+    status = Column(String(20), default="PENDING")  # PENDING | RUNNING | DONE | FAILED
+    since = Column(DateTime)                        # exclusive; NULL = full export
+    until = Column(DateTime, nullable=False)        # inclusive; next watermark
+
+    rows_total = Column(Integer, default=0)
+    rows_done = Column(Integer, default=0)
+    artifact_path = Column(String(500))
+    error = Column(String(500))
+
+    created_at = Column(DateTime, server_default=func.now())
+    finished_at = Column(DateTime)
+
+
+# ---------------------------------------------------------
+# ANGLE TRACES (per-frame joint angles, see utils/angle_trace.py)
+# ---------------------------------------------------------
+from sqlalchemy import LargeBinary
+
+class SessionAngleTrace(Base):
+    __tablename__ = "session_angle_traces"
+
+    session_id = Column(Integer, primary_key=True)   # exercise_sessions.id
+    patient_id = Column(Integer, nullable=False, index=True)
+    physician_id = Column(Integer)
+
+    frames = Column(Integer, default=0)
+    duration_ms = Column(Integer, default=0)
+    trace_index = Column(JSON, nullable=False)        # joints + block offsets
+    data = Column(LargeBinary(length=2**32 - 1), nullable=False)
+
+    created_at = Column(DateTime, server_default=func.now())
+
+
+# ---------------------------------------------------------
+# SESSION ERRORS (one row per session / error key)
+# Normalized from ExerciseSession.error_summary so analytics can
+# GROUP BY error_key in SQL instead of scanning JSON.
+# ---------------------------------------------------------
+class SessionError(Base):
+    __tablename__ = "session_errors"
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(Integer, nullable=False, index=True)   # exercise_sessions.id
+    patient_id = Column(Integer, nullable=False)
+    physician_id = Column(Integer)
+    exercise_id = Column(Integer)
+
+    error_key = Column(String(100), nullable=False)
+    joint = Column(String(50))
+    count = Column(Integer, default=0)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_session_errors_patient_key", "patient_id", "error_key"),
+        Index("ix_session_errors_physician_key", "physician_id", "error_key"),
+    )
+
+
+# ---------------------------------------------------------
+# SESSION ALERTS (one row per session / alert type)
+# Bulk-inserted at session end by services/session_alert_service.py
+# ---------------------------------------------------------
+class SessionAlert(Base):
+    __tablename__ = "session_alerts"
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(Integer, nullable=False, index=True)   # exercise_sessions.id
+    patient_id = Column(Integer, nullable=False)
+    physician_id = Column(Integer)
+    exercise_id = Column(Integer)
+
+    alert_type = Column(String(50), nullable=False)    # hyperextension | spine | ...
+    joint = Column(String(50))
+    message = Column(String(255))
+
+    first_at = Column(DateTime)
+    last_at = Column(DateTime)
+    duration_sec = Column(Float, default=0.0)          # time spent in alert
+    count = Column(Integer, default=1)                 # separate episodes
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_session_alerts_physician_type_first", "physician_id", "alert_type", "first_at"),
+        Index("ix_session_alerts_patient_type", "patient_id", "alert_type"),
+    )
+
+
+# ---------------------------------------------------------
+# PHYSICIAN DASHBOARD SNAPSHOT (one row per physician)
+# Updated incrementally on session save, marked stale when the
+# patient list changes; see services/physician_analytics_service.py
+# ---------------------------------------------------------
+class PhysicianDashboard(Base):
+    __tablename__ = "physician_dashboards"
+
+    physician_id = Column(Integer, primary_key=True)
+    snapshot = Column(JSON, nullable=False)    # {"patients": {id: {...}}}
+    stale = Column(Boolean, default=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
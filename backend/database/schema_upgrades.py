@@ -0,0 +1,77 @@
+# database/schema_upgrades.py
+#
+# Base.metadata.create_all only creates missing tables; it never alters a
+# table that already exists. Columns and indexes added to existing tables
+# are listed here and applied on startup, right after create_all. Every
+# step checks the live schema first, so running it again is a no-op.
+
+from sqlalchemy import inspect, text
+
+# (table, column, column DDL, backfill SQL or None)
+COLUMNS = [
+    # incremental exports window on last modification
+    ("exercise_sessions", "updated_at", "DATETIME NULL",
+     "UPDATE exercise_sessions SET updated_at = created_at WHERE updated_at IS NULL"),
+
+    # versioned pose templates: existing rows become version 1 and current.
+    # Duplicates left by the old delete-then-insert save are numbered by id,
+    # newest current. MySQL only lets an UPDATE read its own table through a
+    # materialized derived table; DISTINCT keeps it from being merged.
+    ("pose_templates", "version", "INTEGER NOT NULL DEFAULT 1",
+     "UPDATE pose_templates SET version = 1 + ("
+     " SELECT COUNT(*) FROM (SELECT DISTINCT id, exercise_id, pose_type FROM pose_templates) older"
+     " WHERE older.exercise_id = pose_templates.exercise_id"
+     " AND older.pose_type = pose_templates.pose_type AND older.id < pose_templates.id)"),
+    ("pose_templates", "is_current", "BOOLEAN NOT NULL DEFAULT 1",
+     "UPDATE pose_templates SET is_current = 0 WHERE EXISTS ("
+     " SELECT 1 FROM (SELECT DISTINCT id, exercise_id, pose_type FROM pose_templates) newer"
+     " WHERE newer.exercise_id = pose_templates.exercise_id"
+     " AND newer.pose_type = pose_templates.pose_type AND newer.id > pose_templates.id)"),
+]
+
+# (table, index name, columns, unique)
+INDEXES = [
+    # keyset pagination / filters (admin + physician listings)
+    ("users", "ix_users_full_name", ["full_name"], False),
+    ("patients", "ix_patients_physician_id", ["physician_id"], False),
+    ("audit_logs", "ix_audit_logs_created_at_id", ["created_at", "id"], False),
+    ("audit_logs", "ix_audit_logs_action_created_at", ["action", "created_at"], False),
+    ("audit_logs", "ix_audit_logs_target_type_created_at", ["target_type", "created_at"], False),
+    ("exercise_sessions", "ix_exercise_sessions_updated_at", ["updated_at"], False),
+    ("pose_templates", "ix_pose_templates_exercise_current",
+     ["exercise_id", "is_current", "pose_type"], False),
+    ("pose_templates", "uq_pose_templates_version", ["exercise_id", "pose_type", "version"], True),
+]
+
+
+def _live_schema(sync_conn):
+    """{table: (column names, index + unique constraint names)}"""
+    insp = inspect(sync_conn)
+    tables = {t for t, *_ in COLUMNS} | {t for t, *_ in INDEXES}
+    schema = {}
+    for table in tables:
+        if not insp.has_table(table):
+            continue
+        columns = {c["name"] for c in insp.get_columns(table)}
+        indexes = {i["name"] for i in insp.get_indexes(table)}
+        indexes |= {u["name"] for u in insp.get_unique_constraints(table)}
+        schema[table] = (columns, indexes)
+    return schema
+
+
+async def ensure_schema_upgrades(conn):
+    """Called on startup (inside engine.begin()), after create_all."""
+    schema = await conn.run_sync(_live_schema)
+
+    for table, column, ddl, backfill in COLUMNS:
+        if table in schema and column not in schema[table][0]:
+            await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            if backfill:
+                await conn.execute(text(backfill))
+
+    for table, name, columns, unique in INDEXES:
+        if table in schema and name not in schema[table][1]:
+            await conn.execute(text(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} "
+                f"ON {table} ({', '.join(columns)})"
+            ))
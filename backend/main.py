@@ -6,6 +6,7 @@ from sqlalchemy.future import select
 import threading
 import cv2
 import uuid
+import os
 
 from pose.pose_tracking_patient import run_exercise_session
 
@@ -122,6 +123,8 @@ from routers.physician_router import router as physician_router
 from routers.patient_router import router as patient_router
 from routers.patient_exercises_router import router as patient_exercises_router
 from routers.subscription_request_router import router as subscription_request_router
+from routers.report_router import router as report_router
+from routers.export_router import router as export_router
 
 app.include_router(subscription_request_router)
 app.include_router(patient_exercises_router)
@@ -134,6 +137,17 @@ app.include_router(auth_router)
 app.include_router(exercises_router)
 app.include_router(rehab_router)
 app.include_router(sessions_router)
+app.include_router(report_router)
+app.include_router(export_router)
+
+# serve uploads when using the local media stand-in
+from fastapi.staticfiles import StaticFiles
+from utils.media import MEDIA_STORAGE, LocalStorage
+
+if MEDIA_STORAGE == "local":
+    _local_media = LocalStorage()
+    os.makedirs(_local_media.root, exist_ok=True)
+    app.mount(_local_media.base_url, StaticFiles(directory=_local_media.root), name="media")
 
 
 def generate_frames():
@@ -454,11 +468,25 @@ async def redirect_to_api_info():
     return RedirectResponse(url="/api-info")
 
 from database.connection import engine, Base
+from database.audit_partitions import ensure_audit_partitions
+from database.schema_upgrades import ensure_schema_upgrades
+from services.email_outbox_service import email_worker
+from utils.media import media_uploader
 
 @app.on_event("startup")
 async def startup():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await ensure_schema_upgrades(conn)
+        await ensure_audit_partitions(conn)
+
+    email_worker.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await email_worker.stop()
+    await media_uploader.drain()
 
 
 # To run the app:
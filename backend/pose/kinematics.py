@@ -0,0 +1,89 @@
+# pose/kinematics.py
+#
+# Smoothed angle, angular velocity and acceleration per joint from a small
+# ring buffer, with a causal Savitzky–Golay fit evaluated at the newest
+# frame.
+#
+# For evenly spaced frames, the fit is a fixed (3, WINDOW) coefficient
+# matrix, precomputed once and scaled by the mean dt. When frame spacing
+# jitters by more than DT_TOLERANCE, the same quadratic is fitted to the
+# real timestamps instead. The design matrix depends only on time, so one
+# small pseudo-inverse serves every joint.
+
+import numpy as np
+
+WINDOW = 7           # frames (~0.23 s at 30 fps)
+ORDER = 2            # quadratic: value, velocity, acceleration
+DT_TOLERANCE = 0.15  # relative dt spread still treated as uniform
+
+
+def savgol_coeffs(window: int = WINDOW) -> np.ndarray:
+    """
+    (3, window) matrix: applied to the last `window` samples (oldest
+    first, unit spacing) it gives the fitted quadratic's value, slope
+    and curvature / 2 at the newest sample.
+    """
+    x = np.arange(-(window - 1), 1, dtype=np.float64)
+    return np.linalg.pinv(np.vander(x, ORDER + 1, increasing=True))
+
+
+_COEFFS = savgol_coeffs()
+
+
+class KinematicsFilter:
+    """
+    update(t, values) with values (J,) degrees, NaN = missing.
+    Returns (angle, velocity deg/s, acceleration deg/s²), each (J,).
+    A joint's derivatives stay NaN until its window is complete.
+    """
+
+    __slots__ = ("t", "values", "head", "count", "window", "coeffs")
+
+    def __init__(self, joints: int, window: int = WINDOW):
+        self.window = window
+        self.coeffs = _COEFFS if window == WINDOW else savgol_coeffs(window)
+        self.t = np.zeros(window)
+        self.values = np.full((window, joints), np.nan)
+        self.head = 0
+        self.count = 0
+
+    def _ordered(self):
+        idx = (self.head + np.arange(self.window)) % self.window   # oldest → newest
+        return self.t[idx], self.values[idx]
+
+    def update(self, t: float, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+
+        last = (self.head - 1) % self.window
+        if self.count and t <= self.t[last]:
+            # same timestamp again: replace the newest sample
+            self.values[last] = values
+        else:
+            self.t[self.head] = t
+            self.values[self.head] = values
+            self.head = (self.head + 1) % self.window
+            self.count = min(self.count + 1, self.window)
+
+        nan = np.full(values.shape, np.nan)
+        if self.count < self.window:
+            return values, nan, nan
+
+        ts, ys = self._ordered()
+        steps = np.diff(ts)
+        h = steps.mean()
+
+        if np.abs(steps - h).max() <= DT_TOLERANCE * h:
+            coeffs = self.coeffs
+            scale = np.array([1.0, 1.0 / h, 2.0 / (h * h)])
+        else:
+            coeffs = np.linalg.pinv(np.vander(ts - ts[-1], ORDER + 1, increasing=True))
+            scale = np.array([1.0, 1.0, 2.0])
+
+        fit = (coeffs @ np.where(np.isnan(ys), 0.0, ys)) * scale[:, None]    # (3, J)
+        complete = ~np.isnan(ys).any(axis=0)
+
+        angle = np.where(complete, fit[0], values)
+        velocity = np.where(complete, fit[1], np.nan)
+        acceleration = np.where(complete, fit[2], np.nan)
+        return angle, velocity, acceleration
+
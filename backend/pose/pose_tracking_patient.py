@@ -5,6 +5,7 @@ import math
 from typing import Dict, Any, Optional, Callable
 
 from pose_tracking_patient import evaluate_frame
+from pose.rule_plan import evaluate_plan
 
 mp_pose = mp.solutions.pose
 
@@ -64,47 +65,8 @@ def validate_critical_joints(joints, critical, vis_thr=0.35):
 # Frame evaluation (smoothed + phase-gated)
 # -------------------------------------------------
 def evaluateframe(exercise_def, joints, state, dt):
-    measured_angles = {}
-    smoothed = state.get('smoothedAngles', {})
-    name = exercise_def['exerciseName']
-    
-    # GENERIC: Get rep definition from exercise config/DB
-    rep_def = exercise_def.get('repDefinition', {})  # {'joint': 'left_shoulder', 'validRange': [50,110], ...}
-    if rep_def:
-        joint = rep_def['joint']
-        raw_angle = get_angle(joints, *rep_def.get('joints', [joint, 'left_shoulder', 'left_hip']))  # Default joints
-        smoothed_angle = ema(raw_angle, smoothed.get(joint), alpha=0.7)
-        measured_angles[joint] = smoothed_angle
-        
-        # Generic phase detection (looser thresholds)
-        low, high = rep_def.get('validRange', [50, 110])  # Was [40,100]
-        exit_low, exit_high = rep_def.get('exitRange', [0, 60])
-        
-        if smoothed_angle is not None:
-            phase = 'down' if smoothed_angle < low else 'up' if smoothed_angle > high else 'mid'
-            
-            # Rep count on down->up transition
-            if state.get('phase') == 'down' and phase == 'up':
-                state['repCount'] = state.get('repCount', 0) + 1
-            state['phase'] = phase
-    
-    # Alignment rules (exercise-specific but generic structure)
-    if state.get('phase') in ['mid', 'up']:
-        rules = exercise_def.get('alignmentRules', {})
-        shoulder_rule = rules.get('shoulderLevel')
-        if shoulder_rule and 'left_shoulder' in joints and 'right_shoulder' in joints:
-            diff = abs(joints['left_shoulder'][1] - joints['right_shoulder'][1])
-            if diff > shoulder_rule.get('maxHeightDifference', 0.03):
-                state.setdefault('errorTimers', {}).setdefault('shoulderAsymmetry', 0.0)
-                state['errorTimers']['shoulderAsymmetry'] += dt
-                state.setdefault('errorStats', {}).setdefault('shoulderAsymmetry', {'count': 0, 'totalTime': 0.0})
-                state['errorStats']['shoulderAsymmetry']['totalTime'] += dt
-                if state['errorTimers']['shoulderAsymmetry'] > 0.4:
-                    state['errorStats']['shoulderAsymmetry']['count'] += 1
-                    state['errorTimers']['shoulderAsymmetry'] = 0.0
-            else:
-                state['errorTimers']['shoulderAsymmetry'] = 0.0
-    
+    measured_angles, _ = evaluate_plan(exercise_def, joints, state, dt)
+
     # Update joint stats
     for joint, angle in measured_angles.items():
         if angle is None: continue
@@ -333,6 +295,8 @@ def init_session_state(target_reps: int):
 
 import time
 
+from services.rep_counter import DEFAULT_REP_DEFINITION, RepMachine
+
 def process_frame(
     frame_bytes: bytes,
     exercise_definition: dict,
@@ -346,55 +310,38 @@ def process_frame(
     now = time.time()
 
     # ---- 1) Get raw angle from frame ----
-    rep = exercise_definition.get("repDefinition", {
-        "joint": "left_shoulder",
-        "validRange": [80, 120],
-        "exitRange": [0, 60],
-        "minHoldTime": 0.25,
-    })
-
-    joint_name = rep.get("joint", "left_shoulder")
-    angles = (frame or {}).get("angles") or {}
-
-    # if joint missing, keep angle outside valid range to avoid fake reps
-    raw_angle = float(angles.get(joint_name, 0.0))
+    rep = exercise_definition.get("repDefinition", DEFAULT_REP_DEFINITION)
 
-    low, high = rep["validRange"]
-    exit_low, exit_high = rep["exitRange"]
-    min_hold = rep["minHoldTime"]
+    angles = (frame or {}).get("angles") or {}
 
     # ---- 2) Init state ----
-    state.setdefault("repState", "OUTSIDE")
-    state.setdefault("enteredAt", None)
-    state.setdefault("lastAngle", raw_angle)
     state.setdefault("targetReps", state.get("targetReps", 5))
     state.setdefault("startTime", state.get("startTime", now))
     state.setdefault("status", state.get("status", "ACTIVE"))
-
-    # ---- 3) Smooth angle ----
+    if "repMachine" not in state:
+        machine = RepMachine.from_definition(rep, mode="range")
+        state["repMachine"] = (machine, machine.new_state() if machine else None)
+    machine, rep_state = state["repMachine"]
+    inputs = machine.inputs if machine else [rep.get("joint", "left_shoulder")]
+
+    # ---- 3) Smooth every angle the machine reads ----
+    # if a joint is missing, keep it at 0.0 (outside valid range) to avoid fake reps
     alpha = 0.6
-    angle = alpha * raw_angle + (1 - alpha) * state["lastAngle"]
-    state["lastAngle"] = angle
-
-    # ---- 4) Rep state machine ----
-    if state["repState"] == "OUTSIDE":
-        if low <= angle <= high:
-            state["repState"] = "ENTERED"
-            state["enteredAt"] = now
-
-    elif state["repState"] == "ENTERED":
-        if low <= angle <= high:
-            if now - state["enteredAt"] >= min_hold:
-                state["repCount"] = state.get("repCount", 0) + 1
-                state["repState"] = "COUNTED"
-        else:
-            state["repState"] = "OUTSIDE"
-            state["enteredAt"] = None
-
-    elif state["repState"] == "COUNTED":
-        if exit_low <= angle <= exit_high:
-            state["repState"] = "OUTSIDE"
-            state["enteredAt"] = None
+    smoothed = state.setdefault("lastAngles", {})
+    for name in inputs:
+        raw = float(angles.get(name, 0.0))
+        smoothed[name] = alpha * raw + (1 - alpha) * smoothed.get(name, raw)
+
+    signal = (machine.signal if machine else None) or inputs[:1]
+    angle = sum(smoothed[n] for n in signal) / len(signal) if signal else 0.0
+
+    # ---- 4) Rep state machine (services/rep_counter.py) ----
+    if machine:
+        if machine.step(rep_state, now, smoothed):
+            state["repCount"] = state.get("repCount", 0) + 1
+        state["repState"] = machine.state_name(rep_state)
+    else:
+        state.setdefault("repState", "OUTSIDE")
 
     # ---- 5) Session completion ----
     if state.get("repCount", 0) >= state["targetReps"]:
@@ -409,6 +356,10 @@ def process_frame(
 
 
 from database.models import ExerciseSession
+from services.patient_rollup_service import PatientRollupService
+from services.session_error_service import SessionErrorService
+from services.session_alert_service import SessionAlertService
+from services.angle_trace_service import AngleTraceService
 from datetime import datetime
 
 async def save_exercise_session(
@@ -417,8 +368,11 @@ async def save_exercise_session(
     physician_id: int,
     exercise_id: int,
     patient_exercise_id: int,
-    state: dict
+    state: dict,
+    trace_session_id: Optional[int] = None
 ):
+    # trace_session_id: live session whose recorded angle trace is stored
+    # under the new row's id
     session = ExerciseSession(
         patient_id=patient_id,
         physician_id=physician_id,
@@ -434,6 +388,12 @@ async def save_exercise_session(
     )
 
     db.add(session)
+    await db.flush()
+    await PatientRollupService.add_session(db, session)
+    await SessionErrorService.replace(db, session)
+    await SessionAlertService.replace(db, session, state.get("alertLog"))
+    if trace_session_id is not None:
+        await AngleTraceService.persist(db, session, recorded_as=trace_session_id)
     await db.commit()
     await db.refresh(session)
     return session
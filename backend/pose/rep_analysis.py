@@ -1,14 +1,127 @@
+import numpy as np
+
+
 def detect_rep_phases(angle_series):
-    start_idx = angle_series.index(min(angle_series))
-    peak_idx = angle_series.index(max(angle_series))
+    """Single rep: (start = global min, peak = global max, end = back near start)."""
+    x = np.asarray(angle_series, dtype=np.float64)
+    start_idx = int(np.argmin(x))
+    peak_idx = int(np.argmax(x))
+
+    after = np.flatnonzero(np.abs(x[peak_idx + 1:] - x[start_idx]) < 5)
+    end_idx = peak_idx + 1 + int(after[0]) if after.size else len(x) - 1
+
+    return start_idx, peak_idx, end_idx
+
+
+# -------------------------------------------------
+# MULTI-JOINT / MULTI-REP SEGMENTATION
+# -------------------------------------------------
+def angle_matrix(frames):
+    """
+    frames: objects with .timestamp and .angles {joint: deg}
+    Returns (joints, timestamps (n,), angles (n, J) with NaN for missing).
+    """
+    joints = sorted({j for f in frames if f.angles for j in f.angles})
+    index = {j: i for i, j in enumerate(joints)}
+
+    angles = np.full((len(frames), len(joints)), np.nan)
+    for r, f in enumerate(frames):
+        for j, v in (f.angles or {}).items():
+            angles[r, index[j]] = v
+
+    timestamps = np.array([f.timestamp for f in frames], dtype=np.float64)
+    return joints, timestamps, angles
+
+
+def _fill_nan(x: np.ndarray) -> np.ndarray:
+    ok = ~np.isnan(x)
+    if ok.all() or not ok.any():
+        return x
+    idx = np.arange(len(x))
+    return np.interp(idx, idx[ok], x[ok])
+
+
+def range_of_motion(angles: np.ndarray) -> np.ndarray:
+    """Robust ROM per joint (95th - 5th percentile), NaN-aware."""
+    with np.errstate(all="ignore"):
+        hi = np.nanpercentile(angles, 95, axis=0)
+        lo = np.nanpercentile(angles, 5, axis=0)
+    return np.nan_to_num(hi - lo, nan=0.0)
+
 
-    end_idx = None
-    for i in range(peak_idx + 1, len(angle_series)):
-        if abs(angle_series[i] - angle_series[start_idx]) < 5:
-            end_idx = i
+def pick_primary_joint(joints, angles: np.ndarray, min_coverage: float = 0.6):
+    """Joint that moves the most, among joints seen in most frames."""
+    if not joints:
+        return None
+
+    coverage = (~np.isnan(angles)).mean(axis=0)
+    rom = np.where(coverage >= min_coverage, range_of_motion(angles), -1.0)
+    best = int(np.argmax(rom))
+    return joints[best] if rom[best] >= 0 else None
+
+
+def segment_reps(
+    series,
+    enter: float = 0.65,
+    exit: float = 0.35,
+    min_rom: float = 15.0,
+    smooth: int = 3,
+    end_tolerance: float = 5.0
+):
+    """
+    Finds every rep in one angle series with hysteresis thresholds at
+    `enter` / `exit` of the range of motion (direction-agnostic: the
+    side the recording starts on is treated as rest).
+
+    Returns [(start_i, peak_i, end_i), ...].
+    """
+    x = _fill_nan(np.asarray(series, dtype=np.float64))
+    n = len(x)
+    if n < 3 or np.isnan(x).all():
+        return []
+
+    if smooth > 1 and n >= smooth:
+        x = np.convolve(np.pad(x, (smooth // 2, smooth - 1 - smooth // 2), mode="edge"),
+                        np.ones(smooth) / smooth, mode="valid")
+
+    lo, hi = np.percentile(x, 5), np.percentile(x, 95)
+    rom = hi - lo
+    if rom < min_rom:
+        return []
+
+    # rest side = where the recording starts; flip so a rep always goes "up"
+    sign = 1.0 if np.median(x[: max(3, n // 20)]) <= (lo + hi) / 2 else -1.0
+    y = sign * (x - (lo + hi) / 2) / rom + 0.5         # ~0 at rest, ~1 at peak
+
+    # hysteresis state: 1 after crossing `enter`, 0 after crossing `exit`,
+    # carried forward in between
+    marks = np.full(n, -1, dtype=np.int8)
+    marks[y >= enter] = 1
+    marks[y <= exit] = 0
+    last = np.maximum.accumulate(np.where(marks >= 0, np.arange(n), -1))
+    state = np.where(last >= 0, marks[np.maximum(last, 0)], 0)
+
+    edges = np.diff(np.concatenate(([0], state, [0])))
+    rises = np.flatnonzero(edges == 1)           # active run starts
+    falls = np.flatnonzero(edges == -1)          # active run ends (exclusive)
+
+    reps = []
+    prev_end = 0
+    for k, (a, b) in enumerate(zip(rises, falls)):
+        if b == n and state[-1] == 1 and k > 0:
+            # recording stopped mid-rep
             break
 
-    if end_idx is None:
-        end_idx = len(angle_series) - 1
+        peak = a + int(np.argmax(y[a:b]))
+        start = prev_end + int(np.argmin(y[prev_end:a + 1]))
 
-    return start_idx, peak_idx, end_idx
+        # end: first return near the start angle before the next rep
+        nxt = rises[k + 1] if k + 1 < len(rises) else n
+        tail = y[peak:nxt]
+        close = np.flatnonzero(np.abs(tail - y[start]) * rom < end_tolerance)
+        end = peak + int(close[0]) if close.size else peak + int(np.argmin(tail))
+
+        reps.append((start, peak, end))
+        prev_end = end
+
+    return reps
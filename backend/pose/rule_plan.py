@@ -0,0 +1,309 @@
+# pose/rule_plan.py
+#
+# Exercise presets (ExercisePreset.preset) compiled once per session into a
+# flat evaluation plan: landmark index arrays, threshold arrays and op codes.
+# A frame is then a handful of NumPy operations, however many rules exist.
+#
+# Preset JSON:
+#   angleDefinitions  {name: [a, vertex, c]}                  landmark names
+#   repDefinition     {"joint": name} or {"angles": [names]}  (averaged)
+#                     "validRange": [low, high]  down below low, up above
+#                     high; a rep is counted on down → up, with any
+#                     frames in between (services/rep_counter.py)
+#   alignmentRules    {key: rule}  counted in errorStats after holdTime
+#   riskRules         {key: rule}  alerts, see services/risk_detector.py
+#   smoothing         EMA alpha (default 0.7)
+#
+#   rule: {"type": "angle",  "angle": name | "angles": [names] | "points": [a, b, c],
+#          "raw": bool (skip smoothing)}
+#      or {"type": "height_diff" | "x_diff", "landmarks": [a, b]}
+#      plus "min" / "max", "phases" (default all), "holdTime",
+#      "errorKey", "message" / "errorMessage"
+#
+# Presets without angleDefinitions / repDefinition take them from PRESETS.
+
+import numpy as np
+
+from services.rep_counter import RepMachine
+from services.risk_detector import RiskDetector
+from utils.capture_codec import ANGLE_DEFS, triangle_angles
+
+PHASES = {"idle": 1, "down": 2, "mid": 4, "up": 8}
+ALL_PHASES = 15
+
+OP_ANGLE, OP_HEIGHT_DIFF, OP_X_DIFF = 0, 1, 2
+_OPS = {"angle": OP_ANGLE, "height_diff": OP_HEIGHT_DIFF, "x_diff": OP_X_DIFF}
+
+# built-in definitions (exercise name → preset defaults)
+PRESETS = {
+    "ShoulderRaise": {
+        "angleDefinitions": {
+            "left_shoulder": ["left_elbow", "left_shoulder", "left_hip"],
+            "right_shoulder": ["right_elbow", "right_shoulder", "right_hip"],
+        },
+        "repDefinition": {
+            "angles": ["left_shoulder", "right_shoulder"],
+            "validRange": [40, 100],
+        },
+        "riskRules": {
+            "hyperextension": {
+                "type": "angle",
+                "angles": ["left_shoulder", "right_shoulder"],
+                "smooth": 0.7,
+                "max": 165,
+                "message": "Shoulder hyperextension risk",
+            },
+            # trunk lean: shoulder–hip–knee is ~180° upright, so more
+            # than 40° of forward bend is a hip angle below 140°
+            "spine": {
+                "type": "angle",
+                "points": ["left_shoulder", "left_hip", "left_knee"],
+                "min": 140,
+                "message": "Excessive spine bending",
+            },
+        },
+    },
+}
+
+
+def _legacy_rule(key, rule):
+    # {"shoulderLevel": {"maxHeightDifference": ...}} from older presets
+    if key == "shoulderLevel" and "type" not in rule:
+        return {
+            "type": "height_diff",
+            "landmarks": ["left_shoulder", "right_shoulder"],
+            "max": rule.get("maxHeightDifference", 0.03),
+            "phases": ["mid", "up"],
+            "holdTime": 0.4,
+            "errorKey": "shoulderAsymmetry",
+            "message": rule.get("errorMessage"),
+        }
+    return rule
+
+
+class RulePlan:
+    __slots__ = (
+        "landmarks", "angles", "angle_idx", "report", "alpha",
+        "rep_w", "rep_lo", "rep_hi", "rep_machine",
+        "keys", "messages", "op", "w", "a", "b", "raw",
+        "lo", "hi", "phases", "hold", "detector",
+    )
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class PlanState:
+    """Per-session runtime values, kept next to the plan in the state dict."""
+
+    __slots__ = ("smoothed", "timers", "clock", "risk", "reps")
+
+    def __init__(self, plan: RulePlan):
+        self.smoothed = np.full(len(plan.angles), np.nan)
+        self.timers = np.zeros(len(plan))
+        self.clock = 0.0
+        self.risk = plan.detector.new_window()
+        self.reps = plan.rep_machine.new_state() if plan.rep_machine else None
+
+
+def compile_plan(exercise_def: dict) -> RulePlan:
+    preset = {**PRESETS.get(exercise_def.get("exerciseName"), {}), **exercise_def}
+
+    landmarks = {}
+    angles = {}
+
+    def landmark(name):
+        return landmarks.setdefault(name, len(landmarks))
+
+    def angle(name, points=None):
+        if name not in angles:
+            points = points or ANGLE_DEFS.get(name)
+            if not points:
+                return None
+            angles[name] = [landmark(p) for p in points]
+        return list(angles).index(name)
+
+    defined = preset.get("angleDefinitions") or {}
+    for name, points in defined.items():
+        angle(name, points)
+
+    # ---- rep definition ----
+    rep = preset.get("repDefinition") or {}
+    rep_names = rep.get("angles") or ([rep["joint"]] if rep.get("joint") else [])
+    if rep.get("joint") and len(rep.get("joints") or []) == 3:
+        angle(rep["joint"], rep["joints"])
+    rep_cols = [c for c in (angle(n) for n in rep_names) if c is not None]
+    if rep.get("transitions"):
+        machine = RepMachine.from_definition(rep)
+        for name in machine.inputs:
+            angle(name)     # joints the table's zones condition on
+    elif rep_cols:
+        machine = RepMachine.from_definition(
+            {**rep, "angles": [n for n in rep_names if n in angles]}
+        )
+    else:
+        machine = None
+
+    # ---- alignment rules ----
+    rules = [
+        (key, _legacy_rule(key, rule))
+        for key, rule in (preset.get("alignmentRules") or {}).items()
+    ]
+
+    keys, messages, ops, cols, pairs, raw, lo, hi, phases, hold = ([] for _ in range(10))
+    for key, rule in rules:
+        op = _OPS.get(rule.get("type"))
+        if op is None:
+            continue
+
+        if op == OP_ANGLE:
+            if rule.get("points"):
+                names = ["__" + "/".join(rule["points"])]
+                angle(names[0], rule["points"])
+            else:
+                names = rule.get("angles") or [rule.get("angle")]
+            c = [x for x in (angle(n) for n in names if n) if x is not None]
+            if not c:
+                continue
+            pair = (0, 0)
+        else:
+            a, b = (rule.get("landmarks") or [None, None])[:2]
+            if not a or not b:
+                continue
+            c, pair = [], (landmark(a), landmark(b))
+
+        keys.append(rule.get("errorKey", key))
+        messages.append(rule.get("message") or rule.get("errorMessage") or key)
+        ops.append(op)
+        cols.append(c)
+        pairs.append(pair)
+        raw.append(bool(rule.get("raw")))
+        lo.append(float(rule.get("min", -np.inf)))
+        hi.append(float(rule.get("max", np.inf)))
+        phases.append(
+            sum(PHASES.get(p, 0) for p in rule["phases"]) if rule.get("phases") else ALL_PHASES
+        )
+        hold.append(float(rule.get("holdTime", 0.0)))
+
+    plan = RulePlan()
+    plan.landmarks = list(landmarks)
+    plan.angles = list(angles)
+    plan.angle_idx = np.array(list(angles.values()), dtype=np.intp).reshape(-1, 3)
+    # reported angles: declared ones + the rep angles, in order, once
+    plan.report = [
+        (n, plan.angles.index(n))
+        for n in dict.fromkeys([*defined, *rep_names]) if n in angles
+    ]
+    plan.alpha = float(preset.get("smoothing", 0.7))
+
+    plan.rep_w = np.zeros(len(angles))
+    if rep_cols:
+        plan.rep_w[rep_cols] = 1.0 / len(rep_cols)
+    low, high = rep.get("validRange") or [np.nan, np.nan]
+    plan.rep_lo, plan.rep_hi = float(low), float(high)
+    plan.rep_machine = machine
+
+    # angle operands as a (rules, angles) averaging matrix
+    plan.w = np.zeros((len(keys), len(angles)))
+    for r, c in enumerate(cols):
+        if c:
+            plan.w[r, c] = 1.0 / len(c)
+
+    plan.keys = keys
+    plan.messages = messages
+    plan.op = np.array(ops, dtype=np.int8)
+    plan.a = np.array([p[0] for p in pairs], dtype=np.intp)
+    plan.b = np.array([p[1] for p in pairs], dtype=np.intp)
+    plan.raw = np.array(raw, dtype=bool)
+    plan.lo = np.array(lo)
+    plan.hi = np.array(hi)
+    plan.phases = np.array(phases, dtype=np.int8)
+    plan.hold = np.array(hold)
+
+    plan.detector = RiskDetector.from_preset(preset)
+    return plan
+
+
+def plan_for(exercise_def: dict, state: dict):
+    """Compiles on the first frame of a session."""
+    if "rulePlan" not in state:
+        plan = compile_plan(exercise_def)
+        state["rulePlan"] = (plan, PlanState(plan))
+    return state["rulePlan"]
+
+
+def _weighted(w: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """w @ values, NaN where any weighted value is missing."""
+    missing = np.isnan(values)
+    out = w @ np.where(missing, 0.0, values)
+    return np.where((w > 0) @ missing, np.nan, out)
+
+
+def evaluate_plan(exercise_def: dict, joints: dict, state: dict, dt: float):
+    """
+    Updates state["phase"], state["repCount"] and state["errorStats"].
+    Returns (measured angles {name: smoothed}, alerts {key: message}).
+    """
+    plan, rt = plan_for(exercise_def, state)
+
+    # ---- landmarks → angles (all at once) ----
+    pts = np.array([
+        (j["x"], j["y"]) if j else (np.nan, np.nan)
+        for j in (joints.get(name) for name in plan.landmarks)
+    ], dtype=np.float64).reshape(-1, 2)
+
+    raw = triangle_angles(pts, plan.angle_idx) if len(plan.angle_idx) else np.empty(0)
+    prev = rt.smoothed
+    smoothed = np.where(np.isnan(prev), raw, plan.alpha * raw + (1 - plan.alpha) * prev)
+    rt.smoothed = smoothed = np.where(np.isnan(raw), prev, smoothed)
+
+    rt.clock += dt
+
+    # ---- phase / reps ----
+    if plan.rep_w.any():
+        avg = _weighted(plan.rep_w[None], smoothed)[0]
+        if not np.isnan(avg):
+            state["phase"] = "down" if avg < plan.rep_lo else "up" if avg > plan.rep_hi else "mid"
+    if plan.rep_machine and plan.rep_machine.step(
+        rt.reps, rt.clock, dict(zip(plan.angles, smoothed.tolist()))
+    ):
+        state["repCount"] = state.get("repCount", 0) + 1
+
+    measured = {
+        name: None if np.isnan(smoothed[i]) else float(smoothed[i])
+        for name, i in plan.report
+    }
+
+    # ---- risk rules (sliding window, services/risk_detector.py) ----
+    alerts = plan.detector.detect(rt.risk, rt.clock, joints)
+
+    if not len(plan):
+        return measured, alerts
+
+    # ---- alignment rules (one vector per op) ----
+    value = np.where(
+        plan.raw,
+        _weighted(plan.w, raw),
+        _weighted(plan.w, smoothed)
+    )
+    diff = pts[plan.a] - pts[plan.b]
+    value = np.where(plan.op == OP_HEIGHT_DIFF, np.abs(diff[:, 1]), value)
+    value = np.where(plan.op == OP_X_DIFF, np.abs(diff[:, 0]), value)
+
+    active = (plan.phases & PHASES.get(state.get("phase"), 0)) != 0
+    checked = active & ~np.isnan(value)
+    violated = checked & ((value < plan.lo) | (value > plan.hi))
+
+    # time while violated, counted after holdTime
+    rt.timers[checked & ~violated] = 0.0
+    if violated.any():
+        rt.timers[violated] += dt
+        stats = state.setdefault("errorStats", {})
+        for i in np.flatnonzero(violated):
+            s = stats.setdefault(plan.keys[i], {"count": 0, "totalTime": 0.0})
+            s["totalTime"] += dt
+            if rt.timers[i] > plan.hold[i]:
+                s["count"] += 1
+                rt.timers[i] = 0.0
+
+    return measured, alerts
@@ -1,27 +1,167 @@
-import statistics
+import numpy as np
+
+from pose.rep_analysis import angle_matrix
+
+# frames in the "most stable" window (~0.5 s at 30 fps)
+STABLE_WINDOW = 15
+
+
+def _label(mean_dispersion):
+    if mean_dispersion is None:
+        return "poor"
+    if mean_dispersion < 3:
+        return "excellent"
+    elif mean_dispersion < 6:
+        return "good"
+    return "poor"
+
+
+def _round(v):
+    return None if v is None or np.isnan(v) else round(float(v), 3)
+
+
+# -------------------------------------------------
+# BATCH (one vectorized pass over a capture)
+# -------------------------------------------------
+def analyze_stability(joints, angles, window: int = STABLE_WINDOW):
+    """
+    angles: (frames, joints) degrees, NaN for missing.
+
+    - dispersion: per-frame spread across joints (population std)
+    - jointJitter: per-joint std of frame-to-frame change
+    - stableWindow: `window` consecutive frames with the least motion;
+      referenceFrame is the lowest-dispersion frame inside it
+    """
+    angles = np.asarray(angles, dtype=np.float64)
+    n = len(angles)
+    if n == 0:
+        return {"stability": "unknown"}
+
+    with np.errstate(all="ignore"):
+        dispersion = np.nanstd(angles, axis=1)
+        dispersion[(~np.isnan(angles)).sum(axis=1) < 2] = np.nan
+
+        delta = np.diff(angles, axis=0)                          # (n-1, J)
+        jitter = np.nanstd(delta, axis=0) if n > 1 else np.full(len(joints), np.nan)
+        motion = np.nanmean(np.abs(delta), axis=1)               # (n-1,)
+
+    valid = ~np.isnan(dispersion)
+    mean_dispersion = float(dispersion[valid].mean()) if valid.any() else None
+
+    # ---- most stable window (rolling mean motion via cumsum) ----
+    w = max(1, min(window, n))
+    start = 0
+    if w > 1 and n > 1:
+        m = np.where(np.isnan(motion), np.inf, motion)
+        csum = np.concatenate(([0.0], np.cumsum(np.where(np.isinf(m), 0.0, m))))
+        gaps = np.concatenate(([0], np.cumsum(np.isinf(m))))
+        k = w - 1                                                 # transitions per window
+        totals = csum[k:] - csum[:-k]
+        totals[(gaps[k:] - gaps[:-k]) > 0] = np.inf
+        if np.isfinite(totals).any():
+            start = int(np.argmin(totals))
+    end = start + w - 1
+
+    span = np.where(valid[start:end + 1], dispersion[start:end + 1], np.inf)
+    if np.isfinite(span).any():
+        reference = start + int(np.argmin(span))
+    elif valid.any():
+        reference = int(np.argmin(np.where(valid, dispersion, np.inf)))
+    else:
+        reference = start
+
+    return {
+        "stability": _label(mean_dispersion),
+        "meanDispersion": _round(mean_dispersion),
+        "jointJitter": {
+            j: _round(jitter[i]) for i, j in enumerate(joints) if not np.isnan(jitter[i])
+        },
+        "stableWindow": {
+            "start": start,
+            "end": end,
+            "referenceFrame": reference
+        }
+    }
+
 
 def assess_stability(frames):
+    """frames: objects with .timestamp and .angles {joint: deg}"""
     if not frames:
         return {"stability": "unknown"}
 
-    variances = []
+    joints, _, angles = angle_matrix(frames)
+    return analyze_stability(joints, angles)
 
-    for frame in frames:
-        if not frame.angles:
-            continue
 
-        values = list(frame.angles.values())
-        if len(values) > 1:
-            variances.append(statistics.pstdev(values))
+# -------------------------------------------------
+# LIVE (incremental, Welford)
+# O(joints) per frame, no frame history kept
+# -------------------------------------------------
+class StabilityTracker:
+    __slots__ = ("_index", "_last", "_n", "_mean", "_m2", "_frames", "_disp_mean")
 
-    if not variances:
-        return {"stability": "poor"}
+    def __init__(self):
+        self._index = {}
+        self._last = np.empty(0)
+        self._n = np.empty(0, dtype=np.int64)     # deltas seen per joint
+        self._mean = np.empty(0)
+        self._m2 = np.empty(0)
+        self._frames = 0                          # frames with >= 2 joints
+        self._disp_mean = 0.0
 
-    avg = sum(variances) / len(variances)
+    def _grow(self, joints):
+        new = [j for j in joints if j not in self._index]
+        if not new:
+            return
+        for j in new:
+            self._index[j] = len(self._index)
+        k = len(new)
+        self._last = np.concatenate((self._last, np.full(k, np.nan)))
+        self._n = np.concatenate((self._n, np.zeros(k, dtype=np.int64)))
+        self._mean = np.concatenate((self._mean, np.zeros(k)))
+        self._m2 = np.concatenate((self._m2, np.zeros(k)))
 
-    if avg < 3:
-        return {"stability": "excellent"}
-    elif avg < 6:
-        return {"stability": "good"}
-    else:
-        return {"stability": "poor"}
+    def update(self, angles: dict):
+        if not angles:
+            return
+
+        values = {}
+        for j, v in angles.items():
+            try:
+                values[j] = float(v)
+            except (TypeError, ValueError):
+                continue
+        if not values:
+            return
+
+        self._grow(values)
+        row = np.full(len(self._index), np.nan)
+        row[[self._index[j] for j in values]] = list(values.values())
+
+        # per-frame dispersion: running mean
+        present = row[~np.isnan(row)]
+        if len(present) >= 2:
+            self._frames += 1
+            self._disp_mean += (float(present.std()) - self._disp_mean) / self._frames
+
+        # per-joint jitter: Welford over frame-to-frame deltas
+        delta = row - self._last
+        ok = ~np.isnan(delta)
+        if ok.any():
+            self._n[ok] += 1
+            d = delta[ok] - self._mean[ok]
+            self._mean[ok] += d / self._n[ok]
+            self._m2[ok] += d * (delta[ok] - self._mean[ok])
+
+        self._last = row
+
+    def summary(self):
+        mean_dispersion = self._disp_mean if self._frames else None
+        return {
+            "stability": "unknown" if not self._index else _label(mean_dispersion),
+            "meanDispersion": _round(mean_dispersion),
+            "jointJitter": {
+                j: _round(np.sqrt(self._m2[i] / self._n[i]))
+                for j, i in self._index.items() if self._n[i]
+            }
+        }
@@ -0,0 +1,177 @@
+import math
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from pose.rep_analysis import _fill_nan
+
+# reps are compared after resampling to a fixed length
+TEMPLATE_POINTS = 48
+# Sakoe-Chiba band radius, as a fraction of TEMPLATE_POINTS
+DTW_BAND = float(os.getenv("DTW_BAND", 0.1))
+# mean deviation (degrees) that scores 0
+MAX_DEVIATION_DEG = float(os.getenv("MAX_DEVIATION_DEG", 45))
+
+
+def resample(angles, points: int = TEMPLATE_POINTS) -> np.ndarray:
+    """(n, J) → (points, J) over normalized time; gaps are interpolated."""
+    a = np.asarray(angles, dtype=np.float64)
+    n = len(a)
+    out = np.full((points, a.shape[1]), np.nan)
+    if n == 0:
+        return out
+
+    src = np.linspace(0.0, 1.0, n)
+    dst = np.linspace(0.0, 1.0, points)
+    for k in range(a.shape[1]):
+        col = _fill_nan(a[:, k])
+        if not np.isnan(col).all():
+            out[:, k] = np.interp(dst, src, col) if n > 1 else col[0]
+    return out
+
+
+def keyframe_trajectory(start: dict, peak: dict, end: dict, joints, points: int = TEMPLATE_POINTS):
+    """Piecewise-linear rep (start → peak → end) from three template poses."""
+    keys = np.array([
+        [float(pose.get(j, np.nan)) for j in joints]
+        for pose in (start or {}, peak or {}, end or {})
+    ])
+    return resample(keys, points)
+
+
+# -------------------------------------------------
+# LOWER BOUND (LB_Keogh, multivariate)
+# -------------------------------------------------
+def envelope(templates: np.ndarray, r: int):
+    """Upper / lower envelope of (..., L, J) templates within band r."""
+    pad = [(0, 0)] * (templates.ndim - 2) + [(r, r), (0, 0)]
+    padded = np.pad(templates, pad, mode="edge")
+    win = sliding_window_view(padded, 2 * r + 1, axis=-2)     # (..., L, J, 2r+1)
+    return win.max(axis=-1), win.min(axis=-1)
+
+
+def lb_keogh(query: np.ndarray, upper: np.ndarray, lower: np.ndarray) -> np.ndarray:
+    """query (L, J), upper / lower (..., L, J) → squared bound per template."""
+    above = np.maximum(query - upper, 0.0)
+    below = np.maximum(lower - query, 0.0)
+    return (above * above + below * below).sum(axis=(-2, -1))
+
+
+# -------------------------------------------------
+# BANDED DTW (squared euclidean over joints)
+# -------------------------------------------------
+def dtw_banded(query: np.ndarray, template: np.ndarray, r: int, best: float = np.inf):
+    """
+    Returns (distance, cumulative matrix), or (inf, None) once every
+    cell of a row exceeds `best` (every path crosses every row).
+
+    Each row is vectorized: with A[j] = min(D[i-1, j-1], D[i-1, j]),
+        D[i, j] = min_k<=j (A[k] + c[k] + ... + c[j])
+    which is a prefix sum plus a running minimum.
+    """
+    n, m = len(query), len(template)
+    diff = query[:, None, :] - template[None, :, :]
+    cost = (diff * diff).sum(axis=-1)                          # (n, m)
+
+    D = np.full((n, m), np.inf)
+    prev = np.full(m, np.inf)
+    for i in range(n):
+        lo, hi = max(0, i - r), min(m, i + r + 1)
+
+        if i == 0:
+            a = np.full(m, np.inf)
+            a[0] = 0.0
+        else:
+            a = prev.copy()
+            a[1:] = np.minimum(prev[1:], prev[:-1])
+        a[:lo] = np.inf
+
+        c = cost[i]
+        csum = np.cumsum(c)
+        row = csum + np.minimum.accumulate(a - (csum - c))
+        row[:lo] = np.inf
+        row[hi:] = np.inf
+
+        if row.min() > best:
+            return np.inf, None
+
+        D[i] = prev = row
+
+    return float(D[-1, -1]), D
+
+
+def warping_path(D: np.ndarray) -> np.ndarray:
+    i, j = D.shape[0] - 1, D.shape[1] - 1
+    path = [(i, j)]
+    while i > 0 or j > 0:
+        if i == 0:
+            j -= 1
+        elif j == 0:
+            i -= 1
+        else:
+            step = int(np.argmin((D[i - 1, j - 1], D[i - 1, j], D[i, j - 1])))
+            i, j = ((i - 1, j - 1), (i - 1, j), (i, j - 1))[step]
+        path.append((i, j))
+    return np.array(path[::-1])
+
+
+def _score(deviation: float) -> float:
+    return round(100.0 * max(0.0, 1.0 - deviation / MAX_DEVIATION_DEG), 1)
+
+
+# -------------------------------------------------
+# NEAREST TEMPLATE REP
+# -------------------------------------------------
+def match_rep(query_joints, query_angles, template_joints, templates, band: float = DTW_BAND):
+    """
+    query_angles: (n, J) one patient rep, any length
+    templates:    (k, L, J') physician reps, resampled to L points
+
+    Candidates are visited in LB_Keogh order; DTW stops early against
+    the best distance so far, and stops altogether once the next lower
+    bound cannot win.
+    """
+    templates = np.asarray(templates, dtype=np.float64)
+    if templates.ndim != 3 or not len(templates):
+        return None
+
+    query = resample(query_angles, templates.shape[1])
+    q_index = {j: i for i, j in enumerate(query_joints)}
+    cols = [
+        (q_index[j], k) for k, j in enumerate(template_joints)
+        if j in q_index
+        and not np.isnan(query[:, q_index[j]]).any()
+        and not np.isnan(templates[:, :, k]).any()
+    ]
+    if not cols:
+        return None
+
+    joints = [template_joints[k] for _, k in cols]
+    query = query[:, [q for q, _ in cols]]
+    templates = templates[:, :, [k for _, k in cols]]
+
+    r = max(1, math.ceil(band * templates.shape[1]))
+    upper, lower = envelope(templates, r)
+    lb = lb_keogh(query, upper, lower)
+
+    best, best_k, best_D = np.inf, None, None
+    for k in np.argsort(lb, kind="stable"):
+        if lb[k] >= best:
+            break
+        dist, D = dtw_banded(query, templates[k], r, best)
+        if dist < best:
+            best, best_k, best_D = dist, int(k), D
+
+    path = warping_path(best_D)
+    deviation = np.abs(query[path[:, 0]] - templates[best_k][path[:, 1]]).mean(axis=0)
+
+    return {
+        "templateRep": best_k,
+        "distance": round(math.sqrt(best / len(path)), 2),
+        "score": _score(float(deviation.mean())),
+        "joints": {
+            j: {"deviation": round(float(d), 2), "score": _score(float(d))}
+            for j, d in zip(joints, deviation)
+        }
+    }
@@ -4,6 +4,8 @@ import time
 import math
 from typing import Dict, Any, Optional, Callable
 
+from pose.rule_plan import evaluate_plan
+
 mp_pose = mp.solutions.pose
 
 
@@ -64,64 +66,11 @@ def validate_critical_joints(joints, critical, vis_thr=0.35):
 
 # -------------------------------------------------
 # Frame evaluation (smoothed + phase-gated)
+# angles, reps and alignment rules come from the compiled preset
+# (pose/rule_plan.py); new exercises only need preset JSON
 # -------------------------------------------------
 def evaluate_frame(exercise_def, joints, state, dt):
-    measured_angles = {}
-    smoothed = state["smoothedAngles"]
-
-    name = exercise_def["exerciseName"]
-
-    # ------------- SHOULDER RAISE -------------
-    if name == "ShoulderRaise":
-        raw_left = get_angle(joints, "left_elbow", "left_shoulder", "left_hip")
-        raw_right = get_angle(joints, "right_elbow", "right_shoulder", "right_hip")
-
-        smoothed["left_shoulder"] = ema(raw_left, smoothed.get("left_shoulder"))
-        smoothed["right_shoulder"] = ema(raw_right, smoothed.get("right_shoulder"))
-
-        measured_angles["left_shoulder"] = smoothed["left_shoulder"]
-        measured_angles["right_shoulder"] = smoothed["right_shoulder"]
-
-        if smoothed["left_shoulder"] and smoothed["right_shoulder"]:
-            avg = (smoothed["left_shoulder"] + smoothed["right_shoulder"]) / 2.0
-        else:
-            avg = None
-
-        # ---- Phase detection & reps ----
-        if avg is not None:
-            if avg < 40:
-                phase = "down"
-            elif avg > 100:
-                phase = "up"
-            else:
-                phase = "mid"
-
-            if state["phase"] == "down" and phase == "up":
-                state["repCount"] += 1
-
-            state["phase"] = phase
-
-        # ---- Alignment rule (only active in mid/up) ----
-        if state["phase"] in ("mid", "up"):
-            rule = exercise_def.get("alignmentRules", {}).get("shoulderLevel")
-            if rule and "left_shoulder" in joints and "right_shoulder" in joints:
-                diff = abs(
-                    joints["left_shoulder"]["y"] -
-                    joints["right_shoulder"]["y"]
-                )
-
-                if diff > rule["maxHeightDifference"]:
-                    state["errorTimers"]["shoulderAsymmetry"] += dt
-                    state["errorStats"]["shoulderAsymmetry"]["totalTime"] += dt
-
-                    if state["errorTimers"]["shoulderAsymmetry"] > 0.4:
-                        state["errorStats"]["shoulderAsymmetry"]["count"] += 1
-                        state["errorTimers"]["shoulderAsymmetry"] = 0.0
-                else:
-                    state["errorTimers"]["shoulderAsymmetry"] = 0.0
-
-    # (Later: add more exercises here branching on exercise_def["exerciseName"])
-
+    measured_angles, _ = evaluate_plan(exercise_def, joints, state, dt)
     return measured_angles
 
 
@@ -176,10 +125,6 @@ def run_exercise_session(
 
         "repCount": 0,
 
-        "errorTimers": {
-            "shoulderAsymmetry": 0.0
-        },
-
         "errorStats": {
             "shoulderAsymmetry": {
                 "count": 0,
@@ -7,6 +7,10 @@ from typing import Dict, Any
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from database.models import ExerciseSession
+from services.patient_rollup_service import PatientRollupService
+from services.session_error_service import SessionErrorService
+from services.session_alert_service import SessionAlertService
+from pose.rule_plan import evaluate_plan
 
 mp_pose = mp.solutions.pose
 
@@ -69,45 +73,10 @@ def validate_critical_joints(joints, critical, vis_thr=0.35):
 # FRAME EVALUATION
 # -------------------------------------------------
 def evaluate_frame(exercise_def, joints, state, dt):
-    smoothed = state["smoothedAngles"]
-    alerts = {}
-    measured = {}
-
-    if exercise_def["exerciseName"] == "ShoulderRaise":
-        raw_l = get_angle(joints, "left_elbow", "left_shoulder", "left_hip")
-        raw_r = get_angle(joints, "right_elbow", "right_shoulder", "right_hip")
-
-        smoothed["l"] = ema(raw_l, smoothed.get("l"))
-        smoothed["r"] = ema(raw_r, smoothed.get("r"))
-
-        measured["left_shoulder"] = smoothed["l"]
-        measured["right_shoulder"] = smoothed["r"]
-
-        avg = None
-        if smoothed["l"] and smoothed["r"]:
-            avg = (smoothed["l"] + smoothed["r"]) / 2
-
-        if avg is not None:
-            if avg < 40:
-                phase = "down"
-            elif avg > 100:
-                phase = "up"
-            else:
-                phase = "mid"
-
-            if state["phase"] == "down" and phase == "up":
-                state["repCount"] += 1
-
-            state["phase"] = phase
-
-        if avg and avg > 165:
-            alerts["hyperextension"] = "Shoulder hyperextension risk"
-
-        spine = get_angle(joints, "left_shoulder", "left_hip", "left_knee")
-        if spine and spine > 40:
-            alerts["spine"] = "Excessive spine bending"
+    measured, alerts = evaluate_plan(exercise_def, joints, state, dt)
 
     state["alerts"] = list(alerts.values())
+    SessionAlertService.track(state, alerts, dt)
     state["jointStats"].update(measured)
 
     return measured
@@ -211,6 +180,10 @@ async def save_exercise_session(
     )
 
     db.add(session)
+    await db.flush()
+    await PatientRollupService.add_session(db, session)
+    await SessionErrorService.replace(db, session)
+    await SessionAlertService.replace(db, session, state.get("alertLog"))
     await db.commit()
     await db.refresh(session)
 
@@ -1,6 +1,7 @@
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import selectinload
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import selectinload, contains_eager
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
@@ -9,6 +10,7 @@ from database.models import AuditLog, User, Physician, Patient, RehabPlan, Sessi
 from routers.auth_router import require_admin, require_role
 from services.admin_service import AdminService
 from services.audit_service import AuditService
+from utils.pagination import PageParams, paginate
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -19,13 +21,31 @@ async def get_admin_stats(user=Depends(require_admin), db: AsyncSession = Depend
 
 @router.get("/audit-logs")
 async def get_audit_logs(
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    action: Optional[str] = Query(None),
+    target_type: Optional[str] = Query(None),
+    page: PageParams = Depends(),
     user=Depends(require_admin),
     db: AsyncSession = Depends(get_db)
 ):
-    q = await db.execute(
-        select(AuditLog).order_by(AuditLog.created_at.desc())
+    query = select(AuditLog)
+
+    if date_from is not None:
+        query = query.where(AuditLog.created_at >= date_from)
+    if date_to is not None:
+        query = query.where(AuditLog.created_at < date_to)
+    if action:
+        query = query.where(AuditLog.action == action)
+    if target_type:
+        query = query.where(AuditLog.target_type == target_type)
+
+    logs, next_cursor = await paginate(
+        db, query,
+        columns=[AuditLog.created_at, AuditLog.id],
+        page=page,
+        descending=True
     )
-    logs = q.scalars().all()
 
     return {
         "success": True,
@@ -40,7 +60,8 @@ async def get_audit_logs(
                 "created_at": l.created_at,
             }
             for l in logs
-        ]
+        ],
+        "next_cursor": next_cursor
     }
 
 
@@ -146,32 +167,12 @@ async def get_pending_physicians(user=Depends(require_admin), db: AsyncSession =
 
 @router.post("/physicians/{user_id}/approve")
 async def approve_physician(user_id: int, user=Depends(require_admin), db: AsyncSession = Depends(get_db)):
-    from services.audit_service import AuditService
-
-    await AuditService.log(
-        db=db,
-        admin_id=user["user_id"],
-        action="APPROVE_PHYSICIAN",
-        target_type="physician",
-        target_id=user_id,
-        description="Physician approved by admin"
-    )
-
-    return await AdminService.approve_physician(user_id, db)
+    # audit row is committed in the same transaction as the approval
+    return await AdminService.approve_physician(user_id, db, admin_id=user["user_id"])
 
 @router.post("/physicians/{user_id}/reject")
 async def reject_physician(user_id: int, user=Depends(require_admin), db: AsyncSession = Depends(get_db)):
-    from services.audit_service import AuditService
-
-    await AuditService.log(
-        db=db,
-        admin_id=user["user_id"],
-        action="REJECT_PHYSICIAN",
-        target_type="physician",
-        target_id=user_id,
-        description="Physician approved by admin"
-    )
-    return await AdminService.reject_physician(user_id, db)
+    return await AdminService.reject_physician(user_id, db, admin_id=user["user_id"])
 
 @router.get("/physician/patients")
 async def my_patients(
@@ -204,13 +205,13 @@ async def disable_user(
         raise HTTPException(404, "User not found")
 
     user_obj.is_active = False
-    await db.commit()
 
-    await AuditService.log(
+    AuditService.record(
         db, user["user_id"],
         "DISABLE_USER", "user", user_id,
         "User account disabled"
     )
+    await db.commit()
 
     return {"success": True}
 
@@ -225,13 +226,13 @@ async def enable_user(
         raise HTTPException(404, "User not found")
 
     user_obj.is_active = True
-    await db.commit()
 
-    await AuditService.log(
+    AuditService.record(
         db, user["user_id"],
         "ENABLE_USER", "user", user_id,
         "User account enabled"
     )
+    await db.commit()
 
     return {"success": True}
 
@@ -319,14 +320,25 @@ async def physician_report(
 
 @router.get("/users")
 async def get_all_patients(
+    name_prefix: Optional[str] = Query(None),
+    page: PageParams = Depends(),
     user=Depends(require_admin),
     db: AsyncSession = Depends(get_db)
 ):
-    q = await db.execute(
+    query = (
         select(Patient)
-        .options(selectinload(Patient.user))
+        .join(User, User.id == Patient.user_id)
+        .options(contains_eager(Patient.user))
+    )
+
+    if name_prefix:
+        query = query.where(User.full_name.startswith(name_prefix, autoescape=True))
+
+    patients, next_cursor = await paginate(
+        db, query,
+        columns=[Patient.user_id],
+        page=page
     )
-    patients = q.scalars().all()
 
     return {
         "success": True,
@@ -341,5 +353,6 @@ async def get_all_patients(
                 "physician_id": p.physician_id,
             }
             for p in patients
-        ]
+        ],
+        "next_cursor": next_cursor
     }
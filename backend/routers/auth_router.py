@@ -3,9 +3,10 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordBearer
-import jwt
+from functools import lru_cache
 
 from database.connection import get_db
+from database.models import Patient, Physician
 from schemas.auth_schemas import (
     PhysicianSignupRequest,
     SignupRequest,
@@ -14,23 +15,26 @@ from schemas.auth_schemas import (
     PhysicianSignupResponse 
 )
 from services.auth_service import AuthService
-from utils.security import SECRET_KEY, ALGORITHM
-from utils.cloudinary import upload_profile_photo
+from utils.security import decode_access_token, Principal
+from utils.media import media_uploader
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+# async: no threadpool hop per request, the cache lookup is non-blocking
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        return decode_access_token(token)
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
 
+# one checker per role, shared by every route that requires it
+@lru_cache(maxsize=None)
 def require_role(required_role: str):
-    def role_checker(user=Depends(get_current_user)):
-        if user.get("role") != required_role:
+    async def role_checker(user: Principal = Depends(get_current_user)) -> Principal:
+        if user.role != required_role:
             raise HTTPException(status_code=403, detail="Access forbidden")
         return user
     return role_checker
@@ -46,18 +50,16 @@ async def register_patient(
     db: AsyncSession = Depends(get_db)
 ):
 
-    url = None
-    if profile_photo:
-        url = upload_profile_photo(profile_photo.file)
-
-    return await AuthService.register_patient(body.dict(), db, profile_photo_url=url)
+    # the URL is known upfront; the upload starts once registration committed
+    async with media_uploader.staged(profile_photo, column=Patient.profile_photo) as url:
+        return await AuthService.register_patient(body.dict(), db, profile_photo_url=url)
 
 @router.post("/login-admin")
 async def login_admin(data: LoginRequest, db: AsyncSession = Depends(get_db)):
     return await AuthService.login_admin(data.dict(), db)
 
-def require_admin(user=Depends(get_current_user)):
-    if user.get("role") != "admin":
+async def require_admin(user: Principal = Depends(get_current_user)) -> Principal:
+    if user.role != "admin":
         raise HTTPException(403, "Admin access only")
     return user
 
@@ -72,20 +74,17 @@ async def register_physician(
     body: PhysicianSignupRequest = Depends(PhysicianSignupRequest.as_form),
     db: AsyncSession = Depends(get_db)
 ):
-    profile_url = None
-    credential_url = None
-
-    if profile_photo:
-        profile_url = upload_profile_photo(profile_photo.file)
-
-    if credential_photo:
-        credential_url = upload_profile_photo(credential_photo.file)
-
-    payload = body.dict()
-    payload["profile_photo"] = profile_url
-    payload["credential_photo"] = credential_url
-
-    return await AuthService.register_physician(payload, db)
+    async with (
+        media_uploader.staged(profile_photo, column=Physician.profile_photo) as profile_url,
+        media_uploader.staged(
+            credential_photo, folder="credentials", column=Physician.credential_photo
+        ) as credential_url,
+    ):
+        payload = body.dict()
+        payload["profile_photo"] = profile_url
+        payload["credential_photo"] = credential_url
+
+        return await AuthService.register_physician(payload, db)
 
 
 @router.post("/login", response_model=AuthResponse)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.connection import get_db
@@ -10,6 +10,7 @@ from schemas.rep_capture_schema import RepCaptureRequest
 
 from services.exercises_service import ExerciseService
 from services.rep_capture_service import RepCaptureService
+from utils.capture_codec import MAX_CAPTURE_BYTES
 
 # 👉 NEW IMPORTS
 from pose.pose_tracking_patient import (
@@ -25,7 +26,6 @@ router = APIRouter(prefix="/exercises", tags=["Exercises"])
 # --------------------------------------------------
 from fastapi import Form, UploadFile, File
 import json
-from utils.cloudinary import upload_profile_photo
 
 
 @router.delete("/{exercise_id}")
@@ -101,6 +101,37 @@ async def capture_rep(
     )
 
 
+async def _read_capture_body(request: Request) -> bytes:
+    # reject by Content-Length, and stop streaming once past the limit
+    # (chunked uploads have no length)
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > MAX_CAPTURE_BYTES:
+        raise HTTPException(413, "Capture too large")
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_CAPTURE_BYTES:
+            raise HTTPException(413, "Capture too large")
+    return bytes(body)
+
+
+# same capture as a binary body (utils/capture_codec.py),
+# Content-Type: application/octet-stream
+@router.post("/{exercise_id}/capture-rep/binary")
+async def capture_rep_binary(
+    exercise_id: int,
+    request: Request,
+    user=Depends(require_role("physician")),
+    db: AsyncSession = Depends(get_db)
+):
+    return await RepCaptureService.capture_binary(
+        exercise_id=exercise_id,
+        body=await _read_capture_body(request),
+        db=db
+    )
+
+
 # --------------------------------------------------
 # 3️⃣ LIST EXERCISES
 # --------------------------------------------------
@@ -224,3 +255,23 @@ async def end_exercise_session(
         "accuracy": session.accuracy_score,
         "duration_sec": session.duration_sec
     }
+
+
+# --------------------------------------------------
+# POSE TEMPLATES (current, or ?version=N)
+# --------------------------------------------------
+from typing import Optional
+from services.pose_template_service import PoseTemplateService
+
+
+@router.get("/{exercise_id}/templates")
+async def get_pose_templates(
+    exercise_id: int,
+    version: Optional[int] = None,
+    user=Depends(require_role("physician")),
+    db: AsyncSession = Depends(get_db)
+):
+    return {
+        "success": True,
+        "templates": await PoseTemplateService.get_templates(exercise_id, db, version)
+    }
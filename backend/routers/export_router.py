@@ -0,0 +1,71 @@
+import os
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database.connection import get_db
+from database.models import ExportJob
+from routers.auth_router import require_admin
+from services.export_service import ExportService
+
+router = APIRouter(prefix="/admin/exports", tags=["Exports"])
+
+
+# incremental=true exports only what changed since the last finished job
+@router.post("")
+async def create_export(
+    background_tasks: BackgroundTasks,
+    incremental: bool = True,
+    user=Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    job = await ExportService.create_job(db, user["user_id"], incremental)
+    background_tasks.add_task(ExportService.run_job, job.id)
+
+    return {"success": True, "job": ExportService.serialize(job)}
+
+
+@router.get("")
+async def list_exports(
+    user=Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    q = await db.execute(
+        select(ExportJob).order_by(ExportJob.id.desc()).limit(50)
+    )
+    return {"success": True, "jobs": [ExportService.serialize(j) for j in q.scalars().all()]}
+
+
+@router.get("/{job_id}")
+async def get_export(
+    job_id: int,
+    user=Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    job = await db.get(ExportJob, job_id)
+    if not job:
+        raise HTTPException(404, "Export job not found")
+
+    return {"success": True, "job": ExportService.serialize(job)}
+
+
+@router.get("/{job_id}/download")
+async def download_export(
+    job_id: int,
+    user=Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    job = await db.get(ExportJob, job_id)
+    if not job:
+        raise HTTPException(404, "Export job not found")
+
+    if job.status != "DONE" or not job.artifact_path or not os.path.exists(job.artifact_path):
+        raise HTTPException(409, "Export is not ready")
+
+    return FileResponse(
+        job.artifact_path,
+        media_type="application/zip",
+        filename=f"physiocheck_export_{job.id}.zip"
+    )
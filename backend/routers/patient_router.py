@@ -1,5 +1,5 @@
 from http.client import HTTPException
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from services.report_service import ReportService
@@ -8,6 +8,8 @@ from services.patient_progress_service import PatientProgressService
 from database.connection import get_db
 from routers.auth_router import require_role
 from services.patient_session_service import PatientSessionService
+from services.angle_trace_service import AngleTraceService
+from services.rep_matching_service import RepMatchingService
 
 router = APIRouter(prefix="/patient", tags=["Patient"])
 
@@ -39,6 +41,7 @@ async def end_session(
     # 🔥 always use live state from LiveFeedbackService as source of truth
     payload = payload or {}
     state = payload.get("state", {})
+    state.pop("alertLog", None)   # only trusted from the live tracker
 
     live_entry = LiveFeedbackService.SESSION_STORE.get(session_id)
     if live_entry:
@@ -48,6 +51,7 @@ async def end_session(
         state["startTime"] = live_state.get("startTime", state.get("startTime"))
         state.setdefault("jointStats", live_state.get("jointStats", {}))
         state.setdefault("errorSummary", live_state.get("errorSummary", {}))
+        state["alertLog"] = live_state.get("alertLog")
 
     payload["state"] = state
 
@@ -114,6 +118,18 @@ async def get_my_progress(
     }
 
 
+@router.get("/progress/trend")
+async def get_my_trend(
+    window: int = 7,
+    user=Depends(require_role("patient")),
+    db: AsyncSession = Depends(get_db)
+):
+    return {
+        "success": True,
+        "trend": await PatientProgressService.get_trend(user["user_id"], db, window)
+    }
+
+
 @router.get("/report")
 async def get_patient_report(
     user=Depends(require_role("patient")),
@@ -197,4 +213,42 @@ async def list_my_exercises(
     return {
         "success": True,
         "exercises": exercises
-    }
\ No newline at end of file
+    }
+
+# per-frame angles; t_from / t_to in seconds since session start
+@router.get("/sessions/{session_id}/trace")
+async def get_session_trace(
+    session_id: int,
+    joints: str | None = Query(None),
+    t_from: float | None = Query(None),
+    t_to: float | None = Query(None),
+    max_points: int | None = Query(None, ge=2),
+    user=Depends(require_role("patient")),
+    db: AsyncSession = Depends(get_db)
+):
+    return {
+        "success": True,
+        "trace": await AngleTraceService.get_trace(
+            session_id, db,
+            patient_id=user["user_id"],
+            joints=joints.split(",") if joints else None,
+            t_from=t_from,
+            t_to=t_to,
+            max_points=max_points
+        )
+    }
+
+
+# every rep of the stored trace vs. the physician's recorded reps (DTW)
+@router.get("/sessions/{session_id}/rep-match")
+async def get_session_rep_match(
+    session_id: int,
+    user=Depends(require_role("patient")),
+    db: AsyncSession = Depends(get_db)
+):
+    return {
+        "success": True,
+        "match": await RepMatchingService.score_session(
+            session_id, db, patient_id=user["user_id"]
+        )
+    }
@@ -1,26 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, contains_eager
 
 from database.connection import get_db
-from database.models import Patient, PatientExercise, RehabPlan, Exercise
+from database.models import Patient, PatientExercise, RehabPlan, Exercise, User, SessionAlert
 from routers.auth_router import require_role
+from schemas.exercise_schemas import RescoreRequest
 from schemas.profile_schemas import PhysicianProfileUpdate
+from services.angle_trace_service import AngleTraceService
+from services.rep_matching_service import RepMatchingService
+from services.rescoring_service import RescoringService
+from services.physician_analytics_service import PhysicianAnalyticsService
+from services.session_alert_service import SessionAlertService
+from utils.pagination import PageParams, paginate
 
 router = APIRouter(prefix="/physician", tags=["Physician"])
 
 @router.get("/patients")
 async def get_my_patients(
+    name_prefix: Optional[str] = Query(None),
+    page: PageParams = Depends(),
     user=Depends(require_role("physician")),
     db: AsyncSession = Depends(get_db)
 ):
-    q = await db.execute(
+    query = (
         select(Patient)
-        .options(selectinload(Patient.user))
+        .join(User, User.id == Patient.user_id)
+        .options(contains_eager(Patient.user))
         .where(Patient.physician_id == user["user_id"])
     )
-    patients = q.scalars().all()
+
+    if name_prefix:
+        query = query.where(User.full_name.startswith(name_prefix, autoescape=True))
+
+    patients, next_cursor = await paginate(
+        db, query,
+        columns=[Patient.user_id],
+        page=page
+    )
 
     return {
         "success": True,
@@ -34,7 +54,8 @@ async def get_my_patients(
                 "profile_photo": p.profile_photo,  # ✅ needed by UI
             }
             for p in patients
-        ]
+        ],
+        "next_cursor": next_cursor
     }
 
 @router.get("/patients/{patient_id}")
@@ -77,6 +98,122 @@ async def get_patient_detail(
         }
     }
 
+# per-frame angles of one of my patients' sessions
+@router.get("/sessions/{session_id}/trace")
+async def get_session_trace(
+    session_id: int,
+    joints: Optional[str] = Query(None),
+    t_from: Optional[float] = Query(None),
+    t_to: Optional[float] = Query(None),
+    max_points: Optional[int] = Query(None, ge=2),
+    user=Depends(require_role("physician")),
+    db: AsyncSession = Depends(get_db)
+):
+    return {
+        "success": True,
+        "trace": await AngleTraceService.get_trace(
+            session_id, db,
+            physician_id=user["user_id"],
+            joints=joints.split(",") if joints else None,
+            t_from=t_from,
+            t_to=t_to,
+            max_points=max_points
+        )
+    }
+
+# every rep of the stored trace vs. the physician's recorded reps (DTW)
+@router.get("/sessions/{session_id}/rep-match")
+async def get_session_rep_match(
+    session_id: int,
+    user=Depends(require_role("physician")),
+    db: AsyncSession = Depends(get_db)
+):
+    return {
+        "success": True,
+        "match": await RepMatchingService.score_session(
+            session_id, db, physician_id=user["user_id"]
+        )
+    }
+
+# replay my patients' stored traces under a candidate repDefinition:
+# rep count / accuracy deltas against the current preset
+@router.post("/exercises/{exercise_id}/rescore")
+async def rescore_exercise(
+    exercise_id: int,
+    payload: RescoreRequest,
+    user=Depends(require_role("physician")),
+    db: AsyncSession = Depends(get_db)
+):
+    return {
+        "success": True,
+        "rescore": await RescoringService.rescore(
+            exercise_id,
+            payload.repDefinition,
+            db,
+            physician_id=user["user_id"],
+            patient_id=payload.patient_id,
+            limit=payload.limit,
+            include_sessions=payload.include_sessions
+        )
+    }
+
+# snapshot: patient counts, averages, last sessions
+@router.get("/dashboard")
+async def get_dashboard(
+    user=Depends(require_role("physician")),
+    db: AsyncSession = Depends(get_db)
+):
+    return {
+        "success": True,
+        "dashboard": await PhysicianAnalyticsService.get_dashboard(user["user_id"], db)
+    }
+
+
+# e.g. all hyperextension alerts this month: ?alert_type=hyperextension&date_from=...
+@router.get("/alerts")
+async def list_alerts(
+    alert_type: Optional[str] = Query(None),
+    patient_id: Optional[int] = Query(None),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    page: PageParams = Depends(),
+    user=Depends(require_role("physician")),
+    db: AsyncSession = Depends(get_db)
+):
+    query = select(SessionAlert).where(
+        SessionAlert.physician_id == user["user_id"],
+        *SessionAlertService.window(date_from, date_to)
+    )
+    if alert_type:
+        query = query.where(SessionAlert.alert_type == alert_type)
+    if patient_id is not None:
+        query = query.where(SessionAlert.patient_id == patient_id)
+
+    alerts, next_cursor = await paginate(
+        db, query, [SessionAlert.first_at, SessionAlert.id], page, descending=True
+    )
+
+    return {
+        "success": True,
+        "alerts": [
+            {
+                "id": a.id,
+                "session_id": a.session_id,
+                "patient_id": a.patient_id,
+                "exercise_id": a.exercise_id,
+                "alert_type": a.alert_type,
+                "joint": a.joint,
+                "message": a.message,
+                "first_at": a.first_at,
+                "last_at": a.last_at,
+                "duration_sec": a.duration_sec,
+                "count": a.count,
+            }
+            for a in alerts
+        ],
+        "next_cursor": next_cursor
+    }
+
 @router.post("/patients/{patient_id}/rehab-plans")
 async def create_rehab_plan(
     patient_id: int,
@@ -134,17 +271,25 @@ async def assign_exercise(
 
 @router.get("/")
 async def list_physicians(
+    name_prefix: Optional[str] = Query(None),
+    page: PageParams = Depends(),
     user=Depends(require_role("patient")),
     db: AsyncSession = Depends(get_db)
 ):
-    q = await db.execute(
+    query = (
         select(Physician)
-        .options(selectinload(Physician.user))
+        .join(User, User.id == Physician.user_id)
+        .options(contains_eager(Physician.user))
     )
 
-    physicians = q.scalars().all()
+    if name_prefix:
+        query = query.where(User.full_name.startswith(name_prefix, autoescape=True))
 
-    print("Fetched physicians:", physicians)
+    physicians, next_cursor = await paginate(
+        db, query,
+        columns=[Physician.user_id],
+        page=page
+    )
 
     return {
         "success": True,
@@ -158,7 +303,8 @@ async def list_physicians(
                 "years_experience": p.years_experience,
             }
             for p in physicians
-        ]
+        ],
+        "next_cursor": next_cursor
     }
 
 @router.put("/rehab-plans/{plan_id}")
@@ -219,7 +365,7 @@ async def get_my_profile(
             "credential_photo": physician.credential_photo,
         }
     }
-from utils.cloudinary import upload_profile_photo
+from utils.media import media_uploader
 from fastapi import UploadFile, File
 
 @router.put("/me/profile-photo")
@@ -237,11 +383,10 @@ async def upload_physician_profile_photo(
     if not physician:
         raise HTTPException(404, "Physician not found")
 
-    # Upload to Cloudinary
-    photo_url = upload_profile_photo(file.file)
-
-    physician.profile_photo = photo_url
-    await db.commit()
+    # URL is known upfront, the upload starts after the commit
+    async with media_uploader.staged(file, column=Physician.profile_photo) as photo_url:
+        physician.profile_photo = photo_url
+        await db.commit()
 
     return {
         "success": True,
@@ -263,10 +408,11 @@ async def upload_physician_credential_photo(
     if not physician:
         raise HTTPException(404, "Physician not found")
 
-    credential_url = upload_profile_photo(file.file)
-
-    physician.credential_photo = credential_url
-    await db.commit()
+    async with media_uploader.staged(
+        file, folder="credentials", column=Physician.credential_photo
+    ) as credential_url:
+        physician.credential_photo = credential_url
+        await db.commit()
 
     return {
         "success": True,
@@ -4,7 +4,8 @@ from sqlalchemy.future import select
 
 from routers.auth_router import get_current_user, require_role
 from services.profile_service import ProfileService
-from utils.cloudinary import upload_profile_photo
+from services.auth_service import AuthService
+from utils.media import media_uploader
 from database.connection import get_db
 from database.models import User, Patient, Physician
 
@@ -20,15 +21,15 @@ router = APIRouter(prefix="/profile", tags=["Profile"])
 # INTERNAL FUNCTION TO FETCH FULL PROFILE
 # -------------------------------------------
 async def fetch_full_profile(user_id: int, role: str, db: AsyncSession):
-    q = await db.execute(select(User).where(User.id == user_id))
-    base_user = q.scalar_one_or_none()
+    base_user, patient, physician = await AuthService.get_user_with_profile(
+        db, User.id == user_id
+    )
 
     if not base_user:
         raise HTTPException(404, "User not found")
 
     if role == "patient":
-        pq = await db.execute(select(Patient).where(Patient.user_id == user_id))
-        prof = pq.scalar_one_or_none()
+        prof = patient
 
         return {
             "role": "patient",
@@ -45,8 +46,7 @@ async def fetch_full_profile(user_id: int, role: str, db: AsyncSession):
         }
 
     elif role == "physician":
-        pq = await db.execute(select(Physician).where(Physician.user_id == user_id))
-        prof = pq.scalar_one_or_none()
+        prof = physician
 
         return {
             "role": "physician",
@@ -74,16 +74,13 @@ async def update_patient_profile(
     user=Depends(require_role("patient")),
     db: AsyncSession = Depends(get_db)
 ):
-    photo_url = None
-    if profile_photo:
-        photo_url = upload_profile_photo(profile_photo.file)
-
-    return await ProfileService.update_patient(
-        user_id=user["user_id"],
-        payload=body.dict(exclude_unset=True),
-        db=db,
-        profile_photo_url=photo_url
-    )
+    async with media_uploader.staged(profile_photo, column=Patient.profile_photo) as photo_url:
+        return await ProfileService.update_patient(
+            user_id=user["user_id"],
+            payload=body.dict(exclude_unset=True),
+            db=db,
+            profile_photo_url=photo_url
+        )
 
 
 # -------------------------------------------
@@ -96,16 +93,13 @@ async def update_physician_profile(
     user=Depends(require_role("physician")),
     db: AsyncSession = Depends(get_db)
 ):
-    photo_url = None
-    if profile_photo:
-        photo_url = upload_profile_photo(profile_photo.file)
-
-    return await ProfileService.update_physician(
-        user_id=user["user_id"],
-        payload=body.dict(exclude_unset=True),
-        db=db,
-        profile_photo_url=photo_url
-    )
+    async with media_uploader.staged(profile_photo, column=Physician.profile_photo) as photo_url:
+        return await ProfileService.update_physician(
+            user_id=user["user_id"],
+            payload=body.dict(exclude_unset=True),
+            db=db,
+            profile_photo_url=photo_url
+        )
 
 
 # -------------------------------------------
@@ -1,4 +1,8 @@
-from fastapi import APIRouter, Depends
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.connection import get_db
@@ -10,11 +14,34 @@ router = APIRouter(prefix="/reports", tags=["Reports"])
 
 @router.get("/patient")
 async def patient_report(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
     user=Depends(require_role("patient")),
     db: AsyncSession = Depends(get_db)
 ):
     report = await ReportService.patient_report(
         patient_id=user["user_id"],
-        db=db
+        db=db,
+        date_from=date_from,
+        date_to=date_to
     )
     return {"success": True, "report": report}
+
+
+# NDJSON: one summary line, then one line per session (or bucket)
+@router.get("/patient/stream")
+async def patient_report_stream(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    max_points: Optional[int] = Query(None, ge=2),
+    user=Depends(require_role("patient"))
+):
+    return StreamingResponse(
+        ReportService.stream_patient_report(
+            patient_id=user["user_id"],
+            date_from=date_from,
+            date_to=date_to,
+            max_points=max_points
+        ),
+        media_type="application/x-ndjson"
+    )
@@ -5,6 +5,7 @@ from sqlalchemy.orm import selectinload
 from routers.auth_router import require_role
 from database.connection import get_db
 from database.models import Patient
+from services.physician_analytics_service import PhysicianAnalyticsService
 
 router = APIRouter(prefix="/subscription", tags=["Subscription"])
 
@@ -26,6 +27,7 @@ async def subscribe(
     if not patient:
         raise HTTPException(404, "Patient not found")
 
+    await PhysicianAnalyticsService.invalidate(db, patient.physician_id, physician_id)
     patient.physician_id = physician_id
     await db.commit()
 
@@ -51,6 +53,7 @@ async def unsubscribe(
     if not patient:
         raise HTTPException(404, "Patient not found")
 
+    await PhysicianAnalyticsService.invalidate(db, patient.physician_id)
     patient.physician_id = None
     await db.commit()
 
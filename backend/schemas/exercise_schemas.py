@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from database.models import DifficultyLevel
+from config import RESCORE_MAX_SESSIONS
 
 
 class CreateExerciseRequest(BaseModel):
@@ -8,3 +9,10 @@ class CreateExerciseRequest(BaseModel):
     category: str
     difficulty: DifficultyLevel
     target_body_parts: List[str]
+
+
+class RescoreRequest(BaseModel):
+    repDefinition: dict
+    patient_id: Optional[int] = None
+    limit: Optional[int] = Field(None, ge=1, le=RESCORE_MAX_SESSIONS)
+    include_sessions: bool = False
@@ -4,7 +4,8 @@ from fastapi import HTTPException
 from sqlalchemy.orm import selectinload
 
 from database.models import User, Physician, Patient, RehabPlan, Session
-from utils.email_utils import send_email
+from services.audit_service import AuditService
+from services.email_outbox_service import EmailOutboxService, email_worker
 
 
 class AdminService:
@@ -66,7 +67,7 @@ class AdminService:
     # APPROVE PHYSICIAN
     # ------------------------------------
     @staticmethod
-    async def approve_physician(user_id: int, db: AsyncSession):
+    async def approve_physician(user_id: int, db: AsyncSession, admin_id: int | None = None):
 
         q = await db.execute(
             select(Physician)
@@ -79,10 +80,17 @@ class AdminService:
             raise HTTPException(404, "Physician not found")
 
         physician.is_verified = True
-        await db.commit()
 
-        # OPTIONAL EMAIL
-        await send_email(
+        if admin_id is not None:
+            AuditService.record(
+                db, admin_id,
+                "APPROVE_PHYSICIAN", "physician", user_id,
+                "Physician approved by admin"
+            )
+
+        # Email goes through the outbox, committed with the approval
+        EmailOutboxService.enqueue(
+            db,
             to=physician.user.email,
             subject="Your PhysioCheck Account is Approved",
             html_content="""
@@ -92,13 +100,16 @@ class AdminService:
             """
         )
 
+        await db.commit()
+        email_worker.wake()
+
         return {"success": True, "message": "Physician approved"}
 
     # ------------------------------------
     # REJECT PHYSICIAN
     # ------------------------------------
     @staticmethod
-    async def reject_physician(user_id: int, db: AsyncSession):
+    async def reject_physician(user_id: int, db: AsyncSession, admin_id: int | None = None):
 
         q = await db.execute(
             select(Physician)
@@ -111,6 +122,14 @@ class AdminService:
             raise HTTPException(404, "Physician not found")
 
         await db.delete(physician)
+
+        if admin_id is not None:
+            AuditService.record(
+                db, admin_id,
+                "REJECT_PHYSICIAN", "physician", user_id,
+                "Physician rejected by admin"
+            )
+
         await db.commit()
 
         return {"success": True, "message": "Physician rejected & removed"}
@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from database.models import ExerciseSession, SessionProgress
 from services.exercises_service import ExerciseService
+from services.rescoring_service import RescoringService
 
 class AIRuleService:
     @staticmethod
@@ -43,10 +44,22 @@ class AIRuleService:
             }
         }
         
+        # replay the analysed sessions' stored traces under the suggestion
+        backtest = (await RescoringService.rescore(
+            exercise_id, suggestions["repDefinition"], db,
+            patient_id=patient_id,
+            session_ids=[s.id for s in sessions_list]
+        ))["summary"]
+        if backtest.get("repChangePct") is not None:
+            expected_gain = f"{backtest['repChangePct']:+.0f}%"
+        else:
+            expected_gain = "+25%" if avg_reps < 5 else "+10%"
+
         return {
             "sessions_analyzed": len(sessions_list),
             "avg_reps": round(avg_reps, 1),
             "current_rules": getattr(exercise, 'pose_definition', {}),
             "suggested_rules": suggestions,
-            "expected_gain": "+25%" if avg_reps < 5 else "+10%"
+            "backtest": backtest,
+            "expected_gain": expected_gain
         }
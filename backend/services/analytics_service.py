@@ -1,52 +1,27 @@
-from sqlalchemy.future import select
-from database.models import ExerciseSession
+from database.models import SessionAlert, SessionError
+from services.session_alert_service import SessionAlertService
+from services.session_error_service import SessionErrorService
 
 class AnalyticsService:
+
+    # {alert message: sessions with that alert}, from session_alerts
     @staticmethod
     async def get_risk_summary(patient_id: int, db):
-        q = await db.execute(
-            select(ExerciseSession.risk_alerts)
-            .where(ExerciseSession.patient_id == patient_id)
+        return await SessionAlertService.summary(
+            db, SessionAlert.patient_id == patient_id
         )
 
-        summary = {}
-
-        for alerts in q.scalars():
-            if not alerts:
-                continue
-            for a in alerts:
-                key = a["joint"]
-                summary[key] = summary.get(key, 0) + 1
-
-        return summary
-
     @staticmethod
     async def get_common_mistakes(patient_id: int, db, top_k: int = 5):
-        freq = await AnalyticsService.get_error_frequency(patient_id, db)
-
-        return sorted(
-            [
-                {"mistake": k, "count": v}
-                for k, v in freq.items()
-            ],
-            key=lambda x: x["count"],
-            reverse=True
-        )[:top_k]
+        rows = await SessionErrorService.frequency(
+            db, SessionError.patient_id == patient_id, limit=top_k
+        )
+        return [{"mistake": k, "count": v} for k, v in rows]
 
 
     @staticmethod
     async def get_error_frequency(patient_id: int, db):
-        q = await db.execute(
-            select(ExerciseSession.error_summary)
-            .where(ExerciseSession.patient_id == patient_id)
+        rows = await SessionErrorService.frequency(
+            db, SessionError.patient_id == patient_id
         )
-
-        freq = {}
-
-        for row in q.scalars():
-            if not row:
-                continue
-            for joint, count in row.items():
-                freq[joint] = freq.get(joint, 0) + count
-
-        return freq
+        return dict(rows)
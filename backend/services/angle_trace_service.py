@@ -0,0 +1,95 @@
+# services/angle_trace_service.py
+
+import time
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import ExerciseSession, SessionAngleTrace
+from utils.angle_trace import AngleTraceRecorder, decimate, decode_trace
+
+
+class AngleTraceService:
+    # live recorders, keyed by exercise session id
+    RECORDERS: Dict[int, AngleTraceRecorder] = {}
+
+    # -------------------------------------------
+    # RECORD (per frame, in memory)
+    # -------------------------------------------
+    @staticmethod
+    def record(session_id: int, angles: dict, t: Optional[float] = None):
+        if not angles:
+            return
+        recorder = AngleTraceService.RECORDERS.setdefault(session_id, AngleTraceRecorder())
+        recorder.add(time.time() if t is None else t, angles)
+
+    # -------------------------------------------
+    # PERSIST (caller's transaction)
+    # recorded_as: live session id the frames were recorded under, when
+    # the result is saved as a new ExerciseSession row
+    # -------------------------------------------
+    @staticmethod
+    async def persist(db: AsyncSession, session: ExerciseSession, recorded_as: Optional[int] = None):
+        recorder = AngleTraceService.RECORDERS.pop(
+            session.id if recorded_as is None else recorded_as, None
+        )
+        if not recorder:
+            return None
+
+        data, index = recorder.encode()
+        trace = await db.get(SessionAngleTrace, session.id) or SessionAngleTrace(session_id=session.id)
+        trace.patient_id = session.patient_id
+        trace.physician_id = session.physician_id
+        trace.frames = index["frames"]
+        trace.duration_ms = index["blocks"][-1]["t1"] if index["blocks"] else 0
+        trace.trace_index = index
+        trace.data = data
+
+        db.add(trace)
+        return trace
+
+    # -------------------------------------------
+    # READ (window / decimated)
+    # t_from / t_to in seconds since session start
+    # -------------------------------------------
+    @staticmethod
+    async def get_trace(
+        session_id: int,
+        db: AsyncSession,
+        patient_id: Optional[int] = None,
+        physician_id: Optional[int] = None,
+        joints: Optional[List[str]] = None,
+        t_from: Optional[float] = None,
+        t_to: Optional[float] = None,
+        max_points: Optional[int] = None
+    ):
+        trace = await db.get(SessionAngleTrace, session_id)
+        if (
+            not trace
+            or (patient_id is not None and trace.patient_id != patient_id)
+            or (physician_id is not None and trace.physician_id != physician_id)
+        ):
+            raise HTTPException(404, "Trace not found")
+
+        ts, names, values = decode_trace(
+            trace.data,
+            trace.trace_index,
+            t_from=None if t_from is None else int(t_from * 1000),
+            t_to=None if t_to is None else int(t_to * 1000),
+            joints=joints
+        )
+        if max_points:
+            ts, values = decimate(ts, values, max_points)
+
+        return {
+            "session_id": session_id,
+            "frames": trace.frames,
+            "duration_sec": round(trace.duration_ms / 1000, 3),
+            "joints": trace.trace_index["joints"],
+            "t": [round(t / 1000, 3) for t in ts.tolist()],
+            "angles": {
+                name: [None if v != v else round(v, 2) for v in values[:, i].tolist()]
+                for i, name in enumerate(names)
+            },
+        }
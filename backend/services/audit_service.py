@@ -1,14 +1,28 @@
 from database.models import AuditLog
 
+
 class AuditService:
+
+    # ------------------------------------
+    # SAME TRANSACTION (preferred)
+    # Row is committed together with the caller's change
+    # ------------------------------------
     @staticmethod
-    async def log(db, admin_id, action, target_type, target_id, description):
-        log = AuditLog(
-            admin_id=admin_id,
-            action=action,
-            target_type=target_type,
-            target_id=target_id,
-            description=description
+    def record(db, admin_id, action, target_type, target_id, description):
+        db.add(
+            AuditLog(
+                admin_id=admin_id,
+                action=action,
+                target_type=target_type,
+                target_id=target_id,
+                description=description
+            )
         )
-        db.add(log)
+
+    # ------------------------------------
+    # STANDALONE (own commit)
+    # ------------------------------------
+    @staticmethod
+    async def log(db, admin_id, action, target_type, target_id, description):
+        AuditService.record(db, admin_id, action, target_type, target_id, description)
         await db.commit()
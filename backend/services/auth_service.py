@@ -5,12 +5,31 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 from typing import Dict, Any
 
-from database.models import User, Patient, Physician, Role
-from utils.security import hash_password, verify_password, create_access_token
+from database.models import User, Patient, Physician
+from services.role_cache import RoleCache
+from utils.security import hash_password_async, verify_and_rehash_async, create_access_token
 
 
 class AuthService:
 
+    # -------------------------------------------------------
+    # USER + PROFILE IN ONE ROUND-TRIP
+    # -------------------------------------------------------
+    @staticmethod
+    async def get_user_with_profile(db: AsyncSession, *criteria):
+        """
+        Returns (user, patient, physician); profile entries are None when
+        the user has no such row.
+        """
+        q = await db.execute(
+            select(User, Patient, Physician)
+            .outerjoin(Patient, Patient.user_id == User.id)
+            .outerjoin(Physician, Physician.user_id == User.id)
+            .where(*criteria)
+        )
+        row = q.first()
+        return tuple(row) if row else (None, None, None)
+
     # -------------------------------------------------------
     # REGISTER PATIENT
     # -------------------------------------------------------
@@ -23,17 +42,16 @@ class AuthService:
             raise HTTPException(status_code=400, detail="Email already registered")
 
         # Fetch patient role
-        role_q = await db.execute(select(Role).where(Role.name == "patient"))
-        role = role_q.scalar_one_or_none()
-        if not role:
+        role_id = await RoleCache.id_of("patient", db)
+        if not role_id:
             raise HTTPException(status_code=500, detail="Patient role not found")
 
         # Create User
         user = User(
             email=payload["email"],
             full_name=payload.get("full_name"),
-            password_hash=hash_password(payload["password"]),
-            role_id=role.id
+            password_hash=await hash_password_async(payload["password"]),
+            role_id=role_id
         )
         db.add(user)
         await db.flush()
@@ -73,17 +91,16 @@ class AuthService:
             raise HTTPException(status_code=400, detail="Email already registered")
 
         # Role
-        role_q = await db.execute(select(Role).where(Role.name == "physician"))
-        role = role_q.scalar_one_or_none()
-        if not role:
+        role_id = await RoleCache.id_of("physician", db)
+        if not role_id:
             raise HTTPException(status_code=500, detail="Physician role not found")
 
         # Create User
         user = User(
             email=payload["email"],
             full_name=payload.get("full_name"),
-            password_hash=hash_password(payload["password"]),
-            role_id=role.id
+            password_hash=await hash_password_async(payload["password"]),
+            role_id=role_id
         )
         db.add(user)
         await db.flush()
@@ -168,38 +185,35 @@ class AuthService:
     @staticmethod
     async def login(payload: Dict[str, Any], db: AsyncSession) -> Dict[str, Any]:
 
-        q = await db.execute(select(User).where(User.email == payload["email"]))
-        user = q.scalar_one_or_none()
+        user, patient, physician = await AuthService.get_user_with_profile(
+            db, User.email == payload["email"]
+        )
 
-        if not user or not verify_password(payload["password"], user.password_hash):
+        if not user:
             raise HTTPException(status_code=400, detail="Invalid email or password")
 
-        # Get role
-        role_q = await db.execute(select(Role).where(Role.id == user.role_id))
-        role = role_q.scalar_one_or_none()
-        role_name = role.name if role else "unknown"
+        valid, new_hash = await verify_and_rehash_async(payload["password"], user.password_hash)
+        if not valid:
+            raise HTTPException(status_code=400, detail="Invalid email or password")
+
+        role_name = await RoleCache.name_of(user.role_id, db) or "unknown"
 
         # ---------------- ROLE CHECKS ----------------
         if role_name == "patient":
-            pq = await db.execute(
-                select(Patient).where(Patient.user_id == user.id)
-            )
-            patient = pq.scalar_one_or_none()
-
             if patient and not patient.is_active:
                 raise HTTPException(403, "Patient account is disabled")
 
         elif role_name == "physician":
-            pq = await db.execute(
-                select(Physician).where(Physician.user_id == user.id)
-            )
-            physician = pq.scalar_one_or_none()
-
             if physician and not physician.is_verified:
                 raise HTTPException(403, "Physician not approved yet")
 
         # admins → no restriction
 
+        # Transparent upgrade of outdated hashes (cost raised)
+        if new_hash:
+            user.password_hash = new_hash
+            await db.commit()
+
         # Create token
         token = create_access_token({
             "user_id": user.id,
@@ -220,17 +234,14 @@ class AuthService:
     @staticmethod
     async def me(user_id: int, db: AsyncSession):
 
-        # Fetch user
-        q = await db.execute(select(User).where(User.id == user_id))
-        user = q.scalar_one_or_none()
+        user, patient, _ = await AuthService.get_user_with_profile(
+            db, User.id == user_id
+        )
 
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
-        # Fetch role
-        role_q = await db.execute(select(Role).where(Role.id == user.role_id))
-        role = role_q.scalar_one_or_none()
-        role_name = role.name if role else None
+        role_name = await RoleCache.name_of(user.role_id, db)
 
         response = {
             "id": user.id,
@@ -244,11 +255,6 @@ class AuthService:
 
         # 👤 If patient → include patient profile
         if role_name == "patient":
-            pq = await db.execute(
-                select(Patient).where(Patient.user_id == user.id)
-            )
-            patient = pq.scalar_one_or_none()
-
             if patient:
                 response.update({
                     "profile_photo": patient.profile_photo,
@@ -273,15 +279,17 @@ class AuthService:
         if not user:
             raise HTTPException(400, "Invalid credentials")
 
-        role_q = await db.execute(select(Role).where(Role.id == user.role_id))
-        role = role_q.scalar_one_or_none()
-
-        if role.name != "admin":
+        if await RoleCache.name_of(user.role_id, db) != "admin":
             raise HTTPException(403, "Not an admin account")
 
-        if not verify_password(payload["password"], user.password_hash):
+        valid, new_hash = await verify_and_rehash_async(payload["password"], user.password_hash)
+        if not valid:
             raise HTTPException(400, "Invalid credentials")
 
+        if new_hash:
+            user.password_hash = new_hash
+            await db.commit()
+
         token = create_access_token({"user_id": user.id, "role": "admin"})
 
         return {
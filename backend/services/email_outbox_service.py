@@ -0,0 +1,184 @@
+# services/email_outbox_service.py
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database.connection import AsyncSessionLocal
+from database.models import EmailOutbox
+from utils.email_utils import build_message, smtp_client
+
+logger = logging.getLogger(__name__)
+
+
+class EmailOutboxService:
+
+    # ------------------------------------
+    # ENQUEUE (caller's transaction)
+    # Row is committed together with the caller's change;
+    # call email_worker.wake() after the commit for fast delivery.
+    # ------------------------------------
+    @staticmethod
+    def enqueue(db: AsyncSession, to: str, subject: str, html_content: str):
+        db.add(
+            EmailOutbox(
+                to_address=to,
+                subject=subject,
+                html_content=html_content,
+            )
+        )
+
+
+class EmailWorker:
+    """
+    Delivers PENDING outbox rows in batches over one SMTP connection.
+    Failed sends are retried with exponential backoff and marked FAILED
+    after max_attempts.
+
+    Rows are claimed in a short transaction (FOR UPDATE SKIP LOCKED, so
+    several app workers can run this side by side): they become SENDING
+    with a lease (next_attempt_at = now + lease_seconds) and the claim
+    commits before any SMTP traffic. Results are written in a second
+    transaction. A worker that dies mid-batch leaves SENDING rows that
+    are claimed again once their lease runs out (at-least-once delivery).
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 50,
+        poll_interval: float = 10.0,
+        max_attempts: int = 5,
+        backoff_base: float = 30.0,
+        lease_seconds: float = 300.0,
+    ):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.lease_seconds = lease_seconds
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                processed = await self.process_batch()
+            except Exception:
+                logger.exception("Email outbox batch failed")
+                processed = 0
+
+            # full batch → more may be waiting, go again right away
+            if processed >= self.batch_size:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _mark_failed(self, row: EmailOutbox, error: Exception):
+        row.attempts = (row.attempts or 0) + 1
+        row.last_error = str(error)[:500]
+        if row.attempts >= self.max_attempts:
+            row.status = "FAILED"
+        else:
+            row.status = "PENDING"
+            delay = self.backoff_base * (2 ** (row.attempts - 1))
+            row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+    # ------------------------------------
+    # CLAIM (short transaction, no SMTP)
+    # due PENDING rows + SENDING rows whose lease expired
+    # ------------------------------------
+    async def _claim(self) -> List[Tuple[int, str, str, str]]:
+        async with AsyncSessionLocal() as db:
+            now = datetime.utcnow()
+            q = await db.execute(
+                select(EmailOutbox)
+                .where(
+                    EmailOutbox.status.in_(("PENDING", "SENDING")),
+                    EmailOutbox.next_attempt_at <= now
+                )
+                .order_by(EmailOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = q.scalars().all()
+            for row in rows:
+                row.status = "SENDING"
+                row.next_attempt_at = now + timedelta(seconds=self.lease_seconds)
+            await db.commit()
+            return [(row.id, row.to_address, row.subject, row.html_content) for row in rows]
+
+    # ------------------------------------
+    # RECORD RESULTS (second transaction)
+    # results: {id: None (sent) | exception}
+    # ------------------------------------
+    async def _record(self, results: Dict[int, Optional[Exception]]):
+        async with AsyncSessionLocal() as db:
+            q = await db.execute(
+                select(EmailOutbox).where(EmailOutbox.id.in_(list(results)))
+            )
+            for row in q.scalars():
+                error = results[row.id]
+                if error is None:
+                    row.status = "SENT"
+                    row.sent_at = datetime.utcnow()
+                else:
+                    self._mark_failed(row, error)
+            await db.commit()
+
+    async def process_batch(self) -> int:
+        claimed = await self._claim()
+        if not claimed:
+            return 0
+
+        smtp = smtp_client()
+        try:
+            await smtp.connect()
+        except Exception as e:
+            await self._record({row[0]: e for row in claimed})
+            return len(claimed)
+
+        results: Dict[int, Optional[Exception]] = {}
+        try:
+            for row_id, to, subject, html in claimed:
+                try:
+                    await smtp.send_message(build_message(to, subject, html))
+                    results[row_id] = None
+                except Exception as e:
+                    results[row_id] = e
+        finally:
+            try:
+                await smtp.quit()
+            except Exception:
+                pass
+            # also on cancellation: unsent rows keep their lease
+            if results:
+                await self._record(results)
+
+        return len(claimed)
+
+
+email_worker = EmailWorker()
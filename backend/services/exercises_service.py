@@ -1,7 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from fastapi import HTTPException
-from utils.cloudinary import upload_profile_photo
+from utils.media import media_uploader
 from database.models import Exercise
 
 
@@ -53,20 +53,19 @@ class ExerciseService:
         if not target_image:
             raise HTTPException(400, "Target image is required")
 
-        # 🔥 Upload to Cloudinary
-        image_url = upload_profile_photo(target_image.file)
-
-        exercise = Exercise(
-            name=payload.name,
-            category=payload.category,
-            difficulty=payload.difficulty,
-            target_body_parts=payload.target_body_parts,
-            target_image_url=image_url,
-            created_by=physician_id
-        )
+        # 🔥 the image is required: upload first, removed again if the commit fails
+        async with media_uploader.uploaded(target_image, folder="exercises") as image_url:
+            exercise = Exercise(
+                name=payload.name,
+                category=payload.category,
+                difficulty=payload.difficulty,
+                target_body_parts=payload.target_body_parts,
+                target_image_url=image_url,
+                created_by=physician_id
+            )
 
-        db.add(exercise)
-        await db.commit()
+            db.add(exercise)
+            await db.commit()
         await db.refresh(exercise)
 
         return exercise
@@ -0,0 +1,324 @@
+# services/export_service.py
+#
+# Bulk export of session history to Parquet for offline analysis.
+#
+#   exports/job_<id>/
+#     exercise_sessions/date=YYYY-MM-DD/physician_id=N/part-00000.parquet
+#     session_progress/date=YYYY-MM-DD/physician_id=N/part-00000.parquet
+#   exports/job_<id>.zip   ← downloadable artifact
+#
+# Rows are streamed from the DB and written in chunks, so memory stays
+# flat regardless of history size. Incremental jobs pick up where the
+# last finished job stopped (its `until` is the next job's watermark).
+# Sessions are windowed on their last modification, so a session ended or
+# re-ended after an export shows up again in the next one (same id; the
+# newest job's row wins). Partitions stay on created_at.
+# JSON columns are kept as JSON strings: their shape varies per exercise.
+# physician_id lives in the directory name only (hive layout), e.g.
+#   pyarrow.dataset.dataset(path, partitioning="hive")
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database.connection import AsyncSessionLocal
+from database.models import ExerciseSession, ExportJob, Patient, Session, SessionProgress
+
+logger = logging.getLogger(__name__)
+
+EXPORT_ROOT = os.getenv("EXPORT_ROOT", "exports")
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", 5000))
+# watermark trails "now" so rows of still-open transactions (and
+# second-precision server timestamps) land in the next export
+EXPORT_LAG_SEC = int(os.getenv("EXPORT_LAG_SEC", 5))
+
+HIVE_NULL = "__HIVE_DEFAULT_PARTITION__"
+
+
+def _session_schema(pa):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("patient_id", pa.int64()),
+        ("exercise_id", pa.int64()),
+        ("patient_exercise_id", pa.int64()),
+        ("completed_reps", pa.int64()),
+        ("completed_sets", pa.int64()),
+        ("accuracy_score", pa.float64()),
+        ("duration_sec", pa.float64()),
+        ("created_at", pa.timestamp("us")),
+        ("error_summary", pa.string()),
+        ("joint_stats", pa.string()),
+    ])
+
+
+def _progress_schema(pa):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("session_id", pa.string()),
+        ("patient_id", pa.int64()),
+        ("exercise_id", pa.int64()),
+        ("timestamp", pa.timestamp("us")),
+        ("rep_count", pa.int64()),
+        ("phase", pa.string()),
+        ("status", pa.string()),
+        ("event", pa.string()),
+    ])
+
+
+def _json(value) -> Optional[str]:
+    return None if value is None else json.dumps(value, default=str)
+
+
+def _text(value) -> Optional[str]:
+    return value if value is None or isinstance(value, str) else _json(value)
+
+
+class PartitionedParquetWriter:
+    """
+    Buffers rows per (date, physician_id) partition and writes one
+    part-file per partition every time the total buffer hits chunk_rows.
+    """
+
+    def __init__(self, root: str, schema, chunk_rows: int = EXPORT_CHUNK_ROWS):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa, self._pq = pa, pq
+
+        self.root = root
+        self.schema = schema
+        self.chunk_rows = chunk_rows
+        self._buffers: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+        self._parts: Dict[tuple, int] = defaultdict(int)
+        self._buffered = 0
+
+    def add(self, day, physician_id, row: Dict[str, Any]) -> bool:
+        """Returns True when the buffer is full and should be flushed."""
+        self._buffers[(day, physician_id)].append(row)
+        self._buffered += 1
+        return self._buffered >= self.chunk_rows
+
+    def flush(self):
+        for (day, physician_id), rows in self._buffers.items():
+            folder = os.path.join(
+                self.root,
+                f"date={day}",
+                f"physician_id={HIVE_NULL if physician_id is None else physician_id}"
+            )
+            os.makedirs(folder, exist_ok=True)
+
+            part = self._parts[(day, physician_id)]
+            self._parts[(day, physician_id)] += 1
+
+            table = self._pa.Table.from_pylist(rows, schema=self.schema)
+            self._pq.write_table(
+                table,
+                os.path.join(folder, f"part-{part:05d}.parquet"),
+                compression="zstd"
+            )
+
+        self._buffers.clear()
+        self._buffered = 0
+
+
+class ExportService:
+
+    # -------------------------------------------------
+    # CREATE JOB
+    # incremental=True → since = `until` of the last finished job
+    # -------------------------------------------------
+    @staticmethod
+    async def create_job(db: AsyncSession, admin_id: int, incremental: bool = True) -> ExportJob:
+        since = None
+        if incremental:
+            since = (await db.execute(
+                select(func.max(ExportJob.until))
+                .where(ExportJob.status == "DONE")
+            )).scalar()
+
+        job = ExportJob(
+            requested_by=admin_id,
+            since=since,
+            until=datetime.utcnow().replace(microsecond=0) - timedelta(seconds=EXPORT_LAG_SEC),
+        )
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    @staticmethod
+    def serialize(job: ExportJob) -> dict:
+        return {
+            "id": job.id,
+            "status": job.status,
+            "since": job.since,
+            "until": job.until,
+            "rows_total": job.rows_total,
+            "rows_done": job.rows_done,
+            "progress": round(job.rows_done / job.rows_total, 4) if job.rows_total else (1.0 if job.status == "DONE" else 0.0),
+            "error": job.error,
+            "created_at": job.created_at,
+            "finished_at": job.finished_at,
+        }
+
+    @staticmethod
+    def _session_modified():
+        # rows written before updated_at existed fall back to created_at
+        return func.coalesce(ExerciseSession.updated_at, ExerciseSession.created_at)
+
+    @staticmethod
+    def _window(column, job: ExportJob):
+        conds = [column <= job.until]
+        if job.since is not None:
+            conds.append(column > job.since)
+        return conds
+
+    # -------------------------------------------------
+    # RUN (background task, own sessions)
+    # -------------------------------------------------
+    @staticmethod
+    async def run_job(job_id: int):
+        async with AsyncSessionLocal() as state:
+            job = await state.get(ExportJob, job_id)
+            if not job or job.status != "PENDING":
+                return
+
+            job.status = "RUNNING"
+            await state.commit()
+
+            out_dir = os.path.join(EXPORT_ROOT, f"job_{job.id}")
+            try:
+                import pyarrow as pa
+            except ImportError:
+                job.status = "FAILED"
+                job.error = "pyarrow is not installed"
+                job.finished_at = datetime.utcnow()
+                await state.commit()
+                return
+
+            try:
+                async with AsyncSessionLocal() as db:
+                    job.rows_total = (
+                        (await db.execute(
+                            select(func.count(ExerciseSession.id))
+                            .where(*ExportService._window(ExportService._session_modified(), job))
+                        )).scalar()
+                        + (await db.execute(
+                            select(func.count(SessionProgress.id))
+                            .where(*ExportService._window(SessionProgress.timestamp, job))
+                        )).scalar()
+                    )
+                    await state.commit()
+
+                    await ExportService._export_sessions(db, state, job, pa, out_dir)
+                    await ExportService._export_progress(db, state, job, pa, out_dir)
+
+                os.makedirs(out_dir, exist_ok=True)
+                job.artifact_path = await asyncio.to_thread(
+                    shutil.make_archive, out_dir, "zip", out_dir
+                )
+                await asyncio.to_thread(shutil.rmtree, out_dir, True)
+
+                job.status = "DONE"
+                job.finished_at = datetime.utcnow()
+                await state.commit()
+
+            except Exception as e:
+                logger.exception("Export job %s failed", job_id)
+                await state.rollback()
+                job.status = "FAILED"
+                job.error = str(e)[:500]
+                job.finished_at = datetime.utcnow()
+                await state.commit()
+                shutil.rmtree(out_dir, ignore_errors=True)
+
+    @staticmethod
+    async def _flush(writer: PartitionedParquetWriter, state: AsyncSession, job: ExportJob, rows: int):
+        await asyncio.to_thread(writer.flush)
+        job.rows_done += rows
+        await state.commit()
+
+    @staticmethod
+    async def _export_sessions(db, state, job, pa, out_dir):
+        writer = PartitionedParquetWriter(
+            os.path.join(out_dir, "exercise_sessions"), _session_schema(pa)
+        )
+
+        result = await db.stream_scalars(
+            select(ExerciseSession)
+            .where(*ExportService._window(ExportService._session_modified(), job))
+            .order_by(ExerciseSession.id)
+            .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+        )
+
+        pending = 0
+        async for s in result:
+            pending += 1
+            full = writer.add(s.created_at.date(), s.physician_id, {
+                "id": s.id,
+                "patient_id": s.patient_id,
+                "exercise_id": s.exercise_id,
+                "patient_exercise_id": s.patient_exercise_id,
+                "completed_reps": s.completed_reps,
+                "completed_sets": s.completed_sets,
+                "accuracy_score": s.accuracy_score,
+                "duration_sec": s.duration_sec,
+                "created_at": s.created_at,
+                "error_summary": _json(s.error_summary),
+                "joint_stats": _json(s.joint_stats),
+            })
+            if full:
+                await ExportService._flush(writer, state, job, pending)
+                pending = 0
+
+        await ExportService._flush(writer, state, job, pending)
+
+    @staticmethod
+    async def _export_progress(db, state, job, pa, out_dir):
+        writer = PartitionedParquetWriter(
+            os.path.join(out_dir, "session_progress"), _progress_schema(pa)
+        )
+
+        result = await db.stream(
+            select(
+                SessionProgress,
+                Session.patient_id,
+                Session.exercise_id,
+                Patient.physician_id,
+            )
+            .join(Session, Session.id == SessionProgress.session_id)
+            .outerjoin(Patient, Patient.user_id == Session.patient_id)
+            .where(*ExportService._window(SessionProgress.timestamp, job))
+            .order_by(SessionProgress.id)
+            .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+        )
+
+        pending = 0
+        async for p, patient_id, exercise_id, physician_id in result:
+            event = p.event if isinstance(p.event, dict) else {}
+            rep_count = event.get("repCount")
+            pending += 1
+            full = writer.add(p.timestamp.date(), physician_id, {
+                "id": p.id,
+                "session_id": p.session_id,
+                "patient_id": patient_id,
+                "exercise_id": exercise_id,
+                "timestamp": p.timestamp,
+                "rep_count": rep_count if isinstance(rep_count, int) else None,
+                "phase": _text(event.get("phase")),
+                "status": _text(event.get("status")),
+                "event": _json(p.event),
+            })
+            if full:
+                await ExportService._flush(writer, state, job, pending)
+                pending = 0
+
+        await ExportService._flush(writer, state, job, pending)
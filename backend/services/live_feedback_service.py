@@ -1,11 +1,21 @@
 # services/live_feedback_service.py
 
+import os
+import time
+from collections import deque
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from fastapi import HTTPException
 
 from database.models import ExerciseSession, ExercisePreset  # ✅ use preset
 from services.exercises_service import ExerciseService
+from services.angle_trace_service import AngleTraceService
+from services.rep_counter import FALLBACK_REP_DEFINITION
+from pose.stability_analysis import StabilityTracker
+from services.rep_matching_service import RepMatchingService
+from services.risk_detector import RiskDetector
+from services.session_alert_service import SessionAlertService
 
 from pose.pose_tracking_patient import (
     init_session_state,
@@ -13,6 +23,10 @@ from pose.pose_tracking_patient import (
     save_exercise_session,
 )
 
+# frames kept for the rep in progress (~20 s at 30 fps); an idle stretch
+# or an abandoned attempt only ever holds the most recent window
+REP_FRAMES_MAX = int(os.getenv("REP_FRAMES_MAX", 600))
+
 
 class LiveFeedbackService:
     SESSION_STORE = {}
@@ -60,19 +74,21 @@ class LiveFeedbackService:
                 pose_def = {
                     "exerciseName": exercise.name or "Exercise",
                     "criticalJoints": [],
-                    "repDefinition": {
-                        "joint": "any_joint",
-                        "validRange": [40, 140],
-                        "exitRange": [0, 90],
-                        "minHoldTime": 0.15,
-                    },
+                    "repDefinition": FALLBACK_REP_DEFINITION,
                 }
 
+            detector = RiskDetector.from_preset(pose_def)
             LiveFeedbackService.SESSION_STORE[session_id] = {
                 "state": init_session_state(
                     target_reps=getattr(exercise, "reps", 5)
                 ),
                 "exercise": pose_def,
+                "stability": StabilityTracker(),
+                "risk": (detector, detector.new_window()),
+                "lastFrameAt": None,
+                "template": await RepMatchingService.load_templates(exercise_id, db),
+                "repFrames": deque(maxlen=REP_FRAMES_MAX),
+                "repMatches": [],
                 "meta": {
                     "patient_id": session.patient_id,
                     "physician_id": session.physician_id,
@@ -82,6 +98,7 @@ class LiveFeedbackService:
             }
 
         entry = LiveFeedbackService.SESSION_STORE[session_id]
+        prev_rep_state = entry["state"].get("repState")
 
         # 3) Use generic rep logic (time‑based in your current process_frame)
         result = process_frame(
@@ -90,10 +107,35 @@ class LiveFeedbackService:
             state=entry["state"],
             frame=frame,
         )
+        AngleTraceService.record(session_id, (frame or {}).get("angles"))
+        entry["stability"].update((frame or {}).get("angles"))
+
+        # risk rules over the recent frames → alert stream (session_alerts)
+        now = time.time()
+        dt = now - entry["lastFrameAt"] if entry["lastFrameAt"] else 0.0
+        entry["lastFrameAt"] = now
+        detector, window = entry["risk"]
+        alerts = detector.detect(
+            window, now,
+            joints=(frame or {}).get("joints"),
+            angles=(frame or {}).get("angles")
+        )
+        SessionAlertService.track(entry["state"], alerts, dt, now)
+
+        # a rep ends when the angle returns to the exit range:
+        # compare it with the physician's recorded reps
+        if entry["template"]:
+            entry["repFrames"].append((frame or {}).get("angles") or {})
+            if prev_rep_state == "COUNTED" and result["repState"] == "OUTSIDE":
+                match = RepMatchingService.match_frames(entry["template"], list(entry["repFrames"]))
+                if match:
+                    entry["repMatches"].append(match)
+                entry["repFrames"].clear()
 
 
         # 4) Auto-save if COMPLETED
         if result["status"] == "COMPLETED":
+            # the trace is stored under the saved row's id
             await save_exercise_session(
                 db=db,
                 patient_id=entry["meta"]["patient_id"],
@@ -101,6 +143,7 @@ class LiveFeedbackService:
                 exercise_id=entry["meta"]["exercise_id"],
                 patient_exercise_id=entry["meta"]["patient_exercise_id"],
                 state=entry["state"],
+                trace_session_id=session_id,
             )
             LiveFeedbackService.SESSION_STORE.pop(session_id, None)
 
@@ -112,4 +155,7 @@ class LiveFeedbackService:
             "angle": result["angle"],
             "accuracy": 100.0 if result["repState"] == "COUNTED" else 60.0,
             "errors": {},
+            "alerts": list(alerts.values()),
+            "stability": entry["stability"].summary(),
+            "repMatch": entry["repMatches"][-1] if entry["repMatches"] else None,
         }
@@ -1,63 +1,121 @@
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+import os
+
+import numpy as np
 from sqlalchemy import func
 from sqlalchemy.future import select
-from datetime import date, timedelta
 
-from database.models import ExerciseSession
+from database.models import ExerciseSession, PatientDailyRollup, PatientRollupRevision
+from services.patient_rollup_service import closed_before
+
+PROGRESS_CACHE_SIZE = int(os.getenv("PROGRESS_CACHE_SIZE", 2048))
+
+
+def _yearweek(d: date) -> int:
+    iso = d.isocalendar()
+    return iso[0] * 100 + iso[1]
 
 
 class PatientProgressService:
+    """
+    Progress is built from patient_daily_rollups. Closed days (before
+    closed_before()) rarely change, so their per-day series is cached per
+    patient and only the open days are read on each call. The entry is
+    checked against the patient's rollup revision, one primary-key read:
+    any committed late edit or rebuild, from any worker, bumps it and the
+    series is read again.
+    """
+
+    # patient_id → (closed_before, revision, [(day, sessions, accuracy_sum, reps)])
+    _CLOSED: "OrderedDict[int, tuple]" = OrderedDict()
 
     @staticmethod
-    async def get_daily_progress(patient_id: int, db):
-        since = date.today() - timedelta(days=7)
+    async def _revision(patient_id: int, db) -> int:
+        q = await db.execute(
+            select(PatientRollupRevision.revision)
+            .where(PatientRollupRevision.patient_id == patient_id)
+        )
+        return q.scalar() or 0
 
+    @staticmethod
+    async def _day_rows(patient_id: int, db, *criteria):
         q = await db.execute(
             select(
-                func.date(ExerciseSession.created_at).label("day"),
-                func.count().label("sessions"),
-                func.avg(ExerciseSession.accuracy_score).label("avg_accuracy"),
-                func.sum(ExerciseSession.completed_reps).label("reps")
+                PatientDailyRollup.day,
+                func.sum(PatientDailyRollup.sessions),
+                func.sum(PatientDailyRollup.accuracy_sum),
+                func.sum(PatientDailyRollup.total_reps),
             )
-            .where(
-                ExerciseSession.patient_id == patient_id,
-                ExerciseSession.created_at >= since
+            .where(PatientDailyRollup.patient_id == patient_id, *criteria)
+            .group_by(PatientDailyRollup.day)
+            .order_by(PatientDailyRollup.day)
+        )
+        return [
+            (day, int(sessions or 0), float(acc or 0.0), int(reps or 0))
+            for day, sessions, acc, reps in q.all()
+        ]
+
+    @staticmethod
+    async def _days(patient_id: int, db):
+        """Full per-day series: cached closed days + the open days' rows."""
+        cutoff = closed_before()
+        cache = PatientProgressService._CLOSED
+
+        # revision first: a commit landing between the two reads only makes
+        # the cached entry look older than it is
+        revision = await PatientProgressService._revision(patient_id, db)
+        hit = cache.get(patient_id)
+        if hit is not None and hit[:2] == (cutoff, revision):
+            closed = hit[2]
+        else:
+            closed = await PatientProgressService._day_rows(
+                patient_id, db, PatientDailyRollup.day < cutoff
             )
-            .group_by(func.date(ExerciseSession.created_at))
-            .order_by("day")
+            # a new day replaces the patient's entry
+            cache[patient_id] = (cutoff, revision, closed)
+        cache.move_to_end(patient_id)
+        while len(cache) > PROGRESS_CACHE_SIZE:
+            cache.popitem(last=False)
+
+        current = await PatientProgressService._day_rows(
+            patient_id, db, PatientDailyRollup.day >= cutoff
         )
+        return closed + current
+
+    @staticmethod
+    async def get_daily_progress(patient_id: int, db):
+        since = datetime.utcnow().date() - timedelta(days=7)
 
         return [
             {
-                "day": r.day.isoformat(),
-                "sessions": r.sessions,
-                "avgAccuracy": round(r.avg_accuracy or 0, 2),
-                "reps": r.reps or 0
+                "day": day.isoformat(),
+                "sessions": sessions,
+                "avgAccuracy": round(acc / sessions, 2) if sessions else 0,
+                "reps": reps
             }
-            for r in q.all()
+            for day, sessions, acc, reps in await PatientProgressService._days(patient_id, db)
+            if day >= since
         ]
 
+    # ISO weeks, labelled YYYYWW
     @staticmethod
     async def get_weekly_progress(patient_id: int, db):
-        q = await db.execute(
-            select(
-                func.yearweek(ExerciseSession.created_at).label("week"),
-                func.count().label("sessions"),
-                func.avg(ExerciseSession.accuracy_score).label("avg_accuracy"),
-                func.sum(ExerciseSession.completed_reps).label("reps")
-            )
-            .where(ExerciseSession.patient_id == patient_id)
-            .group_by("week")
-            .order_by("week")
-        )
+        weeks = OrderedDict()
+        for day, sessions, acc, reps in await PatientProgressService._days(patient_id, db):
+            w = weeks.setdefault(_yearweek(day), [0, 0.0, 0])
+            w[0] += sessions
+            w[1] += acc
+            w[2] += reps
 
         return [
             {
-                "week": r.week,
-                "sessions": r.sessions,
-                "avgAccuracy": round(r.avg_accuracy or 0, 2),
-                "reps": r.reps or 0
+                "week": week,
+                "sessions": sessions,
+                "avgAccuracy": round(acc / sessions, 2) if sessions else 0,
+                "reps": reps
             }
-            for r in q.all()
+            for week, (sessions, acc, reps) in weeks.items()
         ]
 
     @staticmethod
@@ -78,5 +136,43 @@ class PatientProgressService:
                 "accuracy": s.accuracy_score,
                 "reps": s.completed_reps
             }
-            for s in q.scalars()
+            for s in q.all()
         ]
+
+    # -------------------------------------------------
+    # SMOOTHED DAILY SERIES + LINEAR TREND (NumPy)
+    # window: trailing moving average over active days
+    # -------------------------------------------------
+    @staticmethod
+    async def get_trend(patient_id: int, db, window: int = 7):
+        rows = await PatientProgressService._days(patient_id, db)
+        rows = [r for r in rows if r[1]]
+        if not rows:
+            return {"daily": [], "slopePerWeek": None}
+
+        days = np.array([r[0].toordinal() for r in rows], dtype=np.float64)
+        sessions = np.array([r[1] for r in rows], dtype=np.float64)
+        accuracy = np.array([r[2] for r in rows], dtype=np.float64) / sessions
+        reps = np.array([r[3] for r in rows], dtype=np.float64)
+
+        window = max(1, min(window, len(rows)))
+        csum = np.cumsum(np.insert(accuracy, 0, 0.0))
+        counts = np.minimum(np.arange(1, len(rows) + 1), window)
+        smoothed = (csum[1:] - csum[np.maximum(np.arange(1, len(rows) + 1) - window, 0)]) / counts
+
+        slope = None
+        if len(rows) >= 2 and np.ptp(days) > 0:
+            slope = float(np.polyfit(days - days[0], accuracy, 1)[0] * 7)
+
+        return {
+            "daily": [
+                {
+                    "day": r[0].isoformat(),
+                    "accuracy": round(float(a), 2),
+                    "smoothedAccuracy": round(float(s), 2),
+                    "reps": int(n)
+                }
+                for r, a, s, n in zip(rows, accuracy, smoothed, reps)
+            ],
+            "slopePerWeek": None if slope is None else round(slope, 4)
+        }
@@ -0,0 +1,212 @@
+# services/patient_rollup_service.py
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database.models import ExerciseSession, PatientDailyRollup, PatientRollupRevision
+from services.physician_analytics_service import PhysicianAnalyticsService
+
+
+def split_error_summary(summary) -> tuple:
+    """
+    error_summary comes in two shapes:
+      - dict  {errorKey: count}            (live feedback / end_session)
+      - list  ["Excessive spine bending"]  (alerts, pose_tracking_patient)
+    Returns (error_counts, alert_counts).
+    """
+    errors: Dict[str, int] = {}
+    alerts: Dict[str, int] = {}
+
+    if isinstance(summary, dict):
+        for key, value in summary.items():
+            if isinstance(value, dict):
+                value = value.get("count", 0)
+            if isinstance(value, (int, float)):
+                errors[key] = errors.get(key, 0) + int(value)
+
+    elif isinstance(summary, list):
+        for alert in summary:
+            alerts[str(alert)] = alerts.get(str(alert), 0) + 1
+
+    return errors, alerts
+
+
+def closed_before(today: Optional[date] = None) -> date:
+    """
+    Rollup days before this are closed: only late edits and rebuilds
+    change them. Yesterday stays open, so a session saved just before
+    midnight and committed just after is never a late edit.
+    """
+    return (today or datetime.utcnow().date()) - timedelta(days=1)
+
+
+def merge_counts(target: Dict[str, int], source: Dict[str, int], sign: int = 1):
+    for key, count in source.items():
+        value = target.get(key, 0) + sign * count
+        if value:
+            target[key] = value
+        else:
+            target.pop(key, None)
+
+
+class PatientRollupService:
+
+    # -------------------------------------------
+    # SNAPSHOT OF WHAT A SESSION CONTRIBUTES
+    # -------------------------------------------
+    @staticmethod
+    def contribution(session: ExerciseSession) -> Dict[str, Any]:
+        errors, alerts = split_error_summary(session.error_summary)
+        created = session.created_at or datetime.utcnow()
+        return {
+            "patient_id": session.patient_id,
+            "physician_id": session.physician_id,
+            "exercise_id": session.exercise_id,
+            "day": created.date(),
+            "at": created,
+            "reps": session.completed_reps or 0,
+            "accuracy": session.accuracy_score or 0.0,
+            "duration": session.duration_sec or 0.0,
+            "errors": errors,
+            "alerts": alerts,
+        }
+
+    @staticmethod
+    def _new_rollup(c: Dict[str, Any]) -> PatientDailyRollup:
+        return PatientDailyRollup(
+            patient_id=c["patient_id"],
+            exercise_id=c["exercise_id"],
+            day=c["day"],
+            sessions=0,
+            total_reps=0,
+            accuracy_sum=0.0,
+            duration_sum=0.0,
+            error_counts={},
+            alert_counts={},
+        )
+
+    @staticmethod
+    def _accumulate(rollup: PatientDailyRollup, c: Dict[str, Any], sign: int = 1):
+        rollup.physician_id = c["physician_id"]
+        rollup.sessions += sign
+        rollup.total_reps += sign * c["reps"]
+        rollup.accuracy_sum += sign * c["accuracy"]
+        rollup.duration_sum += sign * c["duration"]
+
+        # JSON columns: assign new dicts so the change is detected
+        errors = dict(rollup.error_counts or {})
+        alerts = dict(rollup.alert_counts or {})
+        merge_counts(errors, c["errors"], sign)
+        merge_counts(alerts, c["alerts"], sign)
+        rollup.error_counts = errors
+        rollup.alert_counts = alerts
+
+        if sign > 0 and (rollup.last_session_at is None or c["at"] > rollup.last_session_at):
+            rollup.last_session_at = c["at"]
+
+    # -------------------------------------------
+    # APPLY (+1) / RETRACT (-1) A CONTRIBUTION
+    # Runs in the caller's transaction. Also keeps the physician's
+    # dashboard snapshot in step.
+    # -------------------------------------------
+    @staticmethod
+    async def apply(db: AsyncSession, c: Dict[str, Any], sign: int = 1):
+        rollup = await db.get(
+            PatientDailyRollup,
+            (c["patient_id"], c["exercise_id"], c["day"]),
+            with_for_update=True
+        )
+
+        if not rollup:
+            rollup = PatientRollupService._new_rollup(c)
+            db.add(rollup)
+
+        PatientRollupService._accumulate(rollup, c, sign)
+        if c["day"] < closed_before():
+            await PatientRollupService.bump_revision(db, c["patient_id"])
+        await PhysicianAnalyticsService.apply_session(db, c, sign)
+
+    @staticmethod
+    async def bump_revision(db: AsyncSession, patient_id: int):
+        row = await db.get(PatientRollupRevision, patient_id, with_for_update=True)
+        if not row:
+            row = PatientRollupRevision(patient_id=patient_id, revision=0)
+            db.add(row)
+        row.revision += 1
+
+    @staticmethod
+    async def add_session(db: AsyncSession, session: ExerciseSession):
+        await PatientRollupService.apply(db, PatientRollupService.contribution(session))
+
+    # -------------------------------------------
+    # READ
+    # -------------------------------------------
+    @staticmethod
+    async def get_rollups(
+        patient_id: int,
+        db: AsyncSession,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ):
+        query = select(PatientDailyRollup).where(PatientDailyRollup.patient_id == patient_id)
+
+        if date_from is not None:
+            query = query.where(PatientDailyRollup.day >= date_from)
+        if date_to is not None:
+            query = query.where(PatientDailyRollup.day <= date_to)
+
+        q = await db.execute(query.order_by(PatientDailyRollup.day))
+        return q.scalars().all()
+
+    # -------------------------------------------
+    # BACKFILL (existing history / repair)
+    # -------------------------------------------
+    @staticmethod
+    async def rebuild_patient(patient_id: int, db: AsyncSession):
+        physician_ids = set()
+        for rollup in await PatientRollupService.get_rollups(patient_id, db):
+            physician_ids.add(rollup.physician_id)
+            await db.delete(rollup)
+        await db.flush()
+
+        # aggregate in memory while streaming, write once at the end
+        rollups = {}
+        q = await db.stream_scalars(
+            select(ExerciseSession)
+            .where(ExerciseSession.patient_id == patient_id)
+            .execution_options(yield_per=500)
+        )
+        async for session in q:
+            c = PatientRollupService.contribution(session)
+            key = (c["exercise_id"], c["day"])
+            if key not in rollups:
+                rollups[key] = PatientRollupService._new_rollup(c)
+            PatientRollupService._accumulate(rollups[key], c)
+            physician_ids.add(c["physician_id"])
+
+        db.add_all(rollups.values())
+        await PatientRollupService.bump_revision(db, patient_id)
+        await PhysicianAnalyticsService.invalidate(db, *physician_ids)
+        await db.commit()
+
+
+# python -m services.patient_rollup_service   → rebuild rollups for all patients
+if __name__ == "__main__":
+    import asyncio
+    from database.connection import AsyncSessionLocal
+
+    async def _rebuild_all():
+        async with AsyncSessionLocal() as db:
+            ids = (await db.execute(
+                select(ExerciseSession.patient_id).distinct()
+            )).scalars().all()
+
+        for patient_id in ids:
+            async with AsyncSessionLocal() as db:
+                await PatientRollupService.rebuild_patient(patient_id, db)
+            print(f"rebuilt rollups for patient {patient_id}")
+
+    asyncio.run(_rebuild_all())
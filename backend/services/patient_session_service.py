@@ -8,6 +8,10 @@ from sqlalchemy.future import select
 from fastapi import HTTPException
 
 from database.models import PatientExercise, ExerciseSession
+from services.patient_rollup_service import PatientRollupService
+from services.angle_trace_service import AngleTraceService
+from services.session_error_service import SessionErrorService
+from services.session_alert_service import SessionAlertService
 
 
 class PatientSessionService:
@@ -60,6 +64,12 @@ class PatientSessionService:
 
         state = payload.get("state", {})
 
+        # ended before (start_session writes duration 0) → retract old numbers
+        if (session.duration_sec or 0) > 0:
+            await PatientRollupService.apply(
+                db, PatientRollupService.contribution(session), sign=-1
+            )
+
         # ---- normalize joint stats ----
         joint_stats = {}
         for j, v in state.get("jointStats", {}).items():
@@ -75,6 +85,11 @@ class PatientSessionService:
         session.duration_sec = time.time() - state.get("startTime", time.time())
         session.ended_at = datetime.utcnow()
 
+        await PatientRollupService.add_session(db, session)
+        await SessionErrorService.replace(db, session)
+        await SessionAlertService.replace(db, session, state.get("alertLog"))
+        await AngleTraceService.persist(db, session)
+
         await db.commit()
         await db.refresh(session)
 
@@ -1,8 +1,12 @@
+from datetime import datetime
+from typing import Any, Dict
+
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func
+from sqlalchemy import func, update
 
-from database.models import ExerciseSession
+from database.models import Patient, PatientDailyRollup, PhysicianDashboard, User
 
 
 class PhysicianAnalyticsService:
@@ -12,28 +16,152 @@ class PhysicianAnalyticsService:
         physician_id: int,
         db: AsyncSession
     ):
-        q = await db.execute(
-            select(
-                ExerciseSession.patient_id,
-                func.count().label("sessions"),
-                func.avg(ExerciseSession.accuracy_score).label("avg_accuracy"),
-                func.max(ExerciseSession.created_at).label("last_session")
-            )
-            .where(ExerciseSession.physician_id == physician_id)
-            .group_by(ExerciseSession.patient_id)
-        )
-
-        rows = q.all()
+        dashboard = await PhysicianAnalyticsService.get_dashboard(physician_id, db)
 
         return {
             "success": True,
             "patients": [
                 {
-                    "patient_id": r.patient_id,
-                    "sessions": int(r.sessions),
-                    "avg_accuracy": round(r.avg_accuracy, 2),
-                    "last_session": r.last_session
+                    "patient_id": p["patient_id"],
+                    "sessions": p["sessions"],
+                    "avg_accuracy": p["avg_accuracy"],
+                    "last_session": p["last_session"]
                 }
-                for r in rows
+                for p in dashboard["patients"]
+                if p["sessions"]
             ]
         }
+
+    # -------------------------------------------------
+    # DASHBOARD (one key lookup unless stale / missing)
+    # -------------------------------------------------
+    @staticmethod
+    async def get_dashboard(physician_id: int, db: AsyncSession) -> Dict[str, Any]:
+        row = await db.get(PhysicianDashboard, physician_id)
+        if row is None or row.stale:
+            row = await PhysicianAnalyticsService.rebuild(physician_id, db)
+
+        return PhysicianAnalyticsService._view(row)
+
+    @staticmethod
+    def _view(row: PhysicianDashboard) -> Dict[str, Any]:
+        patients = []
+        total_sessions = 0
+        accuracy_sum = 0.0
+
+        for patient_id, p in row.snapshot.get("patients", {}).items():
+            total_sessions += p["sessions"]
+            accuracy_sum += p["accuracy_sum"]
+            patients.append({
+                "patient_id": int(patient_id),
+                "full_name": p.get("full_name"),
+                "sessions": p["sessions"],
+                "avg_accuracy": round(p["accuracy_sum"] / p["sessions"], 2) if p["sessions"] else None,
+                "last_session": p["last_session"],
+            })
+
+        patients.sort(key=lambda p: p["last_session"] or "", reverse=True)
+
+        return {
+            "patient_count": len(patients),
+            "active_patients": sum(1 for p in patients if p["sessions"]),
+            "total_sessions": total_sessions,
+            "avg_accuracy": round(accuracy_sum / total_sessions, 2) if total_sessions else None,
+            "last_session": patients[0]["last_session"] if patients else None,
+            "patients": patients,
+            "updated_at": row.updated_at,
+        }
+
+    # -------------------------------------------------
+    # FULL REBUILD (from daily rollups, not raw sessions)
+    # -------------------------------------------------
+    @staticmethod
+    async def rebuild(physician_id: int, db: AsyncSession) -> PhysicianDashboard:
+        q = await db.execute(
+            select(Patient.user_id, User.full_name)
+            .join(User, User.id == Patient.user_id)
+            .where(Patient.physician_id == physician_id)
+        )
+        patients = {
+            str(user_id): {
+                "full_name": full_name,
+                "sessions": 0,
+                "accuracy_sum": 0.0,
+                "last_session": None,
+            }
+            for user_id, full_name in q.all()
+        }
+
+        if patients:
+            q = await db.execute(
+                select(
+                    PatientDailyRollup.patient_id,
+                    func.sum(PatientDailyRollup.sessions),
+                    func.sum(PatientDailyRollup.accuracy_sum),
+                    func.max(PatientDailyRollup.last_session_at),
+                )
+                .where(
+                    PatientDailyRollup.physician_id == physician_id,
+                    PatientDailyRollup.patient_id.in_([int(p) for p in patients])
+                )
+                .group_by(PatientDailyRollup.patient_id)
+            )
+            for patient_id, sessions, accuracy_sum, last_session in q.all():
+                p = patients[str(patient_id)]
+                p["sessions"] = int(sessions or 0)
+                p["accuracy_sum"] = float(accuracy_sum or 0.0)
+                p["last_session"] = last_session.isoformat() if last_session else None
+
+        row = await db.get(PhysicianDashboard, physician_id)
+        if row is None:
+            row = PhysicianDashboard(physician_id=physician_id)
+            db.add(row)
+        row.snapshot = {"patients": patients}
+        row.stale = False
+        row.updated_at = datetime.utcnow()
+
+        try:
+            await db.commit()
+        except IntegrityError:
+            # built concurrently by another request; use theirs
+            await db.rollback()
+            row = await db.get(PhysicianDashboard, physician_id)
+        return row
+
+    # -------------------------------------------------
+    # INCREMENTAL (caller's transaction)
+    # c: PatientRollupService.contribution(session)
+    # -------------------------------------------------
+    @staticmethod
+    async def apply_session(db: AsyncSession, c: Dict[str, Any], sign: int = 1):
+        row = await db.get(PhysicianDashboard, c["physician_id"], with_for_update=True)
+        if row is None or row.stale:
+            return
+
+        patients = dict(row.snapshot.get("patients", {}))
+        p = patients.get(str(c["patient_id"]))
+        if p is None:
+            # not on the snapshot's patient list → rebuild on next read
+            row.stale = True
+            return
+
+        p = dict(p)
+        p["sessions"] += sign
+        p["accuracy_sum"] += sign * c["accuracy"]
+        at = c["at"].isoformat()
+        if sign > 0 and (p["last_session"] is None or at > p["last_session"]):
+            p["last_session"] = at
+
+        patients[str(c["patient_id"])] = p
+        row.snapshot = {**row.snapshot, "patients": patients}
+        row.updated_at = datetime.utcnow()
+
+    @staticmethod
+    async def invalidate(db: AsyncSession, *physician_ids):
+        ids = [i for i in physician_ids if i is not None]
+        if ids:
+            await db.execute(
+                update(PhysicianDashboard)
+                .where(PhysicianDashboard.physician_id.in_(ids))
+                .values(stale=True)
+            )
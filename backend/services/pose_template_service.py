@@ -1,13 +1,117 @@
+import os
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from fastapi import HTTPException
 
-from database.models import PoseTemplate, Exercise, PoseType
-from pose_tracking_physician import capture_reference_pose
+from database.models import PoseTemplate, Exercise, PoseType, ExerciseRule
+
+# keep superseded templates (is_current = False) instead of deleting them
+TEMPLATE_KEEP_HISTORY = os.getenv("TEMPLATE_KEEP_HISTORY", "1") == "1"
 
 
 class PoseTemplateService:
 
+    # -------------------------------------------------
+    # UPSERT (caller commits once)
+    # poses: {PoseType: (joints, reference_angles)}
+    # rules: merged into ExerciseRule.rules when given
+    # Returns the new template version.
+    # -------------------------------------------------
+    @staticmethod
+    async def save_templates(
+        db: AsyncSession,
+        exercise_id: int,
+        poses: Dict[PoseType, Tuple[dict, dict]],
+        rules: Optional[dict] = None,
+        keep_history: bool = TEMPLATE_KEEP_HISTORY
+    ) -> int:
+        # captures of one exercise run one at a time: the lock is held
+        # until the caller commits, so max(version) + 1 cannot be shared
+        exercise = await db.get(Exercise, exercise_id, with_for_update=True)
+        if not exercise:
+            raise HTTPException(404, "Exercise not found")
+
+        version = (await db.execute(
+            select(func.coalesce(func.max(PoseTemplate.version), 0))
+            .where(PoseTemplate.exercise_id == exercise_id)
+        )).scalar() + 1
+
+        replaced = (
+            PoseTemplate.exercise_id == exercise_id,
+            PoseTemplate.pose_type.in_(list(poses)),
+        )
+        if keep_history:
+            await db.execute(
+                update(PoseTemplate)
+                .where(*replaced, PoseTemplate.is_current == True)
+                .values(is_current=False)
+            )
+        else:
+            await db.execute(delete(PoseTemplate).where(*replaced))
+
+        await db.execute(
+            insert(PoseTemplate),
+            [
+                {
+                    "exercise_id": exercise_id,
+                    "pose_type": pose_type,
+                    "joints": joints,
+                    "reference_angles": angles,
+                    "version": version,
+                    "is_current": True,
+                }
+                for pose_type, (joints, angles) in poses.items()
+            ]
+        )
+
+        if rules is not None:
+            q = await db.execute(
+                select(ExerciseRule)
+                .where(ExerciseRule.exercise_id == exercise_id)
+            )
+            rule = q.scalar_one_or_none()
+
+            if rule:
+                # new dict so the JSON change is flushed
+                rule.rules = {**(rule.rules or {}), **rules}
+            else:
+                db.add(
+                    ExerciseRule(
+                        exercise_id=exercise_id,
+                        rules=rules
+                    )
+                )
+
+        return version
+
+    # -------------------------------------------------
+    # READ (current, or a past version)
+    # -------------------------------------------------
+    @staticmethod
+    async def get_templates(exercise_id: int, db: AsyncSession, version: Optional[int] = None):
+        query = select(PoseTemplate).where(PoseTemplate.exercise_id == exercise_id)
+        if version is None:
+            query = query.where(PoseTemplate.is_current == True)
+        else:
+            query = query.where(PoseTemplate.version == version)
+
+        q = await db.execute(query.order_by(PoseTemplate.pose_type))
+        return [
+            {
+                "pose_id": t.id,
+                "pose_type": t.pose_type.value,
+                "version": t.version,
+                "is_current": t.is_current,
+                "joints": t.joints,
+                "reference_angles": t.reference_angles,
+                "created_at": t.created_at
+            }
+            for t in q.scalars().all()
+        ]
+
     @staticmethod
     async def capture_pose_template(
         exercise_id: int,
@@ -24,6 +128,9 @@ class PoseTemplateService:
             raise HTTPException(404, "Exercise not found")
 
         # 2. Capture pose via camera
+        # (imported here: camera / mediapipe are not needed for save_templates)
+        from pose_tracking_physician import capture_reference_pose
+
         result = capture_reference_pose(
             exercise_id=exercise_id,
             critical_joints=[
@@ -42,34 +149,24 @@ class PoseTemplateService:
         if "error" in result:
             raise HTTPException(400, result["error"])
 
-        # 3. Replace existing pose of same type (idempotent)
-        existing = await db.execute(
-            select(PoseTemplate)
-            .where(
-                PoseTemplate.exercise_id == exercise_id,
-                PoseTemplate.pose_type == pose_type
-            )
+        # 3. Replace existing pose of same type (one transaction)
+        version = await PoseTemplateService.save_templates(
+            db, exercise_id,
+            {pose_type: (result["joints"], result["reference_angles"])}
         )
-        existing_pose = existing.scalar_one_or_none()
-
-        if existing_pose:
-            await db.delete(existing_pose)
-            await db.commit()
+        await db.commit()
 
-        # 4. Save pose template
-        pose = PoseTemplate(
-            exercise_id=exercise_id,
-            pose_type=pose_type,
-            joints=result["joints"],
-            reference_angles=result["reference_angles"]
+        q = await db.execute(
+            select(PoseTemplate.id).where(
+                PoseTemplate.exercise_id == exercise_id,
+                PoseTemplate.pose_type == pose_type,
+                PoseTemplate.version == version
+            )
         )
 
-        db.add(pose)
-        await db.commit()
-        await db.refresh(pose)
-
         return {
             "success": True,
-            "pose_type": pose.pose_type,
-            "pose_id": pose.id
+            "pose_type": pose_type,
+            "pose_id": q.scalar(),
+            "version": version
         }
@@ -1,11 +1,14 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from fastapi import HTTPException
-import statistics
+import numpy as np
 
-from database.models import Exercise, PoseTemplate, PoseType, ExerciseRule
-from pose.rep_analysis import detect_rep_phases
-from pose.stability_analysis import assess_stability
+from database.models import Exercise, PoseType
+from pose.rep_analysis import angle_matrix, detect_rep_phases, pick_primary_joint, segment_reps
+from pose.stability_analysis import analyze_stability
+from pose.template_matching import resample
+from services.pose_template_service import PoseTemplateService
+from utils.capture_codec import CaptureFormatError, decode_capture, joints_dict, landmark_angles
 
 
 class RepCaptureService:
@@ -19,6 +22,54 @@ class RepCaptureService:
         if len(frames) < 15:
             raise HTTPException(400, "Insufficient frame data")
 
+        joints, timestamps, angles = angle_matrix(frames)
+
+        return await RepCaptureService._generate(
+            exercise_id, joints, timestamps, angles,
+            lambda i: frames[i].joints,
+            db
+        )
+
+    # -------------------------------------
+    # BINARY UPLOAD (utils/capture_codec.py)
+    # float32 (frames, 33, 4) landmarks + float64 timestamps
+    # -------------------------------------
+    @staticmethod
+    async def capture_binary(
+        exercise_id: int,
+        body: bytes,
+        db: AsyncSession
+    ):
+        try:
+            timestamps, landmarks = decode_capture(body)
+        except CaptureFormatError as e:
+            raise HTTPException(400, str(e))
+
+        if len(timestamps) < 15:
+            raise HTTPException(400, "Insufficient frame data")
+
+        joints, angles = landmark_angles(landmarks)
+
+        return await RepCaptureService._generate(
+            exercise_id, joints, timestamps, angles,
+            lambda i: joints_dict(landmarks[i]),
+            db
+        )
+
+    # -------------------------------------
+    # SEGMENT + SAVE
+    # angles: (frames, joints) with NaN for missing
+    # frame_joints(i): landmark dict stored with a template
+    # -------------------------------------
+    @staticmethod
+    async def _generate(
+        exercise_id: int,
+        joints: list,
+        timestamps: np.ndarray,
+        angles: np.ndarray,
+        frame_joints,
+        db: AsyncSession
+    ):
         q = await db.execute(
             select(Exercise).where(Exercise.id == exercise_id)
         )
@@ -26,112 +77,103 @@ class RepCaptureService:
         if not exercise:
             raise HTTPException(404, "Exercise not found")
 
-        primary_joint = "left_shoulder"
-
-        # ---- ANGLE SERIES ----
-        angle_series = [
-            f.angles.get(primary_joint)
-            for f in frames
-            if f.angles and primary_joint in f.angles
-        ]
+        def frame_angles(i):
+            return {
+                j: float(v) for j, v in zip(joints, angles[i]) if not np.isnan(v)
+            }
 
-        if len(angle_series) < 5:
+        # ---- SEGMENTATION (all joints at once) ----
+        primary_joint = pick_primary_joint(joints, angles)
+        if primary_joint is None:
             raise HTTPException(400, "Not enough valid joint angles")
 
-        start_i, peak_i, end_i = detect_rep_phases(angle_series)
-
-        start = frames[start_i]
-        peak = frames[peak_i]
-        end = frames[end_i]
-
-        # ---- REFERENCE POSE (MOST STABLE) ----
-        reference = min(
-            frames,
-            key=lambda f: statistics.pstdev(
-                f.angles.values()
-            ) if f.angles else float("inf")
-        )
+        series = angles[:, joints.index(primary_joint)]
+        if np.count_nonzero(~np.isnan(series)) < 5:
+            raise HTTPException(400, "Not enough valid joint angles")
 
-        # ---- SAVE POSES ----
-        for pose_type, frame in [
-            (PoseType.reference, reference),
-            (PoseType.start, start),
-            (PoseType.peak, peak),
-            (PoseType.end, end),
-        ]:
-            await RepCaptureService._save_pose(
-                exercise_id, pose_type, frame, db
-            )
-
-        # ---- ANGLE RANGES ----
+        reps = segment_reps(series)
+        if not reps:
+            # no clear hysteresis crossing: treat the clip as one rep
+            valid = np.flatnonzero(~np.isnan(series))
+            reps = [tuple(int(valid[i]) for i in detect_rep_phases(series[valid]))]
+
+        # representative rep: range of motion closest to the median
+        roms = np.array([abs(series[p] - series[s]) for s, p, _ in reps])
+        start_i, peak_i, end_i = reps[int(np.argmin(np.abs(roms - np.median(roms))))]
+
+        # ---- STABILITY + REFERENCE POSE (most stable window) ----
+        stability = analyze_stability(joints, angles)
+        reference_i = stability["stableWindow"]["referenceFrame"]
+
+        # ---- ANGLE RANGES (over every rep) ----
+        idx = np.array([i for s, p, _ in reps for i in (s, p)])
+        with np.errstate(all="ignore"):
+            lows = np.nanmin(angles[idx], axis=0)
+            highs = np.nanmax(angles[idx], axis=0)
         angle_ranges = {
-            j: {
-                "min": min(start.angles[j], peak.angles[j]),
-                "max": max(start.angles[j], peak.angles[j]),
+            j: {"min": round(float(lows[k]), 2), "max": round(float(highs[k]), 2)}
+            for k, j in enumerate(joints)
+            if not np.isnan(lows[k])
+        }
+
+        # ---- PER-REP TEMPLATES ----
+        rep_templates = [
+            {
+                "start": frame_angles(s),
+                "peak": frame_angles(p),
+                "end": frame_angles(e),
+                "duration": round(float(timestamps[e] - timestamps[s]), 2),
             }
-            for j in start.angles
-            if j in peak.angles
+            for s, p, e in reps
+        ]
+
+        # ---- REP TRAJECTORIES (DTW templates, pose/template_matching.py) ----
+        trajectories = np.stack([resample(angles[s:e + 1]) for s, _, e in reps])
+        keep = [k for k in range(len(joints)) if not np.isnan(trajectories[:, :, k]).any()]
+        rep_trajectories = {
+            "joints": [joints[k] for k in keep],
+            "reps": np.round(trajectories[:, :, keep], 1).tolist()
         }
 
         # ---- TIMING ----
         timing = {
             "repDuration": round(
-                end.timestamp - start.timestamp, 2
-            )
+                float(timestamps[end_i] - timestamps[start_i]), 2
+            ),
+            "medianRepDuration": round(
+                float(np.median([r["duration"] for r in rep_templates])), 2
+            ),
+            "repCount": len(reps)
         }
 
-        # ---- STABILITY ----
-        stability = assess_stability(frames)
-
-        # ---- SAVE RULES ----
-        q = await db.execute(
-            select(ExerciseRule)
-            .where(ExerciseRule.exercise_id == exercise_id)
-        )
-        rule = q.scalar_one_or_none()
-
+        # ---- SAVE TEMPLATES + RULES (one transaction) ----
         payload = {
+            "primaryJoint": primary_joint,
             "angleRanges": angle_ranges,
             "timing": timing,
-            "stability": stability
+            "stability": stability,
+            "repTemplates": rep_templates,
+            "repTrajectories": rep_trajectories
         }
 
-        if rule:
-            rule.rules.update(payload)
-        else:
-            db.add(
-                ExerciseRule(
-                    exercise_id=exercise_id,
-                    rules=payload
-                )
-            )
-
-        await db.commit()
-        return {"success": True}
-
-    # -------------------------------------
-    # SAVE SINGLE POSE TEMPLATE
-    # -------------------------------------
-    @staticmethod
-    async def _save_pose(exercise_id, pose_type, frame, db):
-        q = await db.execute(
-            select(PoseTemplate)
-            .where(
-                PoseTemplate.exercise_id == exercise_id,
-                PoseTemplate.pose_type == pose_type
-            )
-        )
-        old = q.scalar_one_or_none()
-        if old:
-            await db.delete(old)
-            await db.commit()
-
-        db.add(
-            PoseTemplate(
-                exercise_id=exercise_id,
-                pose_type=pose_type,
-                joints=frame.joints,
-                reference_angles=frame.angles
-            )
+        version = await PoseTemplateService.save_templates(
+            db, exercise_id,
+            {
+                pose_type: (frame_joints(i), frame_angles(i))
+                for pose_type, i in [
+                    (PoseType.reference, reference_i),
+                    (PoseType.start, start_i),
+                    (PoseType.peak, peak_i),
+                    (PoseType.end, end_i),
+                ]
+            },
+            rules=payload
         )
+
         await db.commit()
+        return {
+            "success": True,
+            "primary_joint": primary_joint,
+            "reps_detected": len(reps),
+            "template_version": version
+        }
@@ -1,20 +1,312 @@
+# services/rep_counter.py
+#
+# One table-driven rep counter for every live path and for offline replay.
+#
+# A RepMachine is compiled once per rep definition (states, zones,
+# transitions as arrays) and shared. Each session only holds a RepState
+# (five slots), so thousands of sessions fit in memory.
+#
+# repDefinition (explicit table):
+#   "angles":      [names]   joints whose mean is the "mean" column
+#   "zones":       {zone: {joint | "mean": [lo, hi], ...}}   all must hold
+#   "states":      [names]   the first one is the start state
+#   "rest":        [names]   states outside a rep (default: the first)
+#   "transitions": [{"from", "when": zone | "!zone", "to",
+#                    "hold": seconds in "from" first, "count": bool}]
+#   "maxRepTime":  seconds from leaving rest to the count, else reset
+#
+# Older definitions are translated:
+#   range  {"joint", "validRange", "exitRange", "minHoldTime"}
+#          OUTSIDE → ENTERED → COUNTED (+1) → OUTSIDE      (process_frame)
+#   phase  {"joint" | "angles", "validRange": [low, high]}
+#          hysteresis: IDLE → DOWN (< low) → UP (> high, +1) → DOWN
+#
+# step() takes the frame's full {joint: degrees} dict; zones may name any
+# joint (RepMachine.inputs lists them all).
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# live defaults, shared with offline replay (services/rescoring_service.py)
+# preset without a repDefinition (process_frame)
+DEFAULT_REP_DEFINITION = {
+    "joint": "left_shoulder",
+    "validRange": [80, 120],
+    "exitRange": [0, 60],
+    "minHoldTime": 0.25,
+}
+# exercise without any preset (LiveFeedbackService)
+FALLBACK_REP_DEFINITION = {
+    "joint": "any_joint",
+    "validRange": [40, 140],
+    "exitRange": [0, 90],
+    "minHoldTime": 0.15,
+}
+
+
+class RepState:
+    __slots__ = ("state", "entered_at", "rep_start", "pending", "count")
+
+    def __init__(self):
+        self.state = 0
+        self.entered_at = None
+        self.rep_start = None
+        self.pending = False
+        self.count = 0
+
+
+class RepMachine:
+
+    def __init__(self, definition: dict):
+        self.states: List[str] = list(definition["states"])
+        index = {s: i for i, s in enumerate(self.states)}
+        self.rest = np.zeros(len(self.states), bool)
+        self.rest[[index[s] for s in definition.get("rest") or self.states[:1]]] = True
+
+        self.signal = list(definition.get("angles") or [])
+        zones = definition.get("zones") or {}
+        self.columns = list(dict.fromkeys(
+            c for zone in zones.values() for c in zone
+        ))
+        self.zone_names = list(zones)
+        # every named angle the machine reads
+        self.inputs = list(dict.fromkeys(
+            [*self.signal, *(c for c in self.columns if c != "mean")]
+        ))
+
+        z, c = len(zones), len(self.columns)
+        self.lo = np.full((z, c), -np.inf)
+        self.hi = np.full((z, c), np.inf)
+        self.constrained = np.zeros((z, c), bool)
+        for i, zone in enumerate(zones.values()):
+            for name, (lo, hi) in zone.items():
+                k = self.columns.index(name)
+                self.lo[i, k], self.hi[i, k] = float(lo), float(hi)
+                self.constrained[i, k] = True
+
+        # transitions grouped by source state, in table order
+        self.by_state: List[list] = [[] for _ in self.states]
+        for t in definition.get("transitions") or []:
+            when = t["when"]
+            negate = when.startswith("!")
+            self.by_state[index[t["from"]]].append((
+                self.zone_names.index(when.lstrip("!")),
+                negate,
+                float(t.get("hold") or 0.0),
+                index[t["to"]],
+                bool(t.get("count")),
+            ))
+
+        self.max_rep_time = definition.get("maxRepTime")
+
+    # -------------------------------------------
+    # BUILD FROM A PRESET repDefinition
+    # -------------------------------------------
+    @staticmethod
+    def from_definition(rep: dict, mode: str = "phase") -> Optional["RepMachine"]:
+        if rep.get("transitions"):
+            return RepMachine(rep)
+
+        signal = rep.get("angles") or ([rep["joint"]] if rep.get("joint") else [])
+        if not signal or not rep.get("validRange"):
+            return None
+        low, high = rep["validRange"]
+
+        if mode == "range":
+            exit_low, exit_high = rep.get("exitRange", [0, 60])
+            return RepMachine({
+                "angles": signal,
+                "zones": {
+                    "valid": {"mean": [low, high]},
+                    "exit": {"mean": [exit_low, exit_high]},
+                },
+                "states": ["OUTSIDE", "ENTERED", "COUNTED"],
+                "rest": ["OUTSIDE", "COUNTED"],
+                "transitions": [
+                    {"from": "OUTSIDE", "when": "valid", "to": "ENTERED"},
+                    {"from": "ENTERED", "when": "!valid", "to": "OUTSIDE"},
+                    {"from": "ENTERED", "when": "valid", "to": "COUNTED",
+                     "hold": rep.get("minHoldTime"), "count": True},
+                    {"from": "COUNTED", "when": "exit", "to": "OUTSIDE"},
+                ],
+                "maxRepTime": rep.get("maxRepTime"),
+            })
+
+        return RepMachine({
+            "angles": signal,
+            "zones": {
+                # strict: down below low, up above high
+                "down": {"mean": [-np.inf, np.nextafter(low, -np.inf)]},
+                "up": {"mean": [np.nextafter(high, np.inf), np.inf]},
+            },
+            "states": ["IDLE", "DOWN", "UP"],
+            "rest": ["IDLE", "DOWN"],
+            "transitions": [
+                {"from": "IDLE", "when": "down", "to": "DOWN"},
+                {"from": "DOWN", "when": "up", "to": "UP", "count": True},
+                {"from": "UP", "when": "down", "to": "DOWN"},
+            ],
+            "maxRepTime": rep.get("maxRepTime"),
+        })
+
+    def new_state(self) -> RepState:
+        return RepState()
+
+    def state_name(self, st: RepState) -> str:
+        return self.states[st.state]
+
+    def _row(self, angles: Dict[str, float]) -> np.ndarray:
+        values = {k: v for k, v in (angles or {}).items() if v is not None}
+        signal = [values.get(j) for j in self.signal]
+        mean = np.nan if not signal or None in signal else float(np.mean(signal))
+        return np.array(
+            [mean if c == "mean" else values.get(c, np.nan) for c in self.columns],
+            dtype=np.float64
+        )
+
+    def _zones(self, x: np.ndarray) -> np.ndarray:
+        """x (..., columns) → (..., zones) membership."""
+        x = x[..., None, :]
+        inside = (x >= self.lo) & (x <= self.hi)
+        return (inside | ~self.constrained).all(axis=-1)
+
+    def _advance(self, st: RepState, t: float, in_zone) -> bool:
+        if st.entered_at is None:
+            st.entered_at = t
+
+        if (
+            st.pending and self.max_rep_time
+            and t - st.rep_start > self.max_rep_time
+        ):
+            # rep took too long: back to the start state, not counted
+            st.state, st.entered_at, st.pending = 0, t, False
+
+        for zone, negate, hold, dst, count in self.by_state[st.state]:
+            if in_zone[zone] != negate and t - st.entered_at >= hold:
+                if self.rest[st.state] and not self.rest[dst]:
+                    st.rep_start, st.pending = t, True
+                st.state, st.entered_at = dst, t
+                if count:
+                    st.count += 1
+                    st.pending = False
+                elif self.rest[dst]:
+                    st.pending = False
+                return count
+        return False
+
+    # -------------------------------------------
+    # LIVE: one frame, {joint: degrees}
+    # Returns True when this frame completed a rep.
+    # -------------------------------------------
+    def step(self, st: RepState, t: float, angles: Dict[str, float]) -> bool:
+        return self._advance(st, t, self._zones(self._row(angles)))
+
+    # -------------------------------------------
+    # BATCH: replay a stored trace (regression tests, re-scoring)
+    # zone membership for every frame in one pass, then a tight loop
+    # -------------------------------------------
+    def replay(self, ts_sec, joints: List[str], values: np.ndarray) -> dict:
+        values = np.asarray(values, dtype=np.float64)
+        col = {j: i for i, j in enumerate(joints)}
+
+        def column(name):
+            return values[:, col[name]] if name in col else np.full(len(values), np.nan)
+
+        mean = (
+            np.mean([column(j) for j in self.signal], axis=0)
+            if self.signal else np.full(len(values), np.nan)
+        )
+        x = np.stack(
+            [mean if c == "mean" else column(c) for c in self.columns], axis=1
+        ) if self.columns else np.empty((len(values), 0))
+        in_zone = self._zones(x)
+
+        st = self.new_state()
+        events = []
+        attempts = 0    # rest → rep departures, counted or not
+        for i, t in enumerate(np.asarray(ts_sec, dtype=np.float64).tolist()):
+            before = st.state
+            if self._advance(st, t, in_zone[i]):
+                events.append(t)
+            if self.rest[before] and not self.rest[st.state]:
+                attempts += 1
+
+        return {"reps": st.count, "attempts": attempts, "events": events}
+
+
 class RepCounter:
+    """Single-angle convenience wrapper (hysteresis between min and max)."""
+
+    __slots__ = ("machine", "st")
+
     def __init__(self, min_angle, max_angle):
-        self.min_angle = min_angle
-        self.max_angle = max_angle
-        self.state = "START"
-        self.reps = 0
+        self.machine = RepMachine({
+            "angles": ["angle"],
+            "zones": {
+                "down": {"mean": [-np.inf, min_angle]},
+                "up": {"mean": [max_angle, np.inf]},
+            },
+            "states": ["START", "DOWN", "UP"],
+            "rest": ["START", "DOWN"],
+            "transitions": [
+                {"from": "START", "when": "down", "to": "DOWN"},
+                {"from": "DOWN", "when": "up", "to": "UP"},
+                {"from": "UP", "when": "down", "to": "DOWN", "count": True},
+            ],
+        })
+        self.st = self.machine.new_state()
 
-    def update(self, angle: float):
-        if self.state == "START" and angle <= self.min_angle:
-            self.state = "DOWN"
+    @property
+    def reps(self):
+        return self.st.count
 
-        elif self.state == "DOWN" and angle >= self.max_angle:
-            self.state = "UP"
+    @property
+    def state(self):
+        return self.machine.state_name(self.st)
 
-        elif self.state == "UP" and angle <= self.min_angle:
-            self.reps += 1
-            self.state = "DOWN"
-            return True  # rep completed
+    def update(self, angle: float, t: float = 0.0) -> bool:
+        return self.machine.step(self.st, t, {"angle": angle})
 
-        return False
+
+if __name__ == "__main__":
+    # replays stored angle traces through the current presets and prints
+    # sessions whose recomputed rep count differs from the saved one
+    import asyncio
+    from sqlalchemy.future import select
+    from database.connection import AsyncSessionLocal
+    from database.models import ExercisePreset, ExerciseSession, SessionAngleTrace
+    from utils.angle_trace import decode_trace
+
+    async def _regression():
+        async with AsyncSessionLocal() as db:
+            presets = {
+                p.exercise_id: p.preset
+                for p in (await db.execute(select(ExercisePreset))).scalars()
+            }
+            machines = {}
+
+            q = await db.stream(
+                select(SessionAngleTrace, ExerciseSession.exercise_id, ExerciseSession.completed_reps)
+                .join(ExerciseSession, ExerciseSession.id == SessionAngleTrace.session_id)
+                .execution_options(yield_per=200)
+            )
+            checked = differ = 0
+            async for trace, exercise_id, saved in q:
+                if exercise_id not in machines:
+                    rep = (presets.get(exercise_id) or {}).get("repDefinition") or {}
+                    machines[exercise_id] = RepMachine.from_definition(rep, mode="range")
+                machine = machines[exercise_id]
+                if machine is None:
+                    continue
+
+                ts, joints, values = decode_trace(trace.data, trace.trace_index)
+                reps = machine.replay(ts / 1000.0, joints, values)["reps"]
+                checked += 1
+                if reps != (saved or 0):
+                    differ += 1
+                    print(f"session {trace.session_id}: saved {saved}, replayed {reps}")
+
+            print(f"{checked} sessions replayed, {differ} differ")
+
+    asyncio.run(_regression())
@@ -0,0 +1,135 @@
+# services/rep_matching_service.py
+
+from typing import List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database.models import ExerciseRule, ExerciseSession, SessionAngleTrace
+from pose.rep_analysis import pick_primary_joint, segment_reps
+from pose.template_matching import keyframe_trajectory, match_rep
+from services.pose_template_service import PoseTemplateService
+from utils.angle_trace import decode_trace
+
+
+class RepMatchingService:
+    """
+    Scores patient reps against the physician's recorded reps
+    (ExerciseRule.rules["repTrajectories"], written by RepCaptureService).
+    Exercises captured before trajectories were stored fall back to a
+    start → peak → end rep built from the current PoseTemplates.
+    """
+
+    # -------------------------------------------
+    # TEMPLATE SET (load once per session / batch)
+    # -------------------------------------------
+    @staticmethod
+    async def load_templates(exercise_id: int, db: AsyncSession) -> Optional[dict]:
+        q = await db.execute(
+            select(ExerciseRule.rules)
+            .where(ExerciseRule.exercise_id == exercise_id)
+        )
+        rules = q.scalars().first() or {}
+
+        trajectories = rules.get("repTrajectories") or {}
+        if trajectories.get("reps"):
+            return {
+                "source": "trajectories",
+                "primaryJoint": rules.get("primaryJoint"),
+                "joints": trajectories["joints"],
+                "reps": np.array(trajectories["reps"], dtype=np.float64),
+            }
+
+        poses = {
+            t["pose_type"]: t["reference_angles"] or {}
+            for t in await PoseTemplateService.get_templates(exercise_id, db)
+        }
+        if "start" not in poses or "peak" not in poses:
+            return None
+
+        end = poses.get("end") or poses["start"]
+        joints = sorted(set(poses["start"]) & set(poses["peak"]) & set(end))
+        if not joints:
+            return None
+
+        return {
+            "source": "keyframes",
+            "primaryJoint": rules.get("primaryJoint"),
+            "joints": joints,
+            "reps": keyframe_trajectory(poses["start"], poses["peak"], end, joints)[None],
+        }
+
+    # -------------------------------------------
+    # LIVE: one rep's buffered frame angles
+    # -------------------------------------------
+    @staticmethod
+    def match_frames(template: dict, frames: List[dict]):
+        if not template or len(frames) < 3:
+            return None
+
+        joints = template["joints"]
+        angles = np.array(
+            [[f.get(j, np.nan) for j in joints] for f in frames],
+            dtype=np.float64
+        )
+        return match_rep(joints, angles, joints, template["reps"])
+
+    # -------------------------------------------
+    # BATCH: every rep of a stored trace (sync, no DB)
+    # -------------------------------------------
+    @staticmethod
+    def score_trace(template: dict, ts_ms: np.ndarray, joints: List[str], values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+
+        primary = template.get("primaryJoint")
+        if primary not in joints:
+            primary = pick_primary_joint(joints, values)
+        if primary is None:
+            return {"primaryJoint": None, "score": None, "reps": []}
+
+        reps = []
+        for s, _, e in segment_reps(values[:, joints.index(primary)]):
+            match = match_rep(joints, values[s:e + 1], template["joints"], template["reps"])
+            if match:
+                reps.append({
+                    "rep": len(reps) + 1,
+                    "start": round(float(ts_ms[s]) / 1000, 3),
+                    "end": round(float(ts_ms[e]) / 1000, 3),
+                    **match
+                })
+
+        return {
+            "primaryJoint": primary,
+            "score": round(float(np.mean([r["score"] for r in reps])), 1) if reps else None,
+            "reps": reps
+        }
+
+    @staticmethod
+    async def score_session(
+        session_id: int,
+        db: AsyncSession,
+        patient_id: Optional[int] = None,
+        physician_id: Optional[int] = None
+    ):
+        session = await db.get(ExerciseSession, session_id)
+        trace = await db.get(SessionAngleTrace, session_id)
+        if (
+            not session or not trace
+            or (patient_id is not None and trace.patient_id != patient_id)
+            or (physician_id is not None and trace.physician_id != physician_id)
+        ):
+            raise HTTPException(404, "Trace not found")
+
+        template = await RepMatchingService.load_templates(session.exercise_id, db)
+        if not template:
+            raise HTTPException(404, "No rep template for this exercise")
+
+        ts, joints, values = decode_trace(trace.data, trace.trace_index)
+        return {
+            "session_id": session_id,
+            "exercise_id": session.exercise_id,
+            "templateSource": template["source"],
+            **RepMatchingService.score_trace(template, ts, joints, values)
+        }
@@ -1,31 +1,40 @@
+import json
+import math
+from datetime import date, datetime, time, timedelta
+from typing import AsyncIterator, Optional
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+
+from database.connection import AsyncSessionLocal
 from database.models import ExerciseSession
+from services.patient_rollup_service import PatientRollupService, merge_counts
 
 
 class ReportService:
 
+    # served from patient_daily_rollups: cost grows with active days,
+    # not with the number of sessions
     @staticmethod
-    async def patient_report(patient_id: int, db: AsyncSession):
-        q = await db.execute(
-            select(ExerciseSession)
-            .where(ExerciseSession.patient_id == patient_id)
-            .order_by(ExerciseSession.created_at)
-        )
-
-        sessions = q.scalars().all()
-        if not sessions:
+    async def patient_report(
+        patient_id: int,
+        db: AsyncSession,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ):
+        rollups = await PatientRollupService.get_rollups(patient_id, db, date_from, date_to)
+        if not rollups:
             return {}
 
-        total_reps = sum(s.completed_reps for s in sessions)
+        total_sessions = sum(r.sessions for r in rollups)
+        total_reps = sum(r.total_reps for r in rollups)
         avg_accuracy = round(
-            sum(s.accuracy_score for s in sessions) / len(sessions), 2
+            sum(r.accuracy_sum for r in rollups) / max(total_sessions, 1), 2
         )
 
         error_freq = {}
-        for s in sessions:
-            for e, c in (s.error_summary or {}).items():
-                error_freq[e] = error_freq.get(e, 0) + c
+        for r in rollups:
+            merge_counts(error_freq, r.error_counts or {})
 
         common_mistakes = sorted(
             [
@@ -36,23 +45,118 @@ class ReportService:
             reverse=True
         )[:5]
 
+        # one entry per day (all exercises of that day combined)
+        days = {}
+        for r in rollups:
+            d = days.setdefault(r.day, {
+                "sessions": 0, "reps": 0, "accuracy_sum": 0.0,
+                "duration_sec": 0.0, "errors": {}
+            })
+            d["sessions"] += r.sessions
+            d["reps"] += r.total_reps
+            d["accuracy_sum"] += r.accuracy_sum
+            d["duration_sec"] += r.duration_sum
+            merge_counts(d["errors"], r.error_counts or {})
+
         timeline = [
             {
-                "date": s.created_at.isoformat(),
-                "reps": s.completed_reps,
-                "accuracy": s.accuracy_score,
-                "duration_sec": s.duration_sec,
-                "errors": s.error_summary or {}
+                "date": day.isoformat(),
+                "sessions": d["sessions"],
+                "reps": d["reps"],
+                "accuracy": round(d["accuracy_sum"] / max(d["sessions"], 1), 2),
+                "duration_sec": round(d["duration_sec"], 2),
+                "errors": d["errors"]
             }
-            for s in sessions
+            for day, d in sorted(days.items())
         ]
 
         return {
             "summary": {
-                "total_sessions": len(sessions),
+                "total_sessions": total_sessions,
                 "total_reps": total_reps,
                 "avg_accuracy": avg_accuracy
             },
             "common_mistakes": common_mistakes,
             "timeline": timeline
         }
+
+    # -------------------------------------------------
+    # STREAMING REPORT (NDJSON)
+    #   {"type": "summary", ...}        from rollups
+    #   {"type": "session", ...} * n    per session, server-side cursor
+    # With max_points, consecutive sessions are averaged into buckets so
+    # the timeline has at most max_points entries.
+    # -------------------------------------------------
+    @staticmethod
+    async def stream_patient_report(
+        patient_id: int,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        max_points: Optional[int] = None,
+        chunk_size: int = 500
+    ) -> AsyncIterator[bytes]:
+
+        def line(obj) -> bytes:
+            return (json.dumps(obj, default=str) + "\n").encode()
+
+        # own session: it has to outlive the request handler
+        async with AsyncSessionLocal() as db:
+            report = await ReportService.patient_report(patient_id, db, date_from, date_to)
+            summary = report.get("summary", {"total_sessions": 0, "total_reps": 0, "avg_accuracy": 0})
+
+            yield line({
+                "type": "summary",
+                **summary,
+                "common_mistakes": report.get("common_mistakes", []),
+            })
+
+            total = summary["total_sessions"]
+            stride = 1
+            if max_points and total > max_points:
+                stride = math.ceil(total / max_points)
+
+            query = (
+                select(ExerciseSession)
+                .where(ExerciseSession.patient_id == patient_id)
+                .order_by(ExerciseSession.created_at, ExerciseSession.id)
+                .execution_options(yield_per=chunk_size)
+            )
+            if date_from is not None:
+                query = query.where(ExerciseSession.created_at >= datetime.combine(date_from, time.min))
+            if date_to is not None:
+                query = query.where(ExerciseSession.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+
+            bucket = []
+            result = await db.stream_scalars(query)
+            async for s in result:
+                bucket.append(s)
+                if len(bucket) >= stride:
+                    yield line(ReportService._timeline_point(bucket))
+                    bucket = []
+
+            if bucket:
+                yield line(ReportService._timeline_point(bucket))
+
+    @staticmethod
+    def _timeline_point(sessions) -> dict:
+        if len(sessions) == 1:
+            s = sessions[0]
+            return {
+                "type": "session",
+                "date": s.created_at.isoformat(),
+                "reps": s.completed_reps,
+                "accuracy": s.accuracy_score,
+                "duration_sec": s.duration_sec,
+                "errors": s.error_summary or {}
+            }
+
+        n = len(sessions)
+        return {
+            "type": "session",
+            "date": sessions[0].created_at.isoformat(),
+            "date_end": sessions[-1].created_at.isoformat(),
+            "sessions": n,
+            "reps": round(sum(s.completed_reps or 0 for s in sessions) / n, 2),
+            "accuracy": round(sum(s.accuracy_score or 0 for s in sessions) / n, 2),
+            "duration_sec": round(sum(s.duration_sec or 0 for s in sessions) / n, 2),
+        }
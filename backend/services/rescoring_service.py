@@ -0,0 +1,257 @@
+# services/rescoring_service.py
+#
+# Offline re-scoring of past sessions under a candidate repDefinition
+# (an AIRuleService suggestion or a preset edit before it is saved).
+#
+# Every stored angle trace (session_angle_traces) is replayed twice, with
+# the exercise's current repDefinition and with the candidate, the way
+# process_frame sees it live: EMA-smoothed, missing angles as 0.0, then the
+# range RepMachine. The result is the per-session change in rep count and
+# accuracy (counted reps / rep attempts).
+#
+# Traces are decoded and replayed in a process pool in chunks of
+# RESCORE_CHUNK sessions while the DB is still streaming rows. Only the
+# rep definitions and compressed trace bytes cross the process boundary.
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from config import RESCORE_MAX_SESSIONS
+from database.models import ExercisePreset, ExerciseSession, SessionAngleTrace
+from services.rep_counter import DEFAULT_REP_DEFINITION, FALLBACK_REP_DEFINITION, RepMachine
+from utils.angle_trace import decode_trace
+
+RESCORE_WORKERS = int(os.getenv("RESCORE_WORKERS", os.cpu_count() or 2))
+RESCORE_CHUNK = int(os.getenv("RESCORE_CHUNK", 64))            # sessions per task
+
+LIVE_ALPHA = 0.6    # process_frame smoothing
+EMA_BLOCK = 64
+
+_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def _pool() -> ProcessPoolExecutor:
+    # created on first use; "spawn" so workers never inherit the event
+    # loop or open DB connections
+    global _POOL
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(
+            max_workers=RESCORE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _POOL
+
+
+def _ema(values: np.ndarray, alpha: float, block: int = EMA_BLOCK) -> np.ndarray:
+    """
+    Column-wise y[i] = alpha * x[i] + (1 - alpha) * y[i - 1], y[0] = x[0].
+    Within a block the recurrence is one lower-triangular matmul; only the
+    carry between blocks is sequential.
+    """
+    n = len(values)
+    if not n:
+        return values
+    beta = 1.0 - alpha
+
+    k = np.arange(block)
+    lag = k[:, None] - k[None, :]
+    weights = np.where(lag >= 0, alpha * beta ** np.maximum(lag, 0), 0.0)   # (block, block)
+    decay = beta ** (k + 1)
+
+    padded = np.zeros((-(-n // block) * block, values.shape[1]))
+    padded[:n] = values
+    local = weights @ padded.reshape(-1, block, values.shape[1])           # (blocks, block, cols)
+
+    carry = values[0]    # y[-1] = x[0] gives y[0] = x[0]
+    for blk in local:
+        blk += decay[:, None] * carry
+        carry = blk[-1]
+    return local.reshape(-1, values.shape[1])[:n]
+
+
+def _accuracy(result: dict) -> Optional[float]:
+    if not result["attempts"]:
+        return None
+    return round(100.0 * result["reps"] / result["attempts"], 1)
+
+
+def _rescore_chunk(current: dict, candidate: dict, rows: List[tuple]) -> List[dict]:
+    """Worker: rows of (session_id, patient_id, saved_reps, data, trace_index)."""
+    machines = {
+        "current": RepMachine.from_definition(current, mode="range"),
+        "candidate": RepMachine.from_definition(candidate, mode="range"),
+    }
+    # every angle either machine reads
+    names = list(dict.fromkeys(n for m in machines.values() if m for n in m.inputs))
+
+    out = []
+    for session_id, patient_id, saved_reps, data, trace_index in rows:
+        ts, joints, values = decode_trace(data, trace_index)
+        col = {j: i for i, j in enumerate(joints)}
+        picked = np.zeros((len(ts), len(names)))
+        for k, name in enumerate(names):
+            if name in col:
+                picked[:, k] = np.nan_to_num(values[:, col[name]], nan=0.0)
+        smoothed = _ema(picked, LIVE_ALPHA)
+
+        row = {"session_id": session_id, "patient_id": patient_id, "savedReps": saved_reps}
+        for key, machine in machines.items():
+            if machine is None:
+                row[key] = {"reps": 0, "accuracy": None}
+                continue
+            result = machine.replay(ts / 1000.0, names, smoothed)
+            row[key] = {"reps": result["reps"], "accuracy": _accuracy(result)}
+
+        row["deltaReps"] = row["candidate"]["reps"] - row["current"]["reps"]
+        a, b = row["current"]["accuracy"], row["candidate"]["accuracy"]
+        row["deltaAccuracy"] = None if a is None or b is None else round(b - a, 1)
+        out.append(row)
+    return out
+
+
+class RescoringService:
+
+    # -------------------------------------------
+    # CURRENT RULES (latest preset, as the live session loads them:
+    # no preset → FALLBACK, preset without repDefinition → DEFAULT)
+    # -------------------------------------------
+    @staticmethod
+    async def current_rep_definition(exercise_id: int, db: AsyncSession) -> dict:
+        q = await db.execute(
+            select(ExercisePreset.preset)
+            .where(ExercisePreset.exercise_id == exercise_id)
+            .order_by(ExercisePreset.id.desc())
+            .limit(1)
+        )
+        preset = q.scalars().first()
+        if preset is None:
+            return FALLBACK_REP_DEFINITION
+        return preset.get("repDefinition") or DEFAULT_REP_DEFINITION
+
+    # -------------------------------------------
+    # SUMMARY over the per-session rows
+    # -------------------------------------------
+    @staticmethod
+    def summarize(rows: List[dict]) -> dict:
+        if not rows:
+            return {"sessions": 0}
+
+        current = np.array([r["current"]["reps"] for r in rows], dtype=np.float64)
+        candidate = np.array([r["candidate"]["reps"] for r in rows], dtype=np.float64)
+        saved = np.array([r["savedReps"] or 0 for r in rows], dtype=np.float64)
+
+        def mean_accuracy(key):
+            acc = np.array(
+                [r[key]["accuracy"] for r in rows if r[key]["accuracy"] is not None],
+                dtype=np.float64
+            )
+            return round(float(acc.mean()), 1) if len(acc) else None
+
+        before, after = mean_accuracy("current"), mean_accuracy("candidate")
+        return {
+            "sessions": len(rows),
+            "changedSessions": int((candidate != current).sum()),
+            # replay fidelity: current rules reproduce the saved count
+            "matchingSaved": int((current == saved).sum()),
+            "currentReps": int(current.sum()),
+            "candidateReps": int(candidate.sum()),
+            "meanDeltaReps": round(float((candidate - current).mean()), 2),
+            "repChangePct": (
+                round(float(100.0 * (candidate.sum() - current.sum()) / current.sum()), 1)
+                if current.sum() else None
+            ),
+            "currentAccuracy": before,
+            "candidateAccuracy": after,
+            "deltaAccuracy": None if before is None or after is None else round(after - before, 1),
+        }
+
+    # -------------------------------------------
+    # BATCH: every stored trace of an exercise
+    # -------------------------------------------
+    @staticmethod
+    async def rescore(
+        exercise_id: int,
+        candidate: dict,
+        db: AsyncSession,
+        physician_id: Optional[int] = None,
+        patient_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        include_sessions: bool = False,
+        session_ids: Optional[List[int]] = None
+    ):
+        current = await RescoringService.current_rep_definition(exercise_id, db)
+        candidate = {**current, **(candidate or {})}
+
+        query = (
+            select(
+                SessionAngleTrace.session_id,
+                SessionAngleTrace.patient_id,
+                ExerciseSession.completed_reps,
+                SessionAngleTrace.data,
+                SessionAngleTrace.trace_index,
+            )
+            .join(ExerciseSession, ExerciseSession.id == SessionAngleTrace.session_id)
+            .where(ExerciseSession.exercise_id == exercise_id)
+            .order_by(SessionAngleTrace.session_id.desc())
+            .limit(min(limit or RESCORE_MAX_SESSIONS, RESCORE_MAX_SESSIONS))
+            .execution_options(yield_per=RESCORE_CHUNK)
+        )
+        if physician_id is not None:
+            query = query.where(SessionAngleTrace.physician_id == physician_id)
+        if patient_id is not None:
+            query = query.where(SessionAngleTrace.patient_id == patient_id)
+        if session_ids is not None:
+            query = query.where(SessionAngleTrace.session_id.in_(session_ids))
+
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        pool = _pool()
+        tasks = []
+
+        # chunks go to the pool while the next ones are still streaming
+        result = await db.stream(query)
+        async for chunk in result.partitions(RESCORE_CHUNK):
+            tasks.append(loop.run_in_executor(
+                pool, _rescore_chunk, current, candidate, [tuple(r) for r in chunk]
+            ))
+
+        rows = [r for part in await asyncio.gather(*tasks) for r in part]
+        elapsed = time.perf_counter() - started
+
+        report = {
+            "exercise_id": exercise_id,
+            "currentRules": current,
+            "candidateRules": candidate,
+            "summary": {
+                **RescoringService.summarize(rows),
+                "elapsedSec": round(elapsed, 2),
+                "sessionsPerMin": round(len(rows) / elapsed * 60) if elapsed else None,
+            },
+        }
+        if include_sessions:
+            report["sessions"] = rows
+        return report
+
+
+if __name__ == "__main__":
+    # python -m services.rescoring_service <exercise_id> '<repDefinition JSON>'
+    import json
+    import sys
+    from database.connection import AsyncSessionLocal
+
+    async def _main():
+        async with AsyncSessionLocal() as db:
+            report = await RescoringService.rescore(
+                int(sys.argv[1]), json.loads(sys.argv[2]) if len(sys.argv) > 2 else {}, db
+            )
+        print(json.dumps(report, indent=2))
+
+    asyncio.run(_main())
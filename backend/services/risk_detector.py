@@ -1,16 +1,200 @@
+# services/risk_detector.py
+#
+# Configurable risk rules evaluated over a short sliding window of frames.
+# Rules are compiled once into index / weight arrays; each frame is one
+# batched NumPy pass over every rule, whatever the count.
+#
+# rule (preset "riskRules" {key: rule}):
+#   {"type": "angle",        "angle": name | "angles": [names] (mean) | "points": [a, b, c]}
+#   {"type": "asymmetry",    "angles": [left, right]}               |left - right|
+#   {"type": "velocity",     "angle" | "angles"}                    max |deg/s|
+#   {"type": "acceleration", "angle" | "angles"}                    max |deg/s²|
+#   (Savitzky–Golay derivatives, pose/kinematics.py)
+#   {"type": "height_diff" | "x_diff", "landmarks": [a, b]}         normalized coords
+#   plus "min" / "max", "duration" (seconds the rule must hold before it
+#   alerts), "smooth" (EMA alpha on the angles, angle / asymmetry only)
+#   and "message".
+#
+# A preset without "riskRules" gets none. Angles are 2D projections, so
+# limits near 180° (e.g. knee "hyperextension") are not measurable; trunk
+# lean is the hip angle below 180: {"points": [shoulder, hip, knee], "min": 140}
+# alerts at more than 40° of forward bend.
+
+import numpy as np
+
+from pose.kinematics import KinematicsFilter
+from utils.capture_codec import ANGLE_DEFS, triangle_angles
+
+OP_ANGLE, OP_ASYMMETRY, OP_VELOCITY, OP_ACCELERATION, OP_HEIGHT_DIFF, OP_X_DIFF = range(6)
+_OPS = {
+    "angle": OP_ANGLE,
+    "asymmetry": OP_ASYMMETRY,
+    "velocity": OP_VELOCITY,
+    "acceleration": OP_ACCELERATION,
+    "height_diff": OP_HEIGHT_DIFF,
+    "x_diff": OP_X_DIFF,
+}
+
+
+class RiskWindow:
+    """Per-session recent frames (kinematics ring buffer) plus rule timers."""
+
+    __slots__ = ("kinematics", "smoothed", "since")
+
+    def __init__(self, detector: "RiskDetector"):
+        self.kinematics = KinematicsFilter(len(detector.angles))
+        self.smoothed = np.full(len(detector.angles), np.nan)
+        self.since = np.full(len(detector), np.nan)
+
+
 class RiskDetector:
 
+    def __init__(self, rules: dict, angle_definitions: dict = None):
+        landmarks, angles = {}, {}
+
+        def landmark(name):
+            return landmarks.setdefault(name, len(landmarks))
+
+        def angle(name, points=None):
+            if name not in angles:
+                points = points or (angle_definitions or {}).get(name) or ANGLE_DEFS.get(name)
+                angles[name] = [landmark(p) for p in points] if points else None
+            return list(angles).index(name)
+
+        for name, points in (angle_definitions or {}).items():
+            angle(name, points)
+
+        keys, messages, ops, cols, pairs, lo, hi, duration, alpha = ([] for _ in range(9))
+        for key, rule in rules.items():
+            op = _OPS.get(rule.get("type"))
+            if op is None:
+                continue
+
+            if op in (OP_HEIGHT_DIFF, OP_X_DIFF):
+                a, b = (rule.get("landmarks") or [None, None])[:2]
+                if not a or not b:
+                    continue
+                c, pair = [], (landmark(a), landmark(b))
+            else:
+                if rule.get("points"):
+                    names = ["__" + "/".join(rule["points"])]
+                    angle(names[0], rule["points"])
+                else:
+                    names = [n for n in rule.get("angles") or [rule.get("angle")] if n]
+                c, pair = [angle(n) for n in names], (0, 0)
+                if not c or (op == OP_ASYMMETRY and len(c) != 2):
+                    continue
+
+            keys.append(key)
+            messages.append(rule.get("message") or key)
+            ops.append(op)
+            cols.append(c)
+            pairs.append(pair)
+            lo.append(float(rule.get("min", -np.inf)))
+            hi.append(float(rule.get("max", np.inf)))
+            duration.append(float(rule.get("duration", 0.0)))
+            alpha.append(float(rule.get("smooth", 1.0)))
+
+        self.landmarks = list(landmarks)
+        self.angles = list(angles)
+        # angles computed from landmarks (others only come in by name)
+        computed = [i for i, p in enumerate(angles.values()) if p]
+        self.computed = np.array(computed, dtype=np.intp)
+        self.angle_idx = np.array(
+            [p for p in angles.values() if p], dtype=np.intp
+        ).reshape(-1, 3)
+
+        self.keys = keys
+        self.messages = messages
+        self.op = np.array(ops, dtype=np.int8)
+        self.pair_a = np.array([p[0] for p in pairs], dtype=np.intp)
+        self.pair_b = np.array([p[1] for p in pairs], dtype=np.intp)
+        self.lo = np.array(lo)
+        self.hi = np.array(hi)
+        self.duration = np.array(duration)
+
+        # per-angle EMA alpha: the strongest smoothing any rule asks for
+        self.alpha = np.ones(len(angles))
+        r = len(keys)
+        self.smooth = np.array([a < 1.0 for a in alpha], dtype=bool)
+        # (rules, angles) operand matrices
+        self.w = np.zeros((r, len(angles)))          # angle: mean, asymmetry: +1 / -1
+        self.mask = np.zeros((r, len(angles)), bool)  # velocity / acceleration: max
+        for i, (op, c) in enumerate(zip(ops, cols)):
+            if op == OP_ANGLE:
+                self.w[i, c] = 1.0 / len(c)
+            elif op == OP_ASYMMETRY:
+                self.w[i, c] = (1.0, -1.0)
+            elif op in (OP_VELOCITY, OP_ACCELERATION):
+                self.mask[i, c] = True
+            if alpha[i] < 1.0:
+                self.alpha[c] = np.minimum(self.alpha[c], alpha[i])
+        self.uses = self.w != 0
+
     @staticmethod
-    def detect(joint_angles, velocity):
-        alerts = []
+    def from_preset(preset: dict) -> "RiskDetector":
+        # no "riskRules" → no risk alerts; there are no implicit defaults
+        return RiskDetector(preset.get("riskRules") or {}, preset.get("angleDefinitions"))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def new_window(self) -> RiskWindow:
+        return RiskWindow(self)
+
+    # -------------------------------------------
+    # ONE FRAME
+    # joints: landmark dict {name: {x, y, ...}} and / or
+    # angles: {name: degrees} already measured (override computed ones)
+    # Returns {rule key: message} for rules currently alerting.
+    # -------------------------------------------
+    def detect(self, window: RiskWindow, t: float, joints: dict = None, angles: dict = None):
+        if not len(self):
+            return {}
+
+        joints = joints or {}
+        pts = np.array([
+            (j["x"], j["y"]) if j else (np.nan, np.nan)
+            for j in (joints.get(name) for name in self.landmarks)
+        ], dtype=np.float64).reshape(-1, 2)
+
+        raw = np.full(len(self.angles), np.nan)
+        if len(self.computed):
+            raw[self.computed] = triangle_angles(pts, self.angle_idx)
+        for name, value in (angles or {}).items():
+            if name in self.angles and value is not None:
+                raw[self.angles.index(name)] = float(value)
+
+        prev = window.smoothed
+        smoothed = np.where(np.isnan(prev), raw, self.alpha * raw + (1 - self.alpha) * prev)
+        window.smoothed = smoothed = np.where(np.isnan(raw), prev, smoothed)
+
+        # ---- derivatives (every angle at once) ----
+        _, vel, acc = window.kinematics.update(t, raw)
+
+        # ---- rule values ----
+        value = np.full(len(self), np.nan)
+
+        base = np.where(self.smooth[:, None], smoothed[None, :], raw[None, :])
+        missing = np.isnan(base)
+        combined = (self.w * np.where(missing, 0.0, base)).sum(axis=1)
+        combined[(self.uses & missing).any(axis=1)] = np.nan
+        value = np.where(self.op == OP_ANGLE, combined, value)
+        value = np.where(self.op == OP_ASYMMETRY, np.abs(combined), value)
 
-        if joint_angles["knee"] > 175:
-            alerts.append("Knee hyperextension risk")
+        for op, d in ((OP_VELOCITY, vel), (OP_ACCELERATION, acc)):
+            rows = self.op == op
+            if rows.any():
+                mag = np.where(self.mask[rows] & ~np.isnan(d), np.abs(d), -np.inf).max(axis=1)
+                value[rows] = np.where(np.isinf(mag), np.nan, mag)
 
-        if joint_angles["spine"] > 40:
-            alerts.append("Excessive spine bending")
+        diff = pts[self.pair_a] - pts[self.pair_b] if len(pts) else np.full((len(self), 2), np.nan)
+        value = np.where(self.op == OP_HEIGHT_DIFF, np.abs(diff[:, 1]), value)
+        value = np.where(self.op == OP_X_DIFF, np.abs(diff[:, 0]), value)
 
-        if velocity > 2.5:
-            alerts.append("Jerky movement detected")
+        # ---- sustained duration ----
+        violated = (value < self.lo) | (value > self.hi)
+        window.since = np.where(violated, np.where(np.isnan(window.since), t, window.since), np.nan)
+        alerting = violated & (t - window.since >= self.duration)
 
-        return alerts
+        return {self.keys[i]: self.messages[i] for i in np.flatnonzero(alerting)}
@@ -0,0 +1,36 @@
+# services/role_cache.py
+
+from typing import Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database.models import Role
+
+
+class RoleCache:
+    """
+    In-process id <-> name map for the static `roles` table.
+    Loaded with a single query on first use.
+    """
+    NAMES: Dict[int, str] = {}
+    IDS: Dict[str, int] = {}
+
+    @staticmethod
+    async def _load(db: AsyncSession):
+        q = await db.execute(select(Role.id, Role.name))
+        for role_id, name in q.all():
+            RoleCache.NAMES[role_id] = name
+            RoleCache.IDS[name] = role_id
+
+    @staticmethod
+    async def name_of(role_id: int, db: AsyncSession) -> Optional[str]:
+        if role_id not in RoleCache.NAMES:
+            await RoleCache._load(db)
+        return RoleCache.NAMES.get(role_id)
+
+    @staticmethod
+    async def id_of(name: str, db: AsyncSession) -> Optional[int]:
+        if name not in RoleCache.IDS:
+            await RoleCache._load(db)
+        return RoleCache.IDS.get(name)
@@ -0,0 +1,170 @@
+# services/session_alert_service.py
+
+import re
+import time
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database.models import ExerciseSession, SessionAlert
+
+# known alert types (pose_tracking_physician.evaluate_frame)
+ALERTS = {
+    "hyperextension": {"joint": "shoulder", "message": "Shoulder hyperextension risk"},
+    "spine": {"joint": "spine", "message": "Excessive spine bending"},
+}
+_TYPE_BY_MESSAGE = {a["message"]: t for t, a in ALERTS.items()}
+
+
+def _alert_type(message: str) -> str:
+    if message in _TYPE_BY_MESSAGE:
+        return _TYPE_BY_MESSAGE[message]
+    return re.sub(r"[^a-z0-9]+", "_", message.lower()).strip("_")[:50] or "unknown"
+
+
+def _joint(alert_type: str) -> Optional[str]:
+    return ALERTS.get(alert_type, {}).get("joint")
+
+
+class SessionAlertService:
+
+    # -------------------------------------------
+    # LIVE TRACKING (per frame)
+    # alerts: {alert_type: message} active in this frame
+    # Keeps state["alertLog"] = {type: {message, first, last, duration, count, active}}
+    # -------------------------------------------
+    @staticmethod
+    def track(state: Dict[str, Any], alerts: Dict[str, str], dt: float, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        log = state.setdefault("alertLog", {})
+
+        for alert_type, entry in log.items():
+            if alert_type not in alerts:
+                entry["active"] = False
+
+        for alert_type, message in alerts.items():
+            entry = log.get(alert_type)
+            if entry is None:
+                entry = log[alert_type] = {
+                    "message": message, "first": now, "last": now,
+                    "duration": 0.0, "count": 0, "active": False,
+                }
+            if not entry["active"]:
+                entry["count"] += 1          # new episode
+            else:
+                entry["duration"] += dt
+            entry["active"] = True
+            entry["last"] = now
+
+    # -------------------------------------------
+    # ROWS FOR ONE SESSION
+    # Falls back to list-shaped error_summary (no timing) when the
+    # session was not tracked live.
+    # -------------------------------------------
+    @staticmethod
+    def rows_for(session: ExerciseSession, alert_log: Optional[Dict[str, Any]] = None) -> List[dict]:
+        base = {
+            "session_id": session.id,
+            "patient_id": session.patient_id,
+            "physician_id": session.physician_id,
+            "exercise_id": session.exercise_id,
+            "created_at": session.created_at or datetime.utcnow(),
+        }
+
+        if alert_log:
+            return [
+                {
+                    **base,
+                    "alert_type": alert_type,
+                    "joint": _joint(alert_type),
+                    "message": entry["message"],
+                    "first_at": datetime.utcfromtimestamp(entry["first"]),
+                    "last_at": datetime.utcfromtimestamp(entry["last"]),
+                    "duration_sec": round(entry["duration"], 3),
+                    "count": entry["count"],
+                }
+                for alert_type, entry in alert_log.items()
+            ]
+
+        summary = session.error_summary
+        if not isinstance(summary, list):
+            return []
+
+        rows = {}
+        for message in summary:
+            alert_type = _alert_type(str(message))
+            row = rows.setdefault(alert_type, {
+                **base,
+                "alert_type": alert_type,
+                "joint": _joint(alert_type),
+                "message": str(message)[:255],
+                "first_at": base["created_at"],
+                "last_at": base["created_at"],
+                "duration_sec": 0.0,
+                "count": 0,
+            })
+            row["count"] += 1
+        return list(rows.values())
+
+    # -------------------------------------------
+    # WRITE (caller's transaction, session must be flushed)
+    # one multi-row INSERT per session
+    # -------------------------------------------
+    @staticmethod
+    async def replace(db: AsyncSession, session: ExerciseSession, alert_log: Optional[Dict[str, Any]] = None):
+        await db.execute(delete(SessionAlert).where(SessionAlert.session_id == session.id))
+        rows = SessionAlertService.rows_for(session, alert_log)
+        if rows:
+            await db.execute(insert(SessionAlert), rows)
+
+    # -------------------------------------------
+    # QUERIES
+    # -------------------------------------------
+    @staticmethod
+    def window(date_from: Optional[date] = None, date_to: Optional[date] = None) -> list:
+        criteria = []
+        if date_from is not None:
+            criteria.append(SessionAlert.first_at >= datetime.combine(date_from, dtime.min))
+        if date_to is not None:
+            criteria.append(SessionAlert.first_at < datetime.combine(date_to + timedelta(days=1), dtime.min))
+        return criteria
+
+    # {message: number of sessions with that alert}
+    @staticmethod
+    async def summary(db: AsyncSession, *criteria) -> Dict[str, int]:
+        q = await db.execute(
+            select(SessionAlert.message, func.count(SessionAlert.id))
+            .where(*criteria)
+            .group_by(SessionAlert.message)
+        )
+        return {message: int(n) for message, n in q.all()}
+
+
+# python -m services.session_alert_service   → backfill sessions without alert rows
+# (from list-shaped error_summary; live-tracked rows are kept)
+if __name__ == "__main__":
+    import asyncio
+    from database.connection import AsyncSessionLocal
+
+    async def _backfill():
+        async with AsyncSessionLocal() as db, AsyncSessionLocal() as writer:
+            rows = []
+            q = await db.stream_scalars(
+                select(ExerciseSession)
+                .where(~select(SessionAlert.id).where(SessionAlert.session_id == ExerciseSession.id).exists())
+                .execution_options(yield_per=500)
+            )
+            async for session in q:
+                rows += SessionAlertService.rows_for(session)
+                if len(rows) >= 1000:
+                    await writer.execute(insert(SessionAlert), rows)
+                    await writer.commit()
+                    rows = []
+            if rows:
+                await writer.execute(insert(SessionAlert), rows)
+            await writer.commit()
+
+    asyncio.run(_backfill())
@@ -0,0 +1,92 @@
+# services/session_error_service.py
+
+from typing import List
+
+from sqlalchemy import delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database.models import ExerciseSession, SessionError
+
+
+class SessionErrorService:
+
+    # -------------------------------------------
+    # ROWS FOR ONE SESSION
+    # error_summary dict: {errorKey: count} or {errorKey: {"count", "joint"}}
+    # (list-shaped summaries are alerts, not errors)
+    # -------------------------------------------
+    @staticmethod
+    def rows_for(session: ExerciseSession) -> List[SessionError]:
+        summary = session.error_summary
+        if not isinstance(summary, dict):
+            return []
+
+        rows = []
+        for key, value in summary.items():
+            joint = None
+            if isinstance(value, dict):
+                joint = value.get("joint")
+                value = value.get("count", 0)
+            if not isinstance(value, (int, float)) or not value:
+                continue
+
+            rows.append(SessionError(
+                session_id=session.id,
+                patient_id=session.patient_id,
+                physician_id=session.physician_id,
+                exercise_id=session.exercise_id,
+                error_key=str(key)[:100],
+                joint=joint,
+                count=int(value),
+                created_at=session.created_at,
+            ))
+        return rows
+
+    # -------------------------------------------
+    # WRITE (caller's transaction, session must be flushed)
+    # -------------------------------------------
+    @staticmethod
+    async def replace(db: AsyncSession, session: ExerciseSession):
+        await db.execute(delete(SessionError).where(SessionError.session_id == session.id))
+        db.add_all(SessionErrorService.rows_for(session))
+
+    # -------------------------------------------
+    # AGGREGATES (GROUP BY error_key in SQL)
+    # -------------------------------------------
+    @staticmethod
+    async def frequency(db: AsyncSession, *criteria, limit: int = None):
+        total = func.sum(SessionError.count).label("total")
+        query = (
+            select(SessionError.error_key, total)
+            .where(*criteria)
+            .group_by(SessionError.error_key)
+            .order_by(total.desc())
+        )
+        if limit:
+            query = query.limit(limit)
+
+        q = await db.execute(query)
+        return [(key, int(count)) for key, count in q.all()]
+
+
+# python -m services.session_error_service   → backfill from error_summary
+if __name__ == "__main__":
+    import asyncio
+    from database.connection import AsyncSessionLocal
+
+    async def _backfill():
+        async with AsyncSessionLocal() as db, AsyncSessionLocal() as writer:
+            await writer.execute(delete(SessionError))
+            await writer.commit()
+
+            q = await db.stream_scalars(
+                select(ExerciseSession).execution_options(yield_per=500)
+            )
+            async for session in q:
+                writer.add_all(SessionErrorService.rows_for(session))
+                if len(writer.new) >= 1000:
+                    await writer.commit()
+            await writer.commit()
+
+    asyncio.run(_backfill())
@@ -3,6 +3,7 @@ from sqlalchemy.future import select
 from fastapi import HTTPException
 
 from database.models import SubscriptionRequest, Patient
+from services.physician_analytics_service import PhysicianAnalyticsService
 
 
 class SubscriptionRequestService:
@@ -87,6 +88,9 @@ class SubscriptionRequestService:
         if not patient:
             raise HTTPException(404, "Patient not found")
 
+        # patient list changes for both the old and the new physician
+        await PhysicianAnalyticsService.invalidate(db, patient.physician_id, physician_id)
+
         patient.physician_id = physician_id
         req.status = "ACCEPTED"
 
@@ -3,6 +3,7 @@ from sqlalchemy.future import select
 from fastapi import HTTPException
 
 from database.models import Patient, Physician
+from services.physician_analytics_service import PhysicianAnalyticsService
 
 
 class SubscriptionService:
@@ -32,6 +33,7 @@ class SubscriptionService:
             raise HTTPException(404, "Patient not found")
 
         # Assign physician
+        await PhysicianAnalyticsService.invalidate(db, patient.physician_id, physician_id)
         patient.physician_id = physician_id
         await db.commit()
 
@@ -0,0 +1,58 @@
+import numpy as np
+
+from pose.rule_plan import evaluate_plan
+from services.rep_counter import RepMachine
+
+TABLE = {
+    "angles": ["left_shoulder"],
+    "zones": {
+        "top": {"mean": [90, 180], "left_hip": [160, 180]},
+        "bottom": {"mean": [0, 40]},
+    },
+    "states": ["REST", "TOP"],
+    "transitions": [
+        {"from": "REST", "when": "top", "to": "TOP", "count": True},
+        {"from": "TOP", "when": "bottom", "to": "REST"},
+    ],
+}
+
+
+def _raise(seconds=20, period=4, fps=30):
+    t = np.arange(0, seconds, 1 / fps)
+    return t, 30 + 80 * (1 - np.cos(2 * np.pi * t / period)) / 2
+
+
+def test_table_zones_can_condition_on_other_joints():
+    t, shoulder = _raise()
+    for hip, expected in ((170.0, 5), (120.0, 0)):
+        machine = RepMachine(TABLE)
+        st = machine.new_state()
+        for ti, a in zip(t, shoulder):
+            machine.step(st, ti, {"left_shoulder": a, "left_hip": hip, "left_knee": 175.0})
+        assert st.count == expected
+
+
+def test_phase_bounds_are_strict():
+    machine = RepMachine.from_definition({"joint": "a", "validRange": [40, 100]})
+    st = machine.new_state()
+    for v in (40, 100, 40, 100):
+        machine.step(st, 0.0, {"a": v})
+    assert st.count == 0
+    for v in (39.9, 100.1):
+        machine.step(st, 0.0, {"a": v})
+    assert st.count == 1
+
+
+def test_evaluate_plan_counts_smooth_reps():
+    # elbow at the side of the shoulder, swinging up and down (ShoulderRaise)
+    t, shoulder = _raise()
+    state = {}
+    for a in np.radians(shoulder):
+        joints = {}
+        for side, sx in (("left", 0.45), ("right", 0.55)):
+            d = -1 if side == "left" else 1
+            joints[f"{side}_shoulder"] = {"x": sx, "y": 0.3}
+            joints[f"{side}_hip"] = {"x": sx, "y": 0.55}
+            joints[f"{side}_elbow"] = {"x": sx + d * 0.12 * np.sin(a), "y": 0.3 + 0.12 * np.cos(a)}
+        evaluate_plan({"exerciseName": "ShoulderRaise"}, joints, state, 1 / 30)
+    assert state["repCount"] == 5
@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+
+from pose.rule_plan import PRESETS
+from services.risk_detector import RiskDetector
+
+# upright, arms at the sides (normalized image coords, y down)
+STANDING = {
+    "left_shoulder": (0.45, 0.30), "right_shoulder": (0.55, 0.30),
+    "left_elbow": (0.44, 0.42), "right_elbow": (0.56, 0.42),
+    "left_wrist": (0.44, 0.52), "right_wrist": (0.56, 0.52),
+    "left_hip": (0.47, 0.55), "right_hip": (0.53, 0.55),
+    "left_knee": (0.47, 0.75), "right_knee": (0.53, 0.75),
+    "left_ankle": (0.47, 0.95), "right_ankle": (0.53, 0.95),
+}
+
+
+def _frames(pose, seconds=3.0, fps=30):
+    rng = np.random.default_rng(0)
+    for i in range(int(seconds * fps)):
+        yield i / fps, {
+            name: {"x": x + rng.normal(0, 0.002), "y": y + rng.normal(0, 0.002)}
+            for name, (x, y) in pose.items()
+        }
+
+
+def _alerts(detector, pose):
+    window = detector.new_window()
+    seen = set()
+    for t, joints in _frames(pose):
+        seen.update(detector.detect(window, t, joints=joints))
+    return seen
+
+
+def test_no_risk_rules_means_no_alerts():
+    detector = RiskDetector.from_preset({})
+    assert len(detector) == 0
+    assert _alerts(detector, STANDING) == set()
+
+
+def test_neutral_pose_is_quiet_under_shoulder_raise_rules():
+    detector = RiskDetector.from_preset(PRESETS["ShoulderRaise"])
+    assert _alerts(detector, STANDING) == set()
+
+
+def test_forward_bend_triggers_spine_rule():
+    bent = dict(STANDING)
+    # shoulders pushed well forward of the hips (~60° trunk lean)
+    bent["left_shoulder"] = (0.47 + 0.22, 0.55 - 0.13)
+    bent["right_shoulder"] = (0.53 + 0.22, 0.55 - 0.13)
+    detector = RiskDetector.from_preset(PRESETS["ShoulderRaise"])
+    assert "spine" in _alerts(detector, bent)
+
+
+def test_detect_stays_under_a_millisecond_per_frame():
+    # the per-frame budget of the vectorized detector; median, so a
+    # noisy CI neighbour does not fail it
+    detector = RiskDetector.from_preset(PRESETS["ShoulderRaise"])
+    window = detector.new_window()
+    frames = list(_frames(STANDING, seconds=10.0))
+    for t, joints in frames[:60]:           # warm up, fill the window
+        detector.detect(window, t, joints=joints)
+
+    costs = []
+    for t, joints in frames[60:]:
+        started = time.perf_counter()
+        detector.detect(window, t, joints=joints)
+        costs.append(time.perf_counter() - started)
+    assert np.median(costs) < 1e-3
@@ -0,0 +1,95 @@
+import asyncio
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database.schema_upgrades import COLUMNS, INDEXES, ensure_schema_upgrades
+
+# tables as they were created before the upgraded columns / indexes
+OLD_TABLES = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, full_name VARCHAR(150))",
+    "CREATE TABLE patients (user_id INTEGER PRIMARY KEY, physician_id INTEGER)",
+    "CREATE TABLE audit_logs (id INTEGER PRIMARY KEY, action VARCHAR(100), "
+    "target_type VARCHAR(50), created_at DATETIME)",
+    "CREATE TABLE exercise_sessions (id INTEGER PRIMARY KEY, created_at DATETIME)",
+    "CREATE TABLE pose_templates (id INTEGER PRIMARY KEY, exercise_id INTEGER, "
+    "pose_type VARCHAR(20))",
+]
+
+
+def _schema(sync_conn):
+    insp = inspect(sync_conn)
+    return {
+        t: (
+            {c["name"] for c in insp.get_columns(t)},
+            {i["name"] for i in insp.get_indexes(t)},
+        )
+        for t in insp.get_table_names()
+    }
+
+
+async def _upgrade(path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        for ddl in OLD_TABLES:
+            await conn.execute(text(ddl))
+    for _ in range(2):      # second run must be a no-op
+        async with engine.begin() as conn:
+            await ensure_schema_upgrades(conn)
+    async with engine.connect() as conn:
+        schema = await conn.run_sync(_schema)
+    await engine.dispose()
+    return schema
+
+
+def test_upgrades_existing_tables_idempotently(tmp_path):
+    schema = asyncio.run(_upgrade(tmp_path / "old.db"))
+    for table, column, _, _ in COLUMNS:
+        if table in schema:
+            assert column in schema[table][0]
+    for table, name, _, _ in INDEXES:
+        if table in schema:
+            assert name in schema[table][1]
+
+
+def test_backfills_session_updated_at(tmp_path):
+    path = tmp_path / "old.db"
+
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        async with engine.begin() as conn:
+            await conn.execute(text(OLD_TABLES[3]))
+            await conn.execute(text(
+                "INSERT INTO exercise_sessions (id, created_at) VALUES (1, '2024-01-02 03:04:05')"
+            ))
+            await ensure_schema_upgrades(conn)
+            row = (await conn.execute(text(
+                "SELECT created_at, updated_at FROM exercise_sessions"
+            ))).one()
+        await engine.dispose()
+        return row
+
+    created_at, updated_at = asyncio.run(run())
+    assert updated_at == created_at
+
+
+def test_backfills_template_versions(tmp_path):
+    path = tmp_path / "old.db"
+
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        async with engine.begin() as conn:
+            await conn.execute(text(OLD_TABLES[4]))
+            # a duplicate left by the old delete-then-insert save
+            await conn.execute(text(
+                "INSERT INTO pose_templates (id, exercise_id, pose_type) VALUES "
+                "(1, 7, 'initial'), (2, 7, 'max'), (3, 7, 'initial')"
+            ))
+            await ensure_schema_upgrades(conn)
+            rows = (await conn.execute(text(
+                "SELECT id, version, is_current FROM pose_templates ORDER BY id"
+            ))).all()
+        await engine.dispose()
+        return [tuple(r) for r in rows]
+
+    assert asyncio.run(run()) == [(1, 1, 0), (2, 1, 1), (3, 2, 1)]
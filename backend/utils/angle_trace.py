@@ -0,0 +1,194 @@
+# utils/angle_trace.py
+#
+# Compact per-frame angle traces.
+#
+# Frames are cut into blocks of BLOCK_FRAMES. Each block is stored as
+#   int32  timestamp deltas (ms, first one relative to the session start)
+#   uint16 deltas of the float16 bit patterns, one array per joint
+# and zlib-compressed on its own. Smooth angle signals give tiny deltas
+# that compress well, decoding is an exact cumsum (no drift), and a
+# time window only needs the blocks that overlap it.
+#
+# The index (JSON) lists joints and per-block byte offset / time range.
+
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BLOCK_FRAMES = 512
+
+
+def _encode_block(ts_ms: np.ndarray, values: np.ndarray, t_prev: int) -> bytes:
+    ts_delta = np.diff(ts_ms, prepend=t_prev).astype("<i4")
+
+    bits = values.astype("<f2").view("<u2")                    # (frames, joints)
+    bit_delta = np.diff(bits, axis=0, prepend=np.zeros((1, bits.shape[1]), "<u2"))
+
+    # joint-major so each joint's deltas sit next to each other
+    return zlib.compress(ts_delta.tobytes() + np.ascontiguousarray(bit_delta.T).tobytes(), 6)
+
+
+def _decode_block(blob: bytes, n: int, joints: int, t_prev: int) -> Tuple[np.ndarray, np.ndarray]:
+    raw = zlib.decompress(blob)
+    ts = t_prev + np.cumsum(np.frombuffer(raw, "<i4", count=n), dtype=np.int64)
+
+    bit_delta = np.frombuffer(raw, "<u2", offset=4 * n).reshape(joints, n)
+    # uint16 addition wraps, which undoes the wrapped diff exactly
+    bits = np.cumsum(bit_delta, axis=1, dtype="<u2")
+    return ts, bits.view("<f2").astype(np.float32).T           # (frames, joints)
+
+
+def encode_trace(
+    timestamps_ms: Sequence[int],
+    joints: Sequence[str],
+    values: np.ndarray,
+    block_frames: int = BLOCK_FRAMES
+) -> Tuple[bytes, dict]:
+    """
+    timestamps_ms: (frames,) ms since session start, non-decreasing
+    values:        (frames, len(joints)) angles in degrees, NaN = missing
+    """
+    ts = np.asarray(timestamps_ms, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float32).reshape(len(ts), len(joints))
+
+    chunks: List[bytes] = []
+    blocks = []
+    offset = 0
+    t_prev = 0
+    for start in range(0, len(ts), block_frames):
+        end = min(start + block_frames, len(ts))
+        chunk = _encode_block(ts[start:end], values[start:end], t_prev)
+
+        blocks.append({
+            "offset": offset,
+            "length": len(chunk),
+            "frames": end - start,
+            "t0": int(ts[start]),
+            "t1": int(ts[end - 1]),
+            "t_prev": t_prev,
+        })
+        chunks.append(chunk)
+        offset += len(chunk)
+        t_prev = int(ts[end - 1])
+
+    index = {
+        "version": 1,
+        "joints": list(joints),
+        "frames": int(len(ts)),
+        "blocks": blocks,
+    }
+    return b"".join(chunks), index
+
+
+def decode_trace(
+    blob: bytes,
+    index: dict,
+    t_from: Optional[int] = None,
+    t_to: Optional[int] = None,
+    joints: Optional[Sequence[str]] = None
+) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """Decodes only the blocks overlapping [t_from, t_to] (ms)."""
+    all_joints = index["joints"]
+    names = [j for j in (joints or all_joints) if j in all_joints]
+    cols = [all_joints.index(j) for j in names]
+
+    ts_parts, val_parts = [], []
+    for b in index["blocks"]:
+        if t_from is not None and b["t1"] < t_from:
+            continue
+        if t_to is not None and b["t0"] > t_to:
+            break
+
+        ts, values = _decode_block(
+            blob[b["offset"]:b["offset"] + b["length"]],
+            b["frames"], len(all_joints), b["t_prev"]
+        )
+        ts_parts.append(ts)
+        val_parts.append(values[:, cols])
+
+    if not ts_parts:
+        return np.empty(0, np.int64), names, np.empty((0, len(names)), np.float32)
+
+    ts = np.concatenate(ts_parts)
+    values = np.concatenate(val_parts)
+
+    mask = np.ones(len(ts), bool)
+    if t_from is not None:
+        mask &= ts >= t_from
+    if t_to is not None:
+        mask &= ts <= t_to
+    return ts[mask], names, values[mask]
+
+
+def decimate(ts: np.ndarray, values: np.ndarray, max_points: int):
+    """
+    Min/max decimation for charts: each bucket keeps its lowest and
+    highest sample (per trace, in time order), so peaks survive.
+    """
+    n = len(ts)
+    if n <= max_points or max_points < 2:
+        return ts, values
+
+    buckets = max_points // 2
+    edges = np.linspace(0, n, buckets + 1, dtype=np.int64)
+
+    if values.shape[1] == 0:
+        keep = edges[:-1]
+        return ts[keep], values[keep]
+
+    # extremes of the first requested joint decide what is kept
+    primary = values[:, 0]
+    keep = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        seg = primary[lo:hi]
+        if np.isnan(seg).all():
+            keep.append(lo)
+            continue
+        a, b = lo + int(np.nanargmin(seg)), lo + int(np.nanargmax(seg))
+        keep.extend(sorted({a, b}))
+
+    keep = np.asarray(keep, dtype=np.int64)
+    return ts[keep], values[keep]
+
+
+class AngleTraceRecorder:
+    """Collects frames in memory during a live session."""
+
+    __slots__ = ("joints", "_ts", "_rows", "_t0")
+
+    def __init__(self):
+        self.joints: List[str] = []
+        self._ts: List[int] = []
+        self._rows: List[List[float]] = []
+        self._t0: Optional[float] = None
+
+    def __len__(self):
+        return len(self._ts)
+
+    def add(self, t: float, angles: Dict[str, float]):
+        """t in seconds (any epoch), angles {joint: degrees}."""
+        if self._t0 is None:
+            self._t0 = t
+
+        for joint in angles:
+            if joint not in self.joints:
+                self.joints.append(joint)
+                for row in self._rows:
+                    row.append(float("nan"))
+
+        row = [float("nan")] * len(self.joints)
+        for joint, angle in angles.items():
+            try:
+                row[self.joints.index(joint)] = float(angle)
+            except (TypeError, ValueError):
+                pass
+
+        self._ts.append(max(int(round((t - self._t0) * 1000)), self._ts[-1] if self._ts else 0))
+        self._rows.append(row)
+
+    def encode(self) -> Tuple[bytes, dict]:
+        return encode_trace(
+            self._ts, self.joints,
+            np.asarray(self._rows, dtype=np.float32).reshape(len(self._ts), len(self.joints))
+        )
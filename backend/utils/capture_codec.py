@@ -0,0 +1,131 @@
+# utils/capture_codec.py
+#
+# Binary rep-capture upload (alternative to the JSON RepCaptureRequest).
+#
+#   header  16 bytes, little-endian  "<4sBBHIHH"
+#           magic b"PCAP", version 1, flags 0, reserved,
+#           frames N, landmarks L (33), channels C (4: x, y, z, visibility)
+#   body    float64[N]        timestamps (seconds)
+#           float32[N, L, C]  MediaPipe pose landmarks
+#
+# decode_capture() returns NumPy views over the request bytes (no copy)
+# and landmark_angles() computes every joint angle for every frame at once.
+
+import os
+import struct
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+MAGIC = b"PCAP"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHIHH")
+MAX_CAPTURE_FRAMES = int(os.getenv("MAX_CAPTURE_FRAMES", 3600))
+
+# MediaPipe PoseLandmark order
+LANDMARKS = [
+    "nose", "left_eye_inner", "left_eye", "left_eye_outer",
+    "right_eye_inner", "right_eye", "right_eye_outer",
+    "left_ear", "right_ear", "mouth_left", "mouth_right",
+    "left_shoulder", "right_shoulder", "left_elbow", "right_elbow",
+    "left_wrist", "right_wrist", "left_pinky", "right_pinky",
+    "left_index", "right_index", "left_thumb", "right_thumb",
+    "left_hip", "right_hip", "left_knee", "right_knee",
+    "left_ankle", "right_ankle", "left_heel", "right_heel",
+    "left_foot_index", "right_foot_index",
+]
+_LM = {name: i for i, name in enumerate(LANDMARKS)}
+
+# largest body worth reading: MAX_CAPTURE_FRAMES frames of x, y, z, visibility
+MAX_CAPTURE_BYTES = int(os.getenv(
+    "MAX_CAPTURE_BYTES", HEADER.size + MAX_CAPTURE_FRAMES * (8 + 4 * len(LANDMARKS) * 4)
+))
+
+# joint → (a, vertex, c), same definitions as the physician capture
+ANGLE_DEFS = {
+    "left_shoulder": ("left_elbow", "left_shoulder", "left_hip"),
+    "right_shoulder": ("right_elbow", "right_shoulder", "right_hip"),
+    "left_elbow": ("left_shoulder", "left_elbow", "left_wrist"),
+    "right_elbow": ("right_shoulder", "right_elbow", "right_wrist"),
+    "left_hip": ("left_shoulder", "left_hip", "left_knee"),
+    "right_hip": ("right_shoulder", "right_hip", "right_knee"),
+    "left_knee": ("left_hip", "left_knee", "left_ankle"),
+    "right_knee": ("right_hip", "right_knee", "right_ankle"),
+}
+
+
+class CaptureFormatError(ValueError):
+    pass
+
+
+def encode_capture(timestamps, landmarks) -> bytes:
+    ts = np.ascontiguousarray(timestamps, dtype="<f8")
+    lm = np.ascontiguousarray(landmarks, dtype="<f4")
+    n, l, c = lm.shape
+    return HEADER.pack(MAGIC, VERSION, 0, 0, n, l, c) + ts.tobytes() + lm.tobytes()
+
+
+def decode_capture(buf: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    if len(buf) < HEADER.size:
+        raise CaptureFormatError("Capture too short")
+
+    magic, version, _flags, _reserved, n, l, c = HEADER.unpack_from(buf)
+    if magic != MAGIC or version != VERSION:
+        raise CaptureFormatError("Unsupported capture format")
+    if l != len(LANDMARKS) or c < 4:
+        raise CaptureFormatError("Expected 33 landmarks with x, y, z, visibility")
+    if n > MAX_CAPTURE_FRAMES:
+        raise CaptureFormatError("Capture too long")
+
+    expected = HEADER.size + 8 * n + 4 * n * l * c
+    if len(buf) != expected:
+        raise CaptureFormatError("Capture size does not match header")
+
+    timestamps = np.frombuffer(buf, "<f8", count=n, offset=HEADER.size)
+    landmarks = np.frombuffer(
+        buf, "<f4", count=n * l * c, offset=HEADER.size + 8 * n
+    ).reshape(n, l, c)
+
+    if not (np.isfinite(timestamps).all() and np.isfinite(landmarks[..., :4]).all()):
+        raise CaptureFormatError("Capture contains non-finite values")
+
+    return timestamps, landmarks
+
+
+def triangle_angles(points: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """
+    points (..., P, >=2), idx (J, 3) rows of (a, vertex, c) into P
+    → (..., J) degrees at the vertex, 2D, like compute_angle().
+    """
+    pts = points[..., idx, :2]                   # (..., J, 3, 2)
+    ba = pts[..., 0, :] - pts[..., 1, :]
+    bc = pts[..., 2, :] - pts[..., 1, :]
+
+    angle = np.abs(np.degrees(
+        np.arctan2(bc[..., 1], bc[..., 0]) - np.arctan2(ba[..., 1], ba[..., 0])
+    ))
+    return np.where(angle > 180, 360 - angle, angle)
+
+
+def landmark_angles(landmarks: np.ndarray, vis_thr: float = 0.35) -> Tuple[List[str], np.ndarray]:
+    """
+    (frames, 33, C) → (joints, (frames, J) degrees); NaN where any of the
+    three landmarks is below vis_thr.
+    """
+    joints = list(ANGLE_DEFS)
+    idx = np.array([[_LM[p] for p in ANGLE_DEFS[j]] for j in joints])   # (J, 3)
+
+    angle = triangle_angles(landmarks, idx)
+    visible = (landmarks[:, idx, 3] >= vis_thr).all(axis=2)
+    return joints, np.where(visible, angle, np.nan)
+
+
+def joints_dict(frame_landmarks: np.ndarray) -> Dict[str, Dict[str, float]]:
+    """One frame's landmarks in the FrameData.joints shape."""
+    return {
+        name: {
+            "x": float(p[0]), "y": float(p[1]),
+            "z": float(p[2]), "visibility": float(p[3])
+        }
+        for name, p in zip(LANDMARKS, frame_landmarks)
+    }
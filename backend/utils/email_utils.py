@@ -11,14 +11,11 @@ SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
 SMTP_USERNAME = os.getenv("SMTP_USERNAME")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 SMTP_FROM = os.getenv("SMTP_FROM", SMTP_USERNAME)
+# set to 0 for a local SMTP stand-in (python -m aiosmtpd -n -l localhost:1025)
+SMTP_START_TLS = os.getenv("SMTP_START_TLS", "1") == "1"
 
 
-async def send_email(to: str, subject: str, html_content: str, attachments: list = None):
-    """
-    Send email using SMTP (Gmail, Outlook, Zoho, Custom SMTP)
-    Supports HTML & attachments.
-    """
-
+def build_message(to: str, subject: str, html_content: str, attachments: list = None) -> EmailMessage:
     msg = EmailMessage()
     msg["From"] = SMTP_FROM
     msg["To"] = to
@@ -41,6 +38,28 @@ async def send_email(to: str, subject: str, html_content: str, attachments: list
                 filename=file_name
             )
 
+    return msg
+
+
+def smtp_client() -> aiosmtplib.SMTP:
+    """Unconnected client; connect() also does STARTTLS + login."""
+    return aiosmtplib.SMTP(
+        hostname=SMTP_HOST,
+        port=SMTP_PORT,
+        username=SMTP_USERNAME,
+        password=SMTP_PASSWORD,
+        start_tls=SMTP_START_TLS
+    )
+
+
+async def send_email(to: str, subject: str, html_content: str, attachments: list = None):
+    """
+    Send email using SMTP (Gmail, Outlook, Zoho, Custom SMTP)
+    Supports HTML & attachments.
+    """
+
+    msg = build_message(to, subject, html_content, attachments)
+
     try:
         await aiosmtplib.send(
             msg,
@@ -48,7 +67,7 @@ async def send_email(to: str, subject: str, html_content: str, attachments: list
             port=SMTP_PORT,
             username=SMTP_USERNAME,
             password=SMTP_PASSWORD,
-            start_tls=True
+            start_tls=SMTP_START_TLS
         )
         return {"success": True, "message": "Email sent successfully"}
     
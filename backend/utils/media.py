@@ -0,0 +1,259 @@
+# utils/media.py
+#
+# Non-blocking image uploads.
+#   - images are downscaled / re-encoded as JPEG before upload; anything
+#     OpenCV cannot read is stored as-is, named after its MIME type
+#   - the network upload runs in a dedicated thread pool and is retried
+#     MEDIA_UPLOAD_RETRIES times
+#   - uploaded() uploads first and yields the final URL (required images);
+#     the object is deleted again if the caller's block fails
+#   - staged() yields the final URL right away; the background upload
+#     starts only once the caller's block (and its commit) succeeded, and
+#     if it still fails the URL is cleared from the column it was saved in
+#
+# MEDIA_STORAGE=cloudinary (default) | local
+
+import asyncio
+import logging
+import mimetypes
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional, Set, Tuple
+
+import cv2
+import numpy as np
+from sqlalchemy import update
+
+from database.connection import AsyncSessionLocal
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MEDIA_STORAGE = os.getenv("MEDIA_STORAGE", "cloudinary")
+MEDIA_UPLOAD_WORKERS = int(os.getenv("MEDIA_UPLOAD_WORKERS", 4))
+MEDIA_UPLOAD_RETRIES = int(os.getenv("MEDIA_UPLOAD_RETRIES", 3))
+MEDIA_MAX_SIDE = int(os.getenv("MEDIA_MAX_SIDE", 1280))
+MEDIA_JPEG_QUALITY = int(os.getenv("MEDIA_JPEG_QUALITY", 85))
+
+
+# -------------------------------------------------
+# STORAGE BACKENDS
+# -------------------------------------------------
+class CloudinaryStorage:
+    """Uploads under a caller-chosen public_id, so the URL is known upfront."""
+
+    def __init__(self):
+        import cloudinary
+        import utils.cloudinary  # noqa: F401  (applies cloudinary.config)
+        self._cloudinary = cloudinary
+
+    def url_for(self, key: str, ext: str) -> str:
+        return self._cloudinary.CloudinaryImage(key).build_url(
+            secure=True, format=ext
+        )
+
+    def put(self, key: str, data: bytes, ext: str) -> str:
+        import cloudinary.uploader
+        result = cloudinary.uploader.upload(
+            data,
+            public_id=key,
+            format=ext,
+            resource_type="image",
+            overwrite=True,
+        )
+        return result.get("secure_url")
+
+    def delete(self, key: str, ext: str):
+        import cloudinary.uploader
+        cloudinary.uploader.destroy(key, resource_type="image")
+
+
+class LocalStorage:
+    """Filesystem stand-in for tests and local development."""
+
+    def __init__(self, root: str = None, base_url: str = None):
+        self.root = root or os.getenv("MEDIA_LOCAL_ROOT", "media")
+        self.base_url = (base_url or os.getenv("MEDIA_LOCAL_URL", "/media")).rstrip("/")
+
+    def url_for(self, key: str, ext: str) -> str:
+        return f"{self.base_url}/{key}.{ext}"
+
+    def put(self, key: str, data: bytes, ext: str) -> str:
+        path = os.path.join(self.root, f"{key}.{ext}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return self.url_for(key, ext)
+
+    def delete(self, key: str, ext: str):
+        path = os.path.join(self.root, f"{key}.{ext}")
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def get_storage(name: str = MEDIA_STORAGE):
+    if name == "local":
+        return LocalStorage()
+    return CloudinaryStorage()
+
+
+# -------------------------------------------------
+# IMAGE PREP (client-side resize / compress)
+# -------------------------------------------------
+def _extension(content_type: Optional[str]) -> str:
+    mime = (content_type or "").split(";")[0].strip().lower()
+    ext = mimetypes.guess_extension(mime) if mime else None
+    return ext.lstrip(".") if ext else "bin"
+
+
+def prepare_image(
+    data: bytes,
+    content_type: Optional[str] = None,
+    max_side: int = MEDIA_MAX_SIDE,
+    quality: int = MEDIA_JPEG_QUALITY
+) -> Tuple[bytes, str]:
+    """Returns (bytes, file extension) as they should be stored."""
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        # not something OpenCV can read; store it as uploaded
+        return data, _extension(content_type)
+
+    h, w = img.shape[:2]
+    scale = max_side / max(h, w)
+    if scale < 1:
+        img = cv2.resize(
+            img, (int(w * scale), int(h * scale)),
+            interpolation=cv2.INTER_AREA
+        )
+
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return (buf.tobytes(), "jpg") if ok else (data, _extension(content_type))
+
+
+# -------------------------------------------------
+# UPLOADER
+# -------------------------------------------------
+class MediaUploader:
+
+    def __init__(self, storage=None, workers: int = MEDIA_UPLOAD_WORKERS):
+        self._storage = storage
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="media-upload"
+        )
+        self._pending: Set[asyncio.Future] = set()
+
+    @property
+    def storage(self):
+        if self._storage is None:
+            self._storage = get_storage()
+        return self._storage
+
+    async def _prepare(self, file) -> Tuple[bytes, str]:
+        # read now: the request's file is closed once the response is sent
+        data = await file.read()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, prepare_image, data, getattr(file, "content_type", None)
+        )
+
+    def _put(self, key: str, data: bytes, ext: str) -> str:
+        for attempt in range(MEDIA_UPLOAD_RETRIES + 1):
+            try:
+                return self.storage.put(key, data, ext)
+            except Exception:
+                if attempt == MEDIA_UPLOAD_RETRIES:
+                    raise
+                logger.warning("Media upload of %s failed, retrying", key, exc_info=True)
+                time.sleep(2 ** attempt)
+
+    @staticmethod
+    def new_key(folder: str) -> str:
+        return f"physiocheck/{folder}/{uuid.uuid4().hex}"
+
+    async def upload(self, file, folder: str = "profiles") -> Optional[str]:
+        """Uploads off the event loop and waits for the final URL."""
+        if not file:
+            return None
+        data, ext = await self._prepare(file)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._put, self.new_key(folder), data, ext
+        )
+
+    @asynccontextmanager
+    async def uploaded(self, file, folder: str = "profiles"):
+        """
+        For required images: uploads first (an upload error fails the
+        request) and yields the final URL. If the block raises, e.g. its
+        commit fails, the uploaded object is deleted again.
+        """
+        if not file:
+            yield None
+            return
+        data, ext = await self._prepare(file)
+        key = self.new_key(folder)
+        loop = asyncio.get_running_loop()
+        url = await loop.run_in_executor(self._executor, self._put, key, data, ext)
+        try:
+            yield url
+        except BaseException:
+            await loop.run_in_executor(self._executor, self.storage.delete, key, ext)
+            raise
+
+    @asynccontextmanager
+    async def staged(self, file, folder: str = "profiles", column=None):
+        """
+        Yields the URL the image will live at (None without a file).
+        The upload starts in background when the block exits cleanly,
+        so a request that fails before its commit leaves no orphaned
+        file behind. column is the nullable model attribute the URL is
+        saved in; it is set back to NULL if the upload keeps failing.
+        """
+        if not file:
+            yield None
+            return
+        data, ext = await self._prepare(file)
+        key = self.new_key(folder)
+        url = self.storage.url_for(key, ext)
+
+        yield url
+
+        task = asyncio.create_task(self._upload_later(key, data, ext, url, column))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _upload_later(self, key: str, data: bytes, ext: str, url: str, column):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._put, key, data, ext)
+        except Exception:
+            logger.error("Background media upload of %s failed", key, exc_info=True)
+            if column is not None:
+                await self._clear(column, url)
+
+    @staticmethod
+    async def _clear(column, url: str):
+        # only where the URL is still the saved one: a newer photo stays
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(column.class_)
+                    .where(column == url)
+                    .values({column.key: None})
+                )
+                await db.commit()
+        except Exception:
+            logger.error("Could not clear %s after a failed upload", url, exc_info=True)
+
+    async def drain(self):
+        """Wait for in-flight uploads (called on shutdown)."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+
+media_uploader = MediaUploader()
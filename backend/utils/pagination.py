@@ -0,0 +1,105 @@
+# utils/pagination.py
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query
+from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class PageParams:
+    """
+    Query params for keyset (cursor) pagination.
+    Use as a dependency: page: PageParams = Depends()
+
+    With neither limit nor cursor the whole list is returned, as before
+    pagination existed; a cursor alone pages by DEFAULT_PAGE_SIZE.
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None),
+    ):
+        self.limit = limit if limit or not cursor else DEFAULT_PAGE_SIZE
+        self.cursor = cursor
+
+
+# -------------------------------------------------
+# CURSOR ENCODING
+# -------------------------------------------------
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(
+        [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor length mismatch")
+
+        return [
+            datetime.fromisoformat(v)
+            if v is not None and col.type.python_type is datetime
+            else v
+            for col, v in zip(columns, values)
+        ]
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+
+# -------------------------------------------------
+# KEYSET FILTER
+# (a, b) > (x, y)  ==>  a > x OR (a = x AND b > y)
+# -------------------------------------------------
+def _after(columns, values, descending: bool):
+    col, value = columns[0], values[0]
+    past = col < value if descending else col > value
+
+    if len(columns) == 1:
+        return past
+
+    return or_(past, and_(col == value, _after(columns[1:], values[1:], descending)))
+
+
+async def paginate(
+    db: AsyncSession,
+    query,
+    columns: Sequence[Any],
+    page: PageParams,
+    descending: bool = False,
+) -> Tuple[list, Optional[str]]:
+    """
+    Runs `query` ordered by `columns` (last one must be unique, e.g. the PK)
+    and returns (rows, next_cursor). next_cursor is None on the last page.
+    """
+    if page.cursor:
+        values = decode_cursor(page.cursor, columns)
+        query = query.where(_after(columns, values, descending))
+
+    query = query.order_by(
+        *[c.desc() if descending else c.asc() for c in columns]
+    )
+    if page.limit is None:
+        return (await db.execute(query)).scalars().unique().all(), None
+
+    query = query.limit(page.limit + 1)
+
+    rows = (await db.execute(query)).scalars().unique().all()
+
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+
+    return rows, next_cursor
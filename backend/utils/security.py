@@ -1,15 +1,38 @@
 # utils/security.py
 
 from passlib.context import CryptContext
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import time
 import jwt
 import os
 
-PWD_CONTEXT = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Raising BCRYPT_ROUNDS upgrades existing hashes on next login (min_rounds)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+
+PWD_CONTEXT = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+# bcrypt releases the GIL, so a small dedicated pool keeps it off the
+# event loop without letting a login storm eat the default executor
+_HASH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
 
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey123")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
 
 
 def hash_password(password: str) -> str:
@@ -20,6 +43,27 @@ def verify_password(plain: str, hashed: str) -> bool:
     return PWD_CONTEXT.verify(plain, hashed)
 
 
+async def hash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_HASH_EXECUTOR, PWD_CONTEXT.hash, password)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_HASH_EXECUTOR, PWD_CONTEXT.verify, plain, hashed)
+
+
+async def verify_and_rehash_async(plain: str, hashed: str):
+    """
+    Returns (valid, new_hash). new_hash is set when the stored hash uses
+    an outdated cost and should be replaced.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _HASH_EXECUTOR, PWD_CONTEXT.verify_and_update, plain, hashed
+    )
+
+
 def create_access_token(data: dict, expires_delta: int = None):
     to_encode = data.copy()
 
@@ -31,3 +75,52 @@ def create_access_token(data: dict, expires_delta: int = None):
     to_encode.update({"exp": expire})
 
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+# -------------------------------------------------
+# VERIFIED TOKEN CACHE
+# Signature is checked once per token; later requests with the same
+# token (e.g. every live frame post) hit the LRU until the token expires.
+# -------------------------------------------------
+@dataclass(frozen=True, slots=True)
+class Principal:
+    user_id: int
+    role: str
+    exp: float
+
+    # routers read the principal like the old decoded-JWT dict
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+_TOKEN_CACHE: "OrderedDict[bytes, Principal]" = OrderedDict()
+
+
+def decode_access_token(token: str) -> Principal:
+    key = hashlib.sha256(token.encode()).digest()
+
+    principal = _TOKEN_CACHE.get(key)
+    if principal is not None:
+        if principal.exp > time.time():
+            _TOKEN_CACHE.move_to_end(key)
+            return principal
+        del _TOKEN_CACHE[key]
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    principal = Principal(
+        user_id=payload["user_id"],
+        role=payload.get("role"),
+        exp=float(payload["exp"]),
+    )
+
+    _TOKEN_CACHE[key] = principal
+    if len(_TOKEN_CACHE) > TOKEN_CACHE_SIZE:
+        _TOKEN_CACHE.popitem(last=False)
+
+    return principal